@@ -165,6 +165,9 @@ typedef enum {
     s_chunk_parameters,
     s_chunk_data,
     s_chunk_complete,
+    s_trailer_field_start,
+    s_trailer_field,
+    s_trailer_value,
     s_body_complete,
     s_message_end,
 
@@ -194,15 +197,19 @@ typedef enum {
     h_matching_connection_close
 } header_state;
 
+// States whose bytes make up the body of a chunked message on the wire
+#define IN_CHUNKED_BODY(state) ((state) >= s_chunk_size && (state) <= s_trailer_value)
+
 
 
 // Supporting functions
 
-pbuffer * init_pbuffer(size_t size) {
+pbuffer * init_pbuffer(size_t size, size_t max_size) {
     pbuffer *buffer = malloc(sizeof(pbuffer));
     buffer->bytes = malloc(sizeof(char) * size);
     buffer->position = 0;
     buffer->size = size;
+    buffer->max_size = max_size;
 
     return buffer;
 }
@@ -211,6 +218,63 @@ void reset_pbuffer(pbuffer *buffer) {
     buffer->position = 0;
 }
 
+int grow_pbuffer(pbuffer *buffer, size_t needed) {
+    char *resized;
+    size_t size = buffer->size;
+
+    if (needed > buffer->max_size) {
+        return ELERR_PBUFFER_OVERFLOW;
+    }
+
+    while (size < needed) {
+        size *= 2;
+    }
+
+    if (size > buffer->max_size) {
+        size = buffer->max_size;
+    }
+
+    resized = realloc(buffer->bytes, sizeof(char) * size);
+
+    if (resized == NULL) {
+        return ELERR_PBUFFER_OVERFLOW;
+    }
+
+    buffer->bytes = resized;
+    buffer->size = size;
+
+    return 0;
+}
+
+void shrink_pbuffer(pbuffer *buffer, size_t size) {
+    char *resized;
+
+    // realloc frees the buffer when asked for nothing
+    if (size < HTTP_MIN_HEADER_SIZE) {
+        size = HTTP_MIN_HEADER_SIZE;
+    }
+
+    if (buffer->size > size) {
+        resized = realloc(buffer->bytes, sizeof(char) * size);
+
+        if (resized != NULL) {
+            buffer->bytes = resized;
+            buffer->size = size;
+        }
+    }
+
+    buffer->position = 0;
+}
+
+size_t initial_pbuffer_size(const pbuffer *buffer) {
+    if (buffer->max_size < HTTP_MIN_HEADER_SIZE) {
+        return HTTP_MIN_HEADER_SIZE;
+    }
+
+    return buffer->max_size < HTTP_INITIAL_BUFFER_SIZE ?
+        buffer->max_size : HTTP_INITIAL_BUFFER_SIZE;
+}
+
 void free_pbuffer(pbuffer *buffer) {
     if (buffer->bytes != NULL) {
         free(buffer->bytes);
@@ -223,11 +287,13 @@ void free_pbuffer(pbuffer *buffer) {
 int store_byte_in_pbuffer(char byte, pbuffer *dest) {
     int retval = 0;
 
-    if (dest-> position + 1 < dest->size) {
+    if (dest->position + 1 >= dest->size) {
+        retval = grow_pbuffer(dest, dest->position + 2);
+    }
+
+    if (retval == 0) {
         dest->bytes[dest->position] = byte;
         dest->position += 1;
-    } else {
-        retval = ELERR_PBUFFER_OVERFLOW;
     }
 
     return retval;
@@ -236,11 +302,13 @@ int store_byte_in_pbuffer(char byte, pbuffer *dest) {
 int copy_into_pbuffer(const char *source, pbuffer *dest, size_t length) {
     int retval = 0;
 
-    if (dest->position + length < dest->size) {
-        memcpy(dest->bytes, source, length);
+    if (dest->position + length >= dest->size) {
+        retval = grow_pbuffer(dest, dest->position + length + 1);
+    }
+
+    if (retval == 0) {
+        memcpy(dest->bytes + dest->position, source, length);
         dest->position += length;
-    } else {
-        retval = ELERR_PBUFFER_OVERFLOW;
     }
 
     return retval;
@@ -258,6 +326,152 @@ int store_byte(char byte, http_parser *parser) {
     return store_byte_in_pbuffer(byte, parser->buffer);
 }
 
+int store_bytes(const char *bytes, size_t length, http_parser *parser) {
+    parser->bytes_read += length;
+    return copy_into_pbuffer(bytes, parser->buffer, length);
+}
+
+
+// Bulk scanning
+//
+// Request paths and header values make up most of a message head. Instead
+// of running each of their bytes through the state switch, the parser finds
+// where a run of them ends and stores the whole run at once. Bytes that end
+// a run are handed to the state switch as usual.
+
+// Word-at-a-time test for a given byte; see "Bit Twiddling Hacks"
+#define WORD_ONES           ((uintptr_t) -1 / 0xFF)
+#define WORD_HIGHS          (WORD_ONES * 0x80)
+#define WORD_HAS_ZERO(w)    (((w) - WORD_ONES) & ~(w) & WORD_HIGHS)
+#define WORD_HAS_BYTE(w, b) WORD_HAS_ZERO((w) ^ (WORD_ONES * (unsigned char)(b)))
+#define WORD_HAS_LESS(w, n) (((w) - WORD_ONES * (n)) & ~(w) & WORD_HIGHS)
+
+size_t scan_url(const char *data, size_t length) {
+    size_t index = 0;
+    uintptr_t word;
+
+    // Every byte above a space other than DEL belongs in a URL. Skip over
+    // whole words of those; anything else is checked byte by byte.
+    while (index + sizeof(word) <= length) {
+        memcpy(&word, data + index, sizeof(word));
+
+        if (WORD_HAS_LESS(word, SPACE + 1) || WORD_HAS_BYTE(word, 0x7F)) {
+            break;
+        }
+
+        index += sizeof(word);
+    }
+
+    while (index < length && IS_URL_CHAR(data[index])) {
+        index++;
+    }
+
+    return index;
+}
+
+size_t scan_header_token(const char *data, size_t length) {
+    size_t index = 0;
+
+    // Token bytes are spread out too much to test a word at a time for
+    // less than the cost of the lookups. Header names are short anyway.
+
+    while (index < length && TOKEN(data[index])) {
+        index++;
+    }
+
+    return index;
+}
+
+size_t scan_chunk_size(http_parser *parser, const char *data, size_t length, int *retval) {
+    size_t index = 0;
+    int8_t unhex_val;
+
+    for (; index < length; index++) {
+        unhex_val = unhex[(unsigned char)data[index]];
+
+        if (unhex_val == -1) {
+            break;
+        }
+
+        // Overflow?
+        if (parser->content_length > (ULONG_MAX - unhex_val) / 16) {
+            *retval = ELERR_BAD_CONTENT_LENGTH;
+            break;
+        }
+
+        parser->content_length = parser->content_length * 16 + unhex_val;
+    }
+
+    return index;
+}
+
+size_t scan_header_value(const char *data, size_t length) {
+    size_t index = 0;
+    uintptr_t word;
+
+    // Skip over whole words that hold neither a CR nor an LF
+    while (index + sizeof(word) <= length) {
+        memcpy(&word, data + index, sizeof(word));
+
+        if (WORD_HAS_BYTE(word, CR) || WORD_HAS_BYTE(word, LF)) {
+            break;
+        }
+
+        index += sizeof(word);
+    }
+
+    while (index < length && data[index] != CR && data[index] != LF) {
+        index++;
+    }
+
+    return index;
+}
+
+int batching_headers(const http_parser_settings *settings) {
+    return settings->on_headers != NULL;
+}
+
+int begin_header(http_parser *parser) {
+    http_header_offsets *resized;
+    size_t capacity;
+
+    if (parser->header_count == parser->header_capacity) {
+        capacity = parser->header_capacity > 0 ? parser->header_capacity * 2 : 16;
+        resized = realloc(parser->headers, sizeof(http_header_offsets) * capacity);
+
+        if (resized == NULL) {
+            return ELERR_PBUFFER_OVERFLOW;
+        }
+
+        parser->headers = resized;
+        parser->header_capacity = capacity;
+    }
+
+    parser->headers[parser->header_count].field_offset = parser->buffer->position;
+    return 0;
+}
+
+void end_header_field(http_parser *parser) {
+    http_header_offsets *offsets = &parser->headers[parser->header_count];
+
+    offsets->field_length = parser->buffer->position - offsets->field_offset;
+    offsets->value_offset = parser->buffer->position;
+
+    // Keep the buffer contents but start counting value bytes
+    parser->bytes_read = 0;
+    parser->index = 0;
+}
+
+void end_header_value(http_parser *parser) {
+    http_header_offsets *offsets = &parser->headers[parser->header_count];
+
+    offsets->value_length = parser->buffer->position - offsets->value_offset;
+    parser->header_count += 1;
+
+    parser->bytes_read = 0;
+    parser->index = 0;
+}
+
 int on_cb(http_parser *parser, http_cb cb) {
     return cb(parser);
 }
@@ -299,6 +513,12 @@ char * http_el_state_name(http_el_state state) {
             return "body complete";
         case s_chunk_complete:
             return "chunk complete";
+        case s_trailer_field_start:
+            return "trailer field start";
+        case s_trailer_field:
+            return "trailer field";
+        case s_trailer_value:
+            return "trailer value";
         case s_resp_start:
             return "response start";
         case s_resp_status:
@@ -370,6 +590,7 @@ void set_header_state(http_parser *parser, header_state state) {
 void reset_http_parser(http_parser *parser) {
     parser->bytes_read = 0;
     parser->status_code = 0;
+    parser->header_count = 0;
 
     parser->flags = 0;
 
@@ -377,26 +598,27 @@ void reset_http_parser(http_parser *parser) {
     parser->http_major = 0;
     parser->http_minor = 0;
 
+    // Give back whatever the buffer grew by for the last message
     reset_buffer(parser);
+    shrink_pbuffer(parser->buffer, initial_pbuffer_size(parser->buffer));
+
     set_header_state(parser, h_general);
     set_http_state(parser,
         parser->type == HTTP_REQUEST ? s_req_start : s_resp_start);
 }
 
-int read_body(http_parser *parser, const http_parser_settings *settings, const char *data, size_t offset, size_t length) {
-    int retval = 0, real_length = length - offset;
-    size_t read = 0;
+int read_body(http_parser *parser, const http_parser_settings *settings, const char *data, size_t length, size_t *read) {
+    int retval = 0;
 
-    if (parser->content_length >= real_length) {
-        retval = settings->on_body(parser, data + offset, real_length);
-        read = real_length;
-    } else {
-        retval = settings->on_body(parser, data + offset, parser->content_length);
-        read = parser->content_length;
+    // Hand over as much of the body or chunk as there is in one go. Raw
+    // chunks are handed over with their framing by http_parser_exec.
+    *read = parser->content_length < length ? parser->content_length : length;
+
+    if (!parser->raw_chunks || parser->state != s_chunk_data) {
+        retval = settings->on_body(parser, data, *read);
     }
 
-    parser->content_length -= read;
-    parser->bytes_read += read;
+    parser->content_length -= *read;
 
     if (parser->content_length == 0) {
         switch(parser->state) {
@@ -430,6 +652,87 @@ int read_chunk_complete(http_parser *parser, const http_parser_settings *setting
     return retval;
 }
 
+void start_trailers(http_parser *parser) {
+    // The last chunk may be followed by trailer fields before the message
+    // is complete
+    parser->flags |= F_TRAILING;
+    parser->header_count = 0;
+    reset_buffer(parser);
+    set_http_state(parser, s_trailer_field_start);
+}
+
+int read_trailer_value(http_parser *parser, const http_parser_settings *settings, char next_byte) {
+    int retval = 0;
+
+    switch (next_byte) {
+        case CR:
+            break;
+
+        case LF:
+            end_header_value(parser);
+            set_http_state(parser, s_trailer_field_start);
+            break;
+
+        case '\t':
+        case ' ':
+            // Skip leading whitespace
+            if (parser->bytes_read == 0) {
+                break;
+            }
+
+        default:
+            retval = store_byte(next_byte, parser);
+    }
+
+    return retval;
+}
+
+int read_trailer_field(http_parser *parser, const http_parser_settings *settings, char next_byte) {
+    int retval = 0;
+
+    if (next_byte == ':') {
+        end_header_field(parser);
+        set_http_state(parser, s_trailer_value);
+    } else if (TOKEN(next_byte)) {
+        retval = store_byte(next_byte, parser);
+    } else {
+        retval = ELERR_BAD_HEADER_TOKEN;
+    }
+
+    return retval;
+}
+
+int read_trailer_field_start(http_parser *parser, const http_parser_settings *settings, char next_byte) {
+    int retval = 0;
+
+    switch (next_byte) {
+        case CR:
+            break;
+
+        case LF:
+            // An empty line ends the trailers and the message
+            if (parser->header_count > 0 && settings->on_trailers != NULL &&
+                    !parser->raw_chunks) {
+                retval = on_cb(parser, settings->on_trailers);
+            }
+
+            parser->header_count = 0;
+            reset_buffer(parser);
+            set_http_state(parser, s_body_complete);
+            break;
+
+        default:
+            retval = begin_header(parser);
+
+            if (!retval) {
+                set_http_state(parser, s_trailer_field);
+                retval = read_trailer_field(parser, settings, next_byte);
+            }
+    }
+
+    return retval;
+}
+
 int read_chunk_parameters(http_parser *parser, const http_parser_settings *settings, char next_byte) {
     int retval = 0;
 
@@ -439,9 +742,7 @@ int read_chunk_parameters(http_parser *parser, const http_parser_settings *setti
 
         case LF:
             if (parser->content_length == 0) {
-                // TODO:Feature - Implement trailing headers
-                //parser->flags |= F_TRAILING;
-                set_http_state(parser, s_body_complete);
+                start_trailers(parser);
             } else {
                 set_http_state(parser, s_chunk_data);
             }
@@ -452,7 +753,7 @@ int read_chunk_parameters(http_parser *parser, const http_parser_settings *setti
 
 int read_chunk_size(http_parser *parser, const http_parser_settings *settings, char next_byte) {
     int retval = 0;
-    unsigned char unhex_val;
+    int8_t unhex_val;
     unsigned long t;
 
     switch (next_byte) {
@@ -461,9 +762,7 @@ int read_chunk_size(http_parser *parser, const http_parser_settings *settings, c
 
         case LF:
             if (parser->content_length == 0) {
-                // TODO:Feature - Implement trailing headers
-                //parser->flags |= F_TRAILING;
-                set_http_state(parser, s_body_complete);
+                start_trailers(parser);
             } else {
                 set_http_state(parser, s_chunk_data);
             }
@@ -496,20 +795,6 @@ int read_chunk_size(http_parser *parser, const http_parser_settings *settings, c
     return retval;
 }
 
-int read_chunk_start(http_parser *parser, const http_parser_settings *settings, char next_byte) {
-    int retval = 0;
-    unsigned char unhex_val = unhex[(unsigned char)next_byte];
-
-    if (unhex_val == -1) {
-        retval = ELERR_BAD_CHUNK_SIZE;
-    } else {
-        set_http_state(parser, s_chunk_size);
-        retval = read_chunk_size(parser, settings, next_byte);
-    }
-
-    return retval;
-}
-
 int process_header_by_state(http_parser *parser, const http_parser_settings *settings, char next_byte) {
     int retval = 0;
     unsigned long t;
@@ -593,8 +878,13 @@ int read_header_value(http_parser *parser, const http_parser_settings *settings,
             break;
 
         case LF:
-            retval = on_data_cb(parser, settings->on_header_value);
-            reset_buffer(parser);
+            if (batching_headers(settings)) {
+                end_header_value(parser);
+            } else {
+                retval = on_data_cb(parser, settings->on_header_value);
+                reset_buffer(parser);
+            }
+
             set_http_state(parser, s_header_field_start);
             set_header_state(parser, h_general);
             break;
@@ -695,6 +985,16 @@ int read_header_field(http_parser *parser, const http_parser_settings *settings,
             break;
 
         case LF:
+            if (batching_headers(settings)) {
+                retval = on_cb(parser, settings->on_headers);
+                reset_buffer(parser);
+                parser->header_count = 0;
+
+                if (retval) {
+                    break;
+                }
+            }
+
             retval = on_cb(parser, settings->on_headers_complete);
 
             if (parser->flags & F_CHUNKED) {
@@ -707,8 +1007,13 @@ int read_header_field(http_parser *parser, const http_parser_settings *settings,
             break;
 
         case ':':
-            retval = on_data_cb(parser, settings->on_header_field);
-            reset_buffer(parser);
+            if (batching_headers(settings)) {
+                end_header_field(parser);
+            } else {
+                retval = on_data_cb(parser, settings->on_header_field);
+                reset_buffer(parser);
+            }
+
             set_http_state(parser, s_header_value);
             break;
 
@@ -722,6 +1027,14 @@ int read_header_field(http_parser *parser, const http_parser_settings *settings,
 int read_header_field_start(http_parser *parser, const http_parser_settings *settings, char next_byte, char lower) {
     int retval = 0;
 
+    if (batching_headers(settings)) {
+        retval = begin_header(parser);
+
+        if (retval) {
+            return retval;
+        }
+    }
+
     switch (lower) {
         case 'c':
             // potentially connection or content-length
@@ -944,12 +1257,32 @@ int start_response(http_parser *parser, const http_parser_settings *settings, ch
 }
 
 // Big state switch
+int flush_raw_chunks(http_parser *parser, const http_parser_settings *settings, const char **mark, const char *end) {
+    int retval = 0;
+
+    if (*mark != NULL) {
+        retval = settings->on_body(parser, *mark, end - *mark);
+        *mark = NULL;
+    }
+
+    return retval;
+}
+
 int http_parser_exec(http_parser *parser, const http_parser_settings *settings, const char *data, size_t length) {
     int retval = 0, d_index;
+    size_t run;
+    const char *line_end;
+    const char *raw_mark = NULL;
 
     for (d_index = 0; d_index < length; d_index++) {
         char next_byte = data[d_index];
 
+        // Raw chunk bytes are handed over in one run per execution or per
+        // message, whichever ends first
+        if (parser->raw_chunks && raw_mark == NULL && IN_CHUNKED_BODY(parser->state)) {
+            raw_mark = data + d_index;
+        }
+
 #if DEBUG_OUTPUT
         // Get the next character being processed during debug
         printf("Next: %c\n", next_byte);
@@ -965,7 +1298,14 @@ int http_parser_exec(http_parser *parser, const http_parser_settings *settings,
                 break;
 
             case s_req_path:
-                retval = read_request_path(parser, settings, next_byte);
+                run = scan_url(data + d_index, length - d_index);
+
+                if (run > 0) {
+                    retval = store_bytes(data + d_index, run, parser);
+                    d_index += run - 1;
+                } else {
+                    retval = read_request_path(parser, settings, next_byte);
+                }
                 break;
 
             case s_http_version_head:
@@ -989,7 +1329,15 @@ int http_parser_exec(http_parser *parser, const http_parser_settings *settings,
                 break;
 
             case s_resp_rphrase:
-                retval = read_response_rphrase(parser, settings, next_byte);
+                // The reason phrase is not kept; skip to the end of the line
+                line_end = memchr(data + d_index, LF, length - d_index);
+
+                if (line_end == NULL) {
+                    d_index = length - 1;
+                } else {
+                    d_index = line_end - data;
+                    retval = read_response_rphrase(parser, settings, LF);
+                }
                 break;
 
             case s_header_field_start:
@@ -997,26 +1345,97 @@ int http_parser_exec(http_parser *parser, const http_parser_settings *settings,
                 break;
 
             case s_header_field:
-                retval = read_header_field(parser, settings, next_byte, LOWER(next_byte));
+                run = 0;
+
+                if (parser->header_state == h_general) {
+                    run = scan_header_token(data + d_index, length - d_index);
+                }
+
+                if (run > 0) {
+                    retval = store_bytes(data + d_index, run, parser);
+                    d_index += run - 1;
+                } else {
+                    retval = read_header_field(parser, settings, next_byte, LOWER(next_byte));
+                }
                 break;
 
             case s_header_value:
-                retval = read_header_value(parser, settings, next_byte);
+                run = 0;
+
+                // Leading whitespace is skipped by read_header_value
+                if (parser->header_state == h_general && parser->bytes_read > 0) {
+                    run = scan_header_value(data + d_index, length - d_index);
+                }
+
+                if (run > 0) {
+                    retval = store_bytes(data + d_index, run, parser);
+                    d_index += run - 1;
+                } else {
+                    retval = read_header_value(parser, settings, next_byte);
+                }
                 break;
 
             case s_chunk_size:
-                retval = read_chunk_size(parser, settings, next_byte);
+                run = scan_chunk_size(parser, data + d_index, length - d_index, &retval);
+
+                if (retval) {
+                    break;
+                }
+
+                if (run > 0) {
+                    d_index += run - 1;
+                } else {
+                    retval = read_chunk_size(parser, settings, next_byte);
+                }
                 break;
 
             case s_chunk_parameters:
-                retval = read_chunk_parameters(parser, settings, next_byte);
+                // Chunk extensions are not kept; skip to the end of the line
+                line_end = memchr(data + d_index, LF, length - d_index);
+
+                if (line_end == NULL) {
+                    d_index = length - 1;
+                } else {
+                    d_index = line_end - data;
+                    retval = read_chunk_parameters(parser, settings, LF);
+                }
                 break;
 
             case s_body:
             case s_chunk_data:
-                read_body(parser, settings, data, d_index, length);
-                d_index += parser->bytes_read;
-                reset_buffer(parser);
+                retval = read_body(parser, settings, data + d_index, length - d_index, &run);
+                d_index += run - 1;
+                break;
+
+            case s_trailer_field_start:
+                retval = read_trailer_field_start(parser, settings, next_byte);
+                break;
+
+            case s_trailer_field:
+                run = scan_header_token(data + d_index, length - d_index);
+
+                if (run > 0) {
+                    retval = store_bytes(data + d_index, run, parser);
+                    d_index += run - 1;
+                } else {
+                    retval = read_trailer_field(parser, settings, next_byte);
+                }
+                break;
+
+            case s_trailer_value:
+                run = 0;
+
+                // Leading whitespace is skipped by read_trailer_value
+                if (parser->bytes_read > 0) {
+                    run = scan_header_value(data + d_index, length - d_index);
+                }
+
+                if (run > 0) {
+                    retval = store_bytes(data + d_index, run, parser);
+                    d_index += run - 1;
+                } else {
+                    retval = read_trailer_value(parser, settings, next_byte);
+                }
                 break;
 
             case s_chunk_complete:
@@ -1028,7 +1447,12 @@ int http_parser_exec(http_parser *parser, const http_parser_settings *settings,
         }
 
         if (!retval && parser->state == s_body_complete) {
-            retval = on_cb(parser, settings->on_message_complete);
+            retval = flush_raw_chunks(parser, settings, &raw_mark, data + d_index + 1);
+
+            if (!retval) {
+                retval = on_cb(parser, settings->on_message_complete);
+            }
+
             reset_http_parser(parser);
         }
 
@@ -1038,6 +1462,14 @@ int http_parser_exec(http_parser *parser, const http_parser_settings *settings,
         }
     }
 
+    if (!retval) {
+        retval = flush_raw_chunks(parser, settings, &raw_mark, data + length);
+
+        if (retval) {
+            reset_http_parser(parser);
+        }
+    }
+
     return retval;
 }
 
@@ -1052,11 +1484,31 @@ void http_parser_init(http_parser *parser, enum http_parser_type parser_type) {
     // Set up the struct elements
     parser->app_data = app_data;
     parser->type = parser_type;
-    parser->buffer = init_pbuffer(HTTP_MAX_HEADER_SIZE);
+    parser->buffer = init_pbuffer(
+        HTTP_INITIAL_BUFFER_SIZE, HTTP_MAX_HEADER_SIZE);
+    reset_http_parser(parser);
+}
+
+void http_parser_reset(http_parser *parser, enum http_parser_type parser_type) {
+    parser->type = parser_type;
     reset_http_parser(parser);
 }
 
+void http_parser_set_max_header_size(http_parser *parser, size_t max_size) {
+    parser->buffer->max_size = max_size;
+    shrink_pbuffer(parser->buffer, initial_pbuffer_size(parser->buffer));
+}
+
+void http_parser_set_raw_chunks(http_parser *parser, int raw_chunks) {
+    parser->raw_chunks = raw_chunks != 0;
+}
+
 void free_http_parser(http_parser *parser) {
+    if (parser->headers != NULL) {
+        free(parser->headers);
+        parser->headers = NULL;
+    }
+
     free_pbuffer(parser->buffer);
     free(parser);
 }
@@ -1102,3 +1554,25 @@ int http_transfer_encoding_chunked(const http_parser *parser) {
     return parser->flags & F_CHUNKED;
 }
 
+size_t http_body_remaining(const http_parser *parser) {
+    // Only bodies with a known length may be skipped
+    return parser->state == s_body ? parser->content_length : 0;
+}
+
+int http_parser_skip_body(http_parser *parser, const http_parser_settings *settings, size_t length) {
+    int retval = 0;
+
+    if (parser->state != s_body || length > parser->content_length) {
+        return ELERR_BAD_STATE;
+    }
+
+    parser->content_length -= length;
+
+    if (parser->content_length == 0) {
+        retval = on_cb(parser, settings->on_message_complete);
+        reset_http_parser(parser);
+    }
+
+    return retval;
+}
+
@@ -11,11 +11,22 @@ extern "C" {
 #define HTTP_EL_VERSION_MAJOR 0
 #define HTTP_EL_VERSION_MINOR 1
 
+// Default limit on how large a parser buffer may grow. Parsers may be given
+// their own limit with http_parser_set_max_header_size.
 #define HTTP_MAX_HEADER_SIZE (80 * 1024)
 
+// Parser buffers start out this size, grow as needed up to their limit and
+// shrink back once a message has been read
+#define HTTP_INITIAL_BUFFER_SIZE 1024
+
+// Smallest limit a parser buffer may be given. Buffers never shrink below
+// this size, whatever their limit.
+#define HTTP_MIN_HEADER_SIZE 256
+
 
 // Type defs
 typedef struct pbuffer pbuffer;
+typedef struct http_header_offsets http_header_offsets;
 typedef struct http_parser http_parser;
 typedef struct http_parser_settings http_parser_settings;
 
@@ -62,6 +73,14 @@ struct pbuffer {
     char *bytes;
     size_t position;
     size_t size;
+    size_t max_size;
+};
+
+struct http_header_offsets {
+    size_t field_offset;
+    size_t field_length;
+    size_t value_offset;
+    size_t value_length;
 };
 
 struct http_parser_settings {
@@ -74,6 +93,19 @@ struct http_parser_settings {
     http_data_cb      on_header_value;
     http_cb           on_headers_complete;
     http_data_cb      on_body;
+
+    // Optional. When set, header fields and values are not reported one
+    // at a time. Instead they are kept in the parser buffer and their
+    // offsets are recorded in the parser's headers array. This callback
+    // fires once with all of them right before on_headers_complete.
+    http_cb           on_headers;
+
+    // Optional. Trailer fields and values that follow the last chunk of a
+    // chunked message are kept in the parser buffer and their offsets are
+    // recorded in the parser's headers array. This callback fires once with
+    // all of them right before on_message_complete. Trailers are dropped
+    // when it is not set.
+    http_cb           on_trailers;
     http_cb           on_message_complete;
 };
 
@@ -85,6 +117,10 @@ struct http_parser {
     unsigned char type;
     unsigned char index;
 
+    // When set, chunked message bodies are reported to on_body as they
+    // appear on the wire, chunk framing and trailers included
+    unsigned char raw_chunks;
+
     // Reserved fields
     unsigned long content_length;
     size_t bytes_read;
@@ -100,6 +136,11 @@ struct http_parser {
     // Buffer
     pbuffer *buffer;
 
+    // Header offsets into the buffer when batching headers
+    http_header_offsets *headers;
+    size_t header_count;
+    size_t header_capacity;
+
     // Optionally settable application data pointer
     void *app_data;
 };
@@ -109,10 +150,27 @@ struct http_parser {
 void http_parser_init(http_parser *parser, enum http_parser_type parser_type);
 void free_http_parser(http_parser *parser);
 
+// Readies a parser for a new stream of messages, keeping its allocations
+void http_parser_reset(http_parser *parser, enum http_parser_type parser_type);
+
+// Limits how large the parser buffer may grow. Request lines and headers
+// that need more room fail with ELERR_PBUFFER_OVERFLOW. This must only be
+// called between messages.
+void http_parser_set_max_header_size(http_parser *parser, size_t max_size);
+
+// Chooses whether chunked bodies are reported with their framing. This
+// must only be called between messages.
+void http_parser_set_raw_chunks(http_parser *parser, int raw_chunks);
+
 int http_parser_exec(http_parser *parser, const http_parser_settings *settings, const char *data, size_t len);
 int http_should_keep_alive(const http_parser *parser);
 int http_transfer_encoding_chunked(const http_parser *parser);
 
+// Body bytes forwarded without being parsed, e.g. with splice(2), must be
+// accounted for with http_parser_skip_body
+size_t http_body_remaining(const http_parser *parser);
+int http_parser_skip_body(http_parser *parser, const http_parser_settings *settings, size_t length);
+
 #ifdef __cplusplus
 }
 #endif
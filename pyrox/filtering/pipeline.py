@@ -1,6 +1,4 @@
-import inspect
-
-from pyrox.http import HttpResponse
+from pyrox.http.templates import get_template, REJECTION
 from pyrox.log import get_logger
 
 _LOG = get_logger(__name__)
@@ -45,7 +43,7 @@ class FilterAction(object):
     def breaks_pipeline(self):
         return self.kind in _BREAKING_ACTIONS
 
-    def intercepts_request(sefl):
+    def intercepts_request(self):
         return self.is_replying()
 
     def is_consuming(self):
@@ -122,13 +120,81 @@ class HttpFilter(object):
     pass
 
 
-"""
-Default return object. This should be configurable.
-"""
-_DEFAULT_REJECT_RESP = HttpResponse()
-_DEFAULT_REJECT_RESP.version = b'1.1'
-_DEFAULT_REJECT_RESP.status = '400 Bad Request'
-_DEFAULT_REJECT_RESP.header('Content-Length').values.append('0')
+class FilterDispatchPlan(object):
+    """
+    A dispatch plan records which methods of a filter class handle which
+    pipeline phase. Plans are compiled once per filter class so that
+    building a pipeline only has to look up the bound methods.
+
+    Attributes:
+        request_head    A tuple of the names of the methods that handle
+                        request heads.
+        request_body    A tuple of the names of the methods that handle
+                        request bodies.
+        response_head   A tuple of the names of the methods that handle
+                        response heads.
+        response_body   A tuple of the names of the methods that handle
+                        response bodies.
+    """
+    def __init__(self, filter_cls):
+        request_head = list()
+        request_body = list()
+        response_head = list()
+        response_body = list()
+
+        for name in dir(filter_cls):
+            member = getattr(filter_cls, name, None)
+
+            if not callable(member):
+                continue
+
+            # Assume that if an attribute exists then it is decorated
+            if hasattr(member, '_handles_request_head'):
+                _LOG.debug('{0}.{1} handles request head'.format(
+                    filter_cls.__name__, name))
+                request_head.append(name)
+
+            if hasattr(member, '_handles_request_body'):
+                _LOG.debug('{0}.{1} handles request body'.format(
+                    filter_cls.__name__, name))
+                request_body.append(name)
+
+            if hasattr(member, '_handles_response_head'):
+                _LOG.debug('{0}.{1} handles response head'.format(
+                    filter_cls.__name__, name))
+                response_head.append(name)
+
+            if hasattr(member, '_handles_response_body'):
+                _LOG.debug('{0}.{1} handles response body'.format(
+                    filter_cls.__name__, name))
+                response_body.append(name)
+
+        self.request_head = tuple(request_head)
+        self.request_body = tuple(request_body)
+        self.response_head = tuple(response_head)
+        self.response_body = tuple(response_body)
+
+    def is_empty(self):
+        return not (self.request_head or self.request_body or
+                    self.response_head or self.response_body)
+
+
+_DISPATCH_PLANS = dict()
+
+
+def dispatch_plan(filter_cls):
+    """
+    Returns the dispatch plan for the given filter class, compiling it the
+    first time the class is seen.
+    """
+    plan = _DISPATCH_PLANS.get(filter_cls)
+
+    if plan is None:
+        plan = FilterDispatchPlan(filter_cls)
+        _DISPATCH_PLANS[filter_cls] = plan
+
+    return plan
+
 
 """
 Default filter action singletons.
@@ -152,7 +218,8 @@ def reply(response, src):
     This call may optionally include a stream or a data blob to take the
     place of the response content body.
 
-    :param response: the response object to reply to the client with
+    :param response: the response object or ResponseTemplate to reply to the
+                     client with
     """
     if response == None:
         raise TypeError('The response of a reply must be a response.')
@@ -166,12 +233,14 @@ def reject(response=None):
     during on_request and on_response. The associated response parameter
     becomes the response the client should expect to see. If a response
     parameter is not provided then the function will default to the configured
-    default response.
+    rejection template. Filters that reject often should pass a
+    ResponseTemplate so that the response is not serialized every time.
 
-    :param response: the response object to reply to the client with
+    :param response: the response object or ResponseTemplate to reply to the
+                     client with
     """
     return FilterAction(REPLY, (response, )) if response != None\
-        else FilterAction(REPLY, (_DEFAULT_REJECT_RESP, ))
+        else FilterAction(REPLY, (get_template(REJECTION), ))
 
 
 def route(upstream_target):
@@ -221,31 +290,23 @@ class HttpFilterPipeline(object):
         return len(self._resp_body_chain) > 0
 
     def add_filter(self, http_filter):
-        filter_methods = inspect.getmembers(http_filter, inspect.ismethod)
+        plan = dispatch_plan(http_filter.__class__)
 
-        for method in filter_methods:
-            if len(method) < 1:
-                continue
-
-            finst = method[1]
-            _LOG.debug('Checking function instance {0} for decorators'.format(finst))
-
-            # Assume that if an attribute exists then it is decorated
-            if hasattr(finst, '_handles_request_head'):
-                _LOG.debug('Function instance {0} handles request head'.format(finst))
-                self._req_head_chain.append((http_filter, finst))
+        for name in plan.request_head:
+            self._req_head_chain.append(
+                (http_filter, getattr(http_filter, name)))
 
-            if hasattr(finst, '_handles_request_body'):
-                _LOG.debug('Function instance {0} handles request body'.format(finst))
-                self._req_body_chain.append((http_filter, finst))
+        for name in plan.request_body:
+            self._req_body_chain.append(
+                (http_filter, getattr(http_filter, name)))
 
-            if hasattr(finst, '_handles_response_head'):
-                _LOG.debug('Function instance {0} handles response head'.format(finst))
-                self._resp_head_chain.append((http_filter, finst))
+        for name in plan.response_head:
+            self._resp_head_chain.append(
+                (http_filter, getattr(http_filter, name)))
 
-            if hasattr(finst, '_handles_response_body'):
-                _LOG.debug('Function instance {0} handles response body'.format(finst))
-                self._resp_body_chain.append((http_filter, finst))
+        for name in plan.response_body:
+            self._resp_body_chain.append(
+                (http_filter, getattr(http_filter, name)))
 
     def _on_head(self, chain, head):
         last_action = next()
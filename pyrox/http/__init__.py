@@ -1,2 +1,4 @@
-from .parser import RequestParser, ResponseParser, ParserDelegate
+from .parser import (RequestParser, ResponseParser, ParserDelegate,
+                     ParserPool)
 from .model import HttpHeader, HttpMessage, HttpRequest, HttpResponse
+from .templates import ResponseTemplate, register_template, get_template
@@ -1,7 +1,5 @@
-from .model_util import request_to_bytes, response_to_bytes, strval
-
-
-_EMPTY_HEADER_VALUES = ()
+from .model_util import (request_to_bytes, response_to_bytes, load_headers,
+                         HeaderTable)
 
 
 class HttpHeader(object):
@@ -11,10 +9,40 @@ class HttpHeader(object):
     Attributes:
         name        A bytearray or string value representing the field-name of
                     the header.
+
+        values      A list of the values of the header. Headers read with a
+                    single value hold on to it without a list until the list
+                    is first asked for.
     """
+    __slots__ = ('name', '_value', '_values', '_wire')
+
     def __init__(self, name):
         self.name = name
-        self.values = list()
+        self._value = None
+        self._values = None
+
+        # Where in a parsed header block this header was read from, if it
+        # was read from one
+        self._wire = None
+
+    @property
+    def values(self):
+        values = self._values
+
+        if values is None:
+            if self._value is None:
+                values = list()
+            else:
+                values = [self._value]
+                self._value = None
+            self._values = values
+
+        return values
+
+    @values.setter
+    def values(self, values):
+        self._value = None
+        self._values = values
 
 
 class HttpMessage(object):
@@ -23,8 +51,9 @@ class HttpMessage(object):
     messages share common structures.
 
     Attributes:
-        headers     A dictionary of the headers currently stored in this
-                    HTTP message.
+        headers     A case-insensitive HeaderTable of the headers currently
+                    stored in this HTTP message. Headers are kept in the
+                    order they were added.
 
         version     A bytearray or string value representing the major-minor
                     version of the HttpMessage.
@@ -33,14 +62,27 @@ class HttpMessage(object):
                     used as a holding place for data that other filters
                     may then access and utilize. Setting entries in this
                     dictionary does not modify the HTTP model in anyway.
+                    It is only created once it is first used.
     """
+    __slots__ = ('version', '_local_data', '_headers')
+
     def __init__(self, version='1.1'):
         self.version = version
-        self.local_data = dict()
+        self._local_data = None
 
-        self._headers = dict()
+        self._headers = HeaderTable()
         self.set_default_headers()
 
+    @property
+    def local_data(self):
+        if self._local_data is None:
+            self._local_data = dict()
+        return self._local_data
+
+    @local_data.setter
+    def local_data(self, local_data):
+        self._local_data = local_data
+
     def set_default_headers(self):
         """
         Allows messages to set default headers that must be added to the
@@ -59,11 +101,10 @@ class HttpMessage(object):
         message and returned. If the header already exists, then it is
         returned.
         """
-        nameval = strval(name)
-        header = self._headers.get(nameval, None)
-        if not header:
+        header = self._headers.get(name)
+        if header is None:
             header = HttpHeader(name)
-            self._headers[nameval] = header
+            self._headers.put(name, header)
         return header
 
     def replace_header(self, name):
@@ -80,7 +121,16 @@ class HttpMessage(object):
         Unlike the header function, if the header does not exist then a None
         result is returned.
         """
-        return self._headers.get(strval(name), None)
+        return self._headers.get(name)
+
+    def load_headers(self, headers, block=None):
+        """
+        Adds a list of (field, value) tuples reported by the parser to the
+        message. When the parser also handed over its header block, the
+        message keeps it and serializing the message only rebuilds the
+        headers that were changed, added or replaced since.
+        """
+        load_headers(self, headers, block, HttpHeader)
 
     def remove_header(self, name):
         """
@@ -88,11 +138,7 @@ class HttpMessage(object):
         If the header exists, it is removed and a result of True is returned.
         If the header does not exist then a result of False is returned.
         """
-        nameval = strval(name)
-        if nameval in self._headers:
-            del self._headers[nameval]
-            return True
-        return False
+        return self._headers.remove(name)
 
 
 class HttpRequest(HttpMessage):
@@ -106,6 +152,8 @@ class HttpRequest(HttpMessage):
         url         A bytearray or string value representing the requests'
                     uri path including the query and fragment string.
     """
+    __slots__ = ('method', 'url')
+
     def __init__(self):
         super(HttpRequest, self).__init__()
         self.method = None
@@ -125,6 +173,8 @@ class HttpResponse(HttpMessage):
                     potentially its human readable component delimited by
                     a single space.
     """
+    __slots__ = ('status', )
+
     def __init__(self):
         super(HttpResponse, self).__init__()
         self.status = None
@@ -1,68 +1,304 @@
 from cpython cimport bool
-from libc.string cimport strlen
 
 
-def strval(char *src):
-    cdef int val = 71, length = strlen(src), index = 0
+"""
+Header names common enough to be worth interning. Their lookup keys are
+resolved with a single dict hit instead of being lowercased every time.
+"""
+_COMMON_HEADER_NAMES = (
+    'Accept', 'Accept-Charset', 'Accept-Encoding', 'Accept-Language',
+    'Accept-Ranges', 'Access-Control-Allow-Origin', 'Age', 'Allow',
+    'Authorization', 'Cache-Control', 'Connection', 'Content-Disposition',
+    'Content-Encoding', 'Content-Language', 'Content-Length',
+    'Content-Location', 'Content-MD5', 'Content-Range', 'Content-Type',
+    'Cookie', 'Date', 'DNT', 'ETag', 'Expect', 'Expires', 'From', 'Host',
+    'If-Match', 'If-Modified-Since', 'If-None-Match', 'If-Range',
+    'If-Unmodified-Since', 'Keep-Alive', 'Last-Modified', 'Link',
+    'Location', 'Max-Forwards', 'Origin', 'Pragma', 'Proxy-Authenticate',
+    'Proxy-Authorization', 'Proxy-Connection', 'Range', 'Referer',
+    'Retry-After', 'Server', 'Set-Cookie', 'TE', 'Trailer',
+    'Transfer-Encoding', 'Upgrade', 'User-Agent', 'Vary', 'Via', 'Warning',
+    'WWW-Authenticate', 'X-Auth-Token', 'X-Forwarded-For',
+    'X-Forwarded-Host', 'X-Forwarded-Proto', 'X-Request-Id')
 
-    while index < length:
-        val += (src[index] | 0x20)
-        index += 1
+cdef dict _INTERNED_KEYS = dict()
 
-    return val
+for _name in _COMMON_HEADER_NAMES:
+    _key = intern(_name.lower())
+    _INTERNED_KEYS[_name] = _key
+    _INTERNED_KEYS[_key] = _key
 
 
-cdef header_to_bytes(char *name, object values, object bytes):
-    bytes.extend(name)
-    bytes.extend(b': ')
+cpdef object strval(object name):
+    """
+    Returns the case-insensitive lookup key for a header name.
+    """
+    cdef object key
 
-    if len(values) > 0:
-        bytes.extend(values[0])
+    if type(name) is not str:
+        name = str(name)
 
-    for value in values[1:]:
-        bytes.extend(b', ')
-        bytes.extend(value)
+    key = _INTERNED_KEYS.get(name)
+    if key is None:
+        key = name.lower()
 
-    bytes.extend(b'\r\n')
+    return key
 
 
-cdef headers_to_bytes(object headers, object bytes):
-    cdef bool needs_content_length = True
-    cdef bool has_transfer_encoding = False
+cdef class HeaderTable(object):
+    """
+    A case-insensitive table of HTTP headers. Headers keep the casing of the
+    name they were added with and iterate in the order they were added.
+    Lookups are O(1); removals leave a hole in the ordering that is
+    compacted once enough of them pile up.
+    """
+    cdef dict _index
+    cdef dict _positions
+    cdef list _order
+    cdef Py_ssize_t _holes
 
-    for header in headers:
-        if needs_content_length and header.name == 'content-length':
-            needs_content_length = False
+    # The header block the table was loaded from and its number of lines
+    cdef object _wire
+    cdef Py_ssize_t _wire_lines
 
-        if not has_transfer_encoding and header.name == 'transfer-encoding':
-            has_transfer_encoding = True
+    def __cinit__(self):
+        self._index = dict()
+        self._positions = dict()
+        self._order = list()
+        self._holes = 0
+        self._wire = None
+        self._wire_lines = 0
 
-        header_to_bytes(header.name, header.values, bytes)
+    def __len__(self):
+        return len(self._index)
 
-    if needs_content_length and not has_transfer_encoding:
-        header_to_bytes('content-length', '0', bytes)
+    def __contains__(self, object name):
+        return strval(name) in self._index
 
-    bytes.extend(b'\r\n')
+    def __iter__(self):
+        return iter(self.values())
+
+    def __getitem__(self, object name):
+        return self._index[strval(name)]
+
+    cpdef object get(self, object name, object default=None):
+        return self._index.get(strval(name), default)
+
+    cpdef object put(self, object name, object header):
+        """
+        Adds the header under the given name. An existing header with the
+        same name is replaced and the new header moves to the end of the
+        ordering.
+        """
+        cdef object key = strval(name)
+
+        if key in self._index:
+            self._remove_key(key)
+
+        self._index[key] = header
+        self._positions[key] = len(self._order)
+        self._order.append(header)
+
+    cpdef bool remove(self, object name):
+        cdef object key = strval(name)
+
+        if key in self._index:
+            self._remove_key(key)
+            return True
+        return False
+
+    cpdef list values(self):
+        if self._holes == 0:
+            return list(self._order)
+        return [header for header in self._order if header is not None]
+
+    cdef _remove_key(self, object key):
+        self._order[self._positions.pop(key)] = None
+        del self._index[key]
+        self._holes += 1
+
+        if self._holes > 8 and self._holes * 2 > len(self._order):
+            self._compact()
+
+    cdef _compact(self):
+        cdef list order = list()
+        cdef dict keys = dict(
+            (position, key) for key, position in self._positions.items())
+
+        for position, header in enumerate(self._order):
+            if header is not None:
+                self._positions[keys[position]] = len(order)
+                order.append(header)
+
+        self._order = order
+        self._holes = 0
+
+
+def load_headers(object http_msg, list headers, object block, object header_type):
+    """
+    Adds the (field, value) tuples read by the parser to the message. When
+    given, block must hold the same headers serialized as one
+    "field: value\\r\\n" line each. Headers read once then remember their
+    line of the block so that serializing the message reuses it for as long
+    as the header keeps the name and value it was read with. New headers
+    are created with header_type.
+    """
+    cdef HeaderTable table = http_msg.headers
+    cdef Py_ssize_t start = 0
+    cdef Py_ssize_t end
+    cdef bint single
+
+    for field, value in headers:
+        header = table.get(field)
+
+        if header is None:
+            header = header_type(field)
+            table.put(field, header)
+
+        # Values only go into a list once there is more than one
+        single = header._values is None and header._value is None
+
+        if single:
+            header._value = value
+        else:
+            header.values.append(value)
+
+        if block is None:
+            continue
+
+        end = start + len(field) + len(value) + 4
+
+        # Headers read more than once are joined and rebuilt instead
+        if single:
+            header._wire = (block, header.name, value, start, end)
+        else:
+            header._wire = None
+
+        start = end
+
+    if block is None:
+        return
+
+    if start != len(block):
+        raise ValueError('Header block does not match the headers given.')
+
+    table._wire = block
+    table._wire_lines = len(headers)
+
+
+cdef inline object as_str(object value):
+    if type(value) is str:
+        return value
+    return str(value)
+
+
+cdef inline bint header_is_wire(object header):
+    cdef tuple wire = header._wire
+
+    if wire is None or header.name is not wire[1]:
+        return False
+
+    values = header._values
+
+    if values is None:
+        return header._value is wire[2]
+    return len(values) == 1 and values[0] is wire[2]
+
+
+cdef header_to_pieces(object header, list pieces):
+    values = header._values
+
+    pieces.append(as_str(header.name))
+    pieces.append(b': ')
+
+    if values is None:
+        if header._value is not None:
+            pieces.append(as_str(header._value))
+    else:
+        if len(values) > 0:
+            pieces.append(as_str(values[0]))
+
+        for value in values[1:]:
+            pieces.append(b', ')
+            pieces.append(as_str(value))
+
+    pieces.append(b'\r\n')
+
+
+cdef bint wire_is_intact(HeaderTable headers):
+    cdef Py_ssize_t lines = 0
+
+    for header in headers._order:
+        if header is not None:
+            if not header_is_wire(header) or header._wire[0] is not headers._wire:
+                return False
+            lines += 1
+
+    # Removed headers leave lines behind in the block
+    return lines == headers._wire_lines
+
+
+cdef splice_headers(HeaderTable headers, list pieces):
+    cdef object block = None
+    cdef Py_ssize_t run_start = 0
+    cdef Py_ssize_t run_end = 0
+    cdef tuple wire
+
+    for header in headers._order:
+        if header is None:
+            continue
+
+        if not header_is_wire(header):
+            if block is not None:
+                pieces.append(block[run_start:run_end])
+                block = None
+
+            header_to_pieces(header, pieces)
+            continue
+
+        # Copy runs of neighbouring lines out of the block in one slice
+        wire = header._wire
+
+        if wire[0] is block and wire[3] == run_end:
+            run_end = wire[4]
+            continue
+
+        if block is not None:
+            pieces.append(block[run_start:run_end])
+
+        block = wire[0]
+        run_start = wire[3]
+        run_end = wire[4]
+
+    if block is not None:
+        pieces.append(block[run_start:run_end])
+
+
+cdef headers_to_pieces(HeaderTable headers, list pieces):
+    if headers._wire is not None and wire_is_intact(headers):
+        pieces.append(headers._wire)
+    else:
+        splice_headers(headers, pieces)
+
+    if ('content-length' not in headers._index and
+            'transfer-encoding' not in headers._index):
+        pieces.append(b'content-length: 0\r\n')
+
+    pieces.append(b'\r\n')
 
 
 def request_to_bytes(object http_request):
-    bytes = bytearray()
-    bytes.extend(http_request.method)
-    bytes.extend(b' ')
-    bytes.extend(http_request.url)
-    bytes.extend(b' HTTP/')
-    bytes.extend(http_request.version)
-    bytes.extend(b'\r\n')
-    headers_to_bytes(http_request.headers.values(), bytes)
-    return str(bytes)
+    cdef list pieces = [
+        as_str(http_request.method), b' ',
+        as_str(http_request.url), b' HTTP/',
+        as_str(http_request.version), b'\r\n']
+    headers_to_pieces(http_request.headers, pieces)
+    return b''.join(pieces)
 
 
 def response_to_bytes(object http_response):
-    bytes = bytearray()
-    bytes.extend(b'HTTP/')
-    bytes.extend(http_response.version)
-    bytes.extend(b' ')
-    bytes.extend(http_response.status)
-    bytes.extend(b'\r\n')
-    headers_to_bytes(http_response.headers.values(), bytes)
-    return str(bytes)
+    cdef list pieces = [
+        b'HTTP/', as_str(http_response.version), b' ',
+        as_str(http_response.status), b'\r\n']
+    headers_to_pieces(http_response.headers, pieces)
+    return b''.join(pieces)
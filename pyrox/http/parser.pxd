@@ -1,10 +1,26 @@
 cdef extern from "http_el.h":
 
+    enum: HTTP_MAX_HEADER_SIZE
+    enum: HTTP_MIN_HEADER_SIZE
+
     cdef enum http_parser_type:
         HTTP_REQUEST, HTTP_RESPONSE
 
+    cdef struct pbuffer:
+        char *bytes
+        size_t position
+
+    cdef struct http_header_offsets:
+        size_t field_offset
+        size_t field_length
+        size_t value_offset
+        size_t value_length
+
     cdef struct http_parser:
         unsigned long content_length
+        pbuffer *buffer
+        http_header_offsets *headers
+        size_t header_count
         void *app_data
         short http_major
         short http_minor
@@ -23,10 +39,17 @@ cdef extern from "http_el.h":
         http_cb           on_headers_complete
         http_data_cb      on_body
         http_cb           on_message_complete
+        http_cb           on_headers
+        http_cb           on_trailers
 
     void http_parser_init(http_parser *parser, http_parser_type ptype)
     void free_http_parser(http_parser *parser)
+    void http_parser_reset(http_parser *parser, http_parser_type ptype)
+    void http_parser_set_max_header_size(http_parser *parser, size_t max_size)
+    void http_parser_set_raw_chunks(http_parser *parser, int raw_chunks)
 
     int http_parser_exec(http_parser *parser, http_parser_settings *settings, char *data, size_t len) except -1
     int http_should_keep_alive(http_parser *parser)
     int http_transfer_encoding_chunked(http_parser *parser)
+    size_t http_body_remaining(http_parser *parser)
+    int http_parser_skip_body(http_parser *parser, http_parser_settings *settings, size_t length) except -1
@@ -1,17 +1,34 @@
-from libc.string cimport strlen
+from libc.string cimport strlen, memcpy
 from libc.stdlib cimport malloc, free
 from cpython cimport bool, PyBytes_FromStringAndSize, PyBytes_FromString
+from cpython.bytes cimport PyBytes_AS_STRING
+from cpython.buffer cimport (PyObject_CheckBuffer, PyObject_GetBuffer,
+                             PyBuffer_Release, PyBUF_SIMPLE)
 
 import traceback
 
 _REQUEST_PARSER = 0
 _RESPONSE_PARSER = 1
 
-def RequestParser(parser_delegate):
-    return HttpEventParser(parser_delegate, _REQUEST_PARSER)
+# Number of parsers a ParserPool keeps for reuse unless told otherwise
+_DEFAULT_MAX_IDLE_PARSERS = 256
 
-def ResponseParser(parser_delegate):
-    return HttpEventParser(parser_delegate, _RESPONSE_PARSER)
+# Largest request line or header block a parser accepts unless told
+# otherwise
+DEFAULT_MAX_HEADER_SIZE = HTTP_MAX_HEADER_SIZE
+
+# Smallest limit a parser may be given on its request line or header block
+MIN_HEADER_SIZE = HTTP_MIN_HEADER_SIZE
+
+def RequestParser(parser_delegate, zero_copy=False,
+                  max_header_size=DEFAULT_MAX_HEADER_SIZE, raw_chunks=False):
+    return HttpEventParser(
+        parser_delegate, _REQUEST_PARSER, zero_copy, max_header_size, raw_chunks)
+
+def ResponseParser(parser_delegate, zero_copy=False,
+                   max_header_size=DEFAULT_MAX_HEADER_SIZE, raw_chunks=False):
+    return HttpEventParser(
+        parser_delegate, _RESPONSE_PARSER, zero_copy, max_header_size, raw_chunks)
 
 
 cdef int on_req_method(http_parser *parser, char *data, size_t length) except -1:
@@ -48,14 +65,88 @@ cdef int on_header_value(http_parser *parser, char *data, size_t length) except
     app_data.delegate.on_header_value(header_value)
     return 0
 
+cdef list buffered_fields(http_parser *parser):
+    cdef char *buffer = parser.buffer.bytes
+    cdef http_header_offsets *offsets
+    cdef size_t index
+    cdef list fields = list()
+
+    for index in range(parser.header_count):
+        offsets = &parser.headers[index]
+        fields.append((
+            PyBytes_FromStringAndSize(
+                buffer + offsets.field_offset, offsets.field_length),
+            PyBytes_FromStringAndSize(
+                buffer + offsets.value_offset, offsets.value_length)))
+
+    return fields
+
+cdef object header_block(http_parser *parser):
+    cdef char *buffer = parser.buffer.bytes
+    cdef http_header_offsets *offsets
+    cdef size_t index
+    cdef size_t size = 0
+    cdef object block
+    cdef char *out
+
+    for index in range(parser.header_count):
+        offsets = &parser.headers[index]
+        size += offsets.field_length + offsets.value_length + 4
+
+    # Fill in a single allocation rather than joining the lines
+    block = PyBytes_FromStringAndSize(NULL, size)
+    out = PyBytes_AS_STRING(block)
+
+    for index in range(parser.header_count):
+        offsets = &parser.headers[index]
+
+        memcpy(out, buffer + offsets.field_offset, offsets.field_length)
+        out += offsets.field_length
+        out[0] = c':'
+        out[1] = c' '
+        out += 2
+
+        memcpy(out, buffer + offsets.value_offset, offsets.value_length)
+        out += offsets.value_length
+        out[0] = c'\r'
+        out[1] = c'\n'
+        out += 2
+
+    return block
+
+cdef int on_headers(http_parser *parser) except -1:
+    cdef ParserData app_data = <ParserData> parser.app_data
+
+    if app_data.header_block:
+        app_data.delegate.on_header_block(header_block(parser))
+
+    app_data.delegate.on_headers(buffered_fields(parser))
+    return 0
+
+cdef int on_trailers(http_parser *parser) except -1:
+    cdef object app_data = <object> parser.app_data
+
+    for field, value in buffered_fields(parser):
+        app_data.delegate.on_trailer(field, value)
+    return 0
+
 cdef int on_headers_complete(http_parser *parser) except -1:
     cdef object app_data = <object> parser.app_data
     app_data.delegate.on_headers_complete()
     return 0
 
 cdef int on_body(http_parser *parser, char *data, size_t length) except -1:
-    cdef object app_data = <object> parser.app_data
-    cdef object body_value = PyBytes_FromStringAndSize(data, length)
+    cdef ParserData app_data = <ParserData> parser.app_data
+    cdef object body_value
+    cdef size_t offset
+
+    if app_data.zero_copy:
+        # Body data always points into the buffer being executed
+        offset = data - app_data.base
+        body_value = app_data.view[offset:offset + length]
+    else:
+        body_value = PyBytes_FromStringAndSize(data, length)
+
     app_data.delegate.on_body(
         body_value,
         length,
@@ -71,6 +162,21 @@ cdef int on_message_complete(http_parser *parser) except -1:
 
 
 class ParserDelegate(object):
+    """
+    Receives parser events. Delegates may additionally define an
+    on_headers(headers) method. When present, the parser skips the per
+    header on_header_field and on_header_value calls and instead reports
+    every header at once as a list of (field, value) tuples right before
+    on_headers_complete.
+
+    Delegates with on_headers may also define on_header_block(block). It is
+    called right before on_headers with the same headers already serialized
+    as a string of "field: value\\r\\n" lines, in the order they were read.
+
+    Trailer fields that follow the last chunk of a chunked message are
+    reported with on_trailer, one call per field, right before
+    on_message_complete.
+    """
 
     def on_status(self, status_code):
         pass
@@ -96,6 +202,9 @@ class ParserDelegate(object):
     def on_body(self, bytes, length, is_chunked):
         pass
 
+    def on_trailer(self, field, value):
+        pass
+
     def on_message_complete(self, is_chunked, should_keep_alive):
         pass
 
@@ -103,18 +212,76 @@ class ParserDelegate(object):
 cdef class ParserData(object):
 
     cdef public object delegate
+    cdef public bint zero_copy
+    cdef bint header_block
+    cdef object view
+    cdef char *base
 
-    def __init__(self, object delegate):
+    def __init__(self, object delegate, bint zero_copy=False):
         self.delegate = delegate
+        self.zero_copy = zero_copy
+        self.header_block = hasattr(delegate, 'on_header_block')
 
 
 cdef class HttpEventParser(object):
+    """
+    Event driven HTTP parser. Data handed to execute may be any object that
+    supports the buffer protocol.
+
+    The parser buffers request lines and headers in memory that starts out
+    small and grows as needed, up to max_header_size bytes. Messages that
+    need more room than that fail to parse. Growth is given back once each
+    message has been read. max_header_size may not be less than
+    MIN_HEADER_SIZE.
+
+    When zero_copy is set, body fragments are handed to the delegate as
+    memoryview slices of the buffer passed to execute instead of being copied
+    into new bytes objects. These views are only valid for the duration of
+    the on_body callback; delegates that need to hold on to the data must
+    copy it or guarantee that the underlying buffer is not reused until they
+    are done with it.
+
+    When raw_chunks is set, the bodies of chunked messages are handed to
+    on_body exactly as they were read, chunk size lines, extensions, the
+    last chunk and trailers included, so that they may be forwarded without
+    being framed again. on_trailer is not called for these messages.
+    """
 
     cdef http_parser *_parser
     cdef http_parser_settings _settings
-    cdef object app_data
+    cdef ParserData app_data
+    cdef bint _executing
+
+    def __init__(self, object delegate, kind=_REQUEST_PARSER,
+                 bint zero_copy=False,
+                 size_t max_header_size=DEFAULT_MAX_HEADER_SIZE,
+                 bint raw_chunks=False):
+        # set callbacks
+        self._settings.on_req_method = <http_data_cb>on_req_method
+        self._settings.on_req_path = <http_data_cb>on_req_path
+        self._settings.on_http_version = <http_cb>on_http_version
+        self._settings.on_status = <http_cb>on_status
+        self._settings.on_header_field = <http_data_cb>on_header_field
+        self._settings.on_header_value = <http_data_cb>on_header_value
+        self._settings.on_headers_complete = <http_cb>on_headers_complete
+        self._settings.on_body = <http_data_cb>on_body
+        self._settings.on_message_complete = <http_cb>on_message_complete
+
+        self.reset(delegate, kind, zero_copy, max_header_size, raw_chunks)
+
+    def reset(self, object delegate, kind=_REQUEST_PARSER,
+              bint zero_copy=False,
+              size_t max_header_size=DEFAULT_MAX_HEADER_SIZE,
+              bint raw_chunks=False):
+        """
+        Readies the parser to read a new stream of messages of the given
+        kind for the given delegate. Anything the parser was in the middle
+        of reading is dropped. The parser keeps its allocations, apart from
+        any growth of its header buffer, so that it may be reused instead
+        of being recreated.
+        """
+        cdef http_parser_type parser_type
 
-    def __init__(self, object delegate, kind=_REQUEST_PARSER):
         # set parser type
         if kind == _REQUEST_PARSER:
             parser_type = HTTP_REQUEST
@@ -123,23 +290,35 @@ cdef class HttpEventParser(object):
         else:
             raise Exception('Kind must be 0 for requests or 1 for responses')
 
+        if self._executing:
+            raise Exception('Parser can not be reset while executing')
+
+        if max_header_size < MIN_HEADER_SIZE:
+            raise ValueError('max_header_size must be at least {0} '
+                             'bytes'.format(MIN_HEADER_SIZE))
+
         # initialize parser
-        self._parser = <http_parser *> malloc(sizeof(http_parser))
-        http_parser_init(self._parser, parser_type)
+        if self._parser == NULL:
+            self._parser = <http_parser *> malloc(sizeof(http_parser))
+            http_parser_init(self._parser, parser_type)
+        else:
+            http_parser_reset(self._parser, parser_type)
 
-        self.app_data = ParserData(delegate)
+        http_parser_set_max_header_size(self._parser, max_header_size)
+        http_parser_set_raw_chunks(self._parser, raw_chunks)
+
+        self.app_data = ParserData(delegate, zero_copy)
         self._parser.app_data = <void *>self.app_data
 
-        # set callbacks
-        self._settings.on_req_method = <http_data_cb>on_req_method
-        self._settings.on_req_path = <http_data_cb>on_req_path
-        self._settings.on_http_version = <http_cb>on_http_version
-        self._settings.on_status = <http_cb>on_status
-        self._settings.on_header_field = <http_data_cb>on_header_field
-        self._settings.on_header_value = <http_data_cb>on_header_value
-        self._settings.on_headers_complete = <http_cb>on_headers_complete
-        self._settings.on_body = <http_data_cb>on_body
-        self._settings.on_message_complete = <http_cb>on_message_complete
+        if hasattr(delegate, 'on_headers'):
+            self._settings.on_headers = <http_cb>on_headers
+        else:
+            self._settings.on_headers = NULL
+
+        if hasattr(delegate, 'on_trailer'):
+            self._settings.on_trailers = <http_cb>on_trailers
+        else:
+            self._settings.on_trailers = NULL
 
     def destroy(self):
         if self._parser != NULL:
@@ -150,18 +329,56 @@ cdef class HttpEventParser(object):
         self.destroy()
 
     def execute(self, object data):
-        cdef object strval
+        cdef Py_buffer buffer
 
-        if isinstance(data, str) or isinstance(data, bytes):
-            strval = data
-        else:
-            if isinstance(data, list) or isinstance(data, bytearray):
-                strval = str(data)
-            else:
-                raise Exception('Can not coerce type: {0} into str.'.format(
-                    type(data)))
+        if not PyObject_CheckBuffer(data):
+            raise Exception('Can not coerce type: {0} into str.'.format(
+                type(data)))
+
+        PyObject_GetBuffer(data, &buffer, PyBUF_SIMPLE)
+
+        self._executing = True
+
+        try:
+            if self.app_data.zero_copy:
+                # Streams already hand over views into their read buffers
+                if isinstance(data, memoryview):
+                    self.app_data.view = data
+                else:
+                    self.app_data.view = memoryview(data)
+                self.app_data.base = <char *> buffer.buf
+
+            self._execute(<char *> buffer.buf, buffer.len)
+        finally:
+            self._executing = False
+            self.app_data.view = None
+            self.app_data.base = NULL
+            PyBuffer_Release(&buffer)
+
+    def body_remaining(self):
+        """
+        Returns the number of body bytes left in the message being parsed
+        when its length is known up front. Returns 0 when the parser is not
+        reading a content-length delimited body.
+        """
+        if self._parser == NULL:
+            return 0
+        return http_body_remaining(self._parser)
+
+    def skip_body(self, size_t length):
+        """
+        Accounts for body bytes that were forwarded without being handed to
+        execute. The delegate gets no on_body events for these bytes but
+        on_message_complete is called once the whole body has been skipped.
+        """
+        cdef int retval
+
+        if self._parser == NULL:
+            raise Exception('Parser destroyed or not initialized!')
 
-        self._execute(strval, len(data))
+        retval = http_parser_skip_body(self._parser, &self._settings, length)
+        if retval:
+            raise Exception('Failed with errno: {0}'.format(retval))
 
     cdef int _execute(self, char *data, size_t length) except -1:
         cdef int retval
@@ -177,3 +394,61 @@ cdef class HttpEventParser(object):
             raise
 
         return 0
+
+
+class ParserPool(object):
+    """
+    A bounded free list of parsers. Parsers handed back to the pool are
+    reset and kept for reuse, up to max_idle of them, instead of being
+    freed. Pools are not shared between processes; each worker builds its
+    own.
+    """
+
+    def __init__(self, max_idle=_DEFAULT_MAX_IDLE_PARSERS):
+        self.max_idle = max_idle
+        self._idle = list()
+
+    def idle_count(self):
+        return len(self._idle)
+
+    def request_parser(self, parser_delegate, zero_copy=False,
+                       max_header_size=DEFAULT_MAX_HEADER_SIZE,
+                       raw_chunks=False):
+        return self._acquire(parser_delegate, _REQUEST_PARSER, zero_copy,
+                             max_header_size, raw_chunks)
+
+    def response_parser(self, parser_delegate, zero_copy=False,
+                        max_header_size=DEFAULT_MAX_HEADER_SIZE,
+                        raw_chunks=False):
+        return self._acquire(parser_delegate, _RESPONSE_PARSER, zero_copy,
+                             max_header_size, raw_chunks)
+
+    def release(self, parser):
+        """
+        Hands a parser back to the pool. The parser must not be executing
+        and must not be used again by the caller.
+        """
+        if len(self._idle) < self.max_idle:
+            # Drop the delegate ref while the parser sits idle
+            parser.reset(None)
+            self._idle.append(parser)
+        else:
+            parser.destroy()
+
+    def _acquire(self, parser_delegate, kind, zero_copy, max_header_size,
+                 raw_chunks):
+        if self._idle:
+            parser = self._idle.pop()
+
+            try:
+                parser.reset(parser_delegate, kind, zero_copy,
+                             max_header_size, raw_chunks)
+            except ValueError:
+                # Bad arguments leave the parser as it was
+                self._idle.append(parser)
+                raise
+
+            return parser
+
+        return HttpEventParser(
+            parser_delegate, kind, zero_copy, max_header_size, raw_chunks)
@@ -0,0 +1,97 @@
+try:
+    from httplib import responses as _REASON_PHRASES
+except ImportError:
+    from http.client import responses as _REASON_PHRASES
+
+from pyrox.about import VERSION
+
+from .model import HttpResponse
+
+
+"""
+Names of the templates Pyrox itself replies with.
+"""
+PYROX_ERROR = 'pyrox_error'
+UPSTREAM_UNAVAILABLE = 'upstream_unavailable'
+REJECTION = 'rejection'
+
+
+class ResponseTemplate(object):
+    """
+    A response that is serialized once, when the template is created, and
+    then handed out as the same immutable byte string every time it is sent.
+    Templates may be used anywhere an HttpResponse may be replied with.
+
+    :param status_code: the integer status code of the response.
+    :param body: an optional string to send as the response body.
+    :param headers: an optional list of (name, value) tuples to add to the
+                    response head.
+    """
+    def __init__(self, status_code, body=None, headers=None):
+        response = HttpResponse()
+        response.version = b'1.1'
+        response.status = '{0} {1}'.format(
+            status_code, _REASON_PHRASES.get(status_code, 'Unknown'))
+        response.header('Server').values.append('pyrox/{0}'.format(VERSION))
+
+        if headers is not None:
+            for name, value in headers:
+                response.header(name).values.append(value)
+
+        body = body or b''
+        response.header('Content-Length').values.append(str(len(body)))
+
+        self.status_code = status_code
+        self._bytes = bytes(response.to_bytes()) + body
+
+    def to_bytes(self):
+        return self._bytes
+
+
+_TEMPLATES = dict()
+
+
+def register_template(name, template):
+    """
+    Registers a response template under the given name, replacing any
+    template previously registered under it.
+    """
+    if not isinstance(template, ResponseTemplate):
+        raise TypeError('Only ResponseTemplate objects may be registered.')
+
+    _TEMPLATES[name] = template
+
+
+def get_template(name):
+    """
+    Returns the response template registered under the given name.
+    """
+    return _TEMPLATES[name]
+
+
+def _template_from_config(status_code, body):
+    if body:
+        return ResponseTemplate(
+            status_code, body, [('Content-Type', 'text/plain')])
+    return ResponseTemplate(status_code)
+
+
+def load_templates(templates_cfg):
+    """
+    Builds and registers the templates Pyrox replies with from the given
+    TemplatesConfiguration.
+    """
+    register_template(PYROX_ERROR, _template_from_config(
+        templates_cfg.pyrox_error_sc,
+        templates_cfg.pyrox_error_body))
+    register_template(UPSTREAM_UNAVAILABLE, _template_from_config(
+        templates_cfg.upstream_unavailable_sc,
+        templates_cfg.upstream_unavailable_body))
+    register_template(REJECTION, _template_from_config(
+        templates_cfg.rejection_sc,
+        templates_cfg.rejection_body))
+
+
+register_template(PYROX_ERROR, ResponseTemplate(502))
+register_template(UPSTREAM_UNAVAILABLE, ResponseTemplate(503))
+register_template(REJECTION, ResponseTemplate(400))
@@ -1,3 +1,4 @@
+from pyrox.http.parser import MIN_HEADER_SIZE
 from pyrox.util.config import (load_config, ConfigurationPart,
                                ConfigurationError)
 
@@ -6,21 +7,41 @@ _DEFAULTS = {
     'core': {
         'processes': 1,
         'enable_profiling': False,
-        'bind_host': 'localhost:8080'
+        'bind_host': 'localhost:8080',
+        'reuse_port': False,
+        'max_header_size': 81920,
+        'edge_triggered': False,
+        'min_recv_buffer_size': 4096,
+        'max_recv_buffer_size': 65536
     },
     'ssl': {
         'cert_file': None,
         'key_file': None
     },
     'routing': {
-        'upstream_hosts': None
+        'upstream_hosts': None,
+        'keepalive_max_idle': 16,
+        'keepalive_max_per_host': 0,
+        'keepalive_idle_timeout': 60,
+        'max_pipelined_requests': 1,
+        'balancer': 'round_robin',
+        'max_failures': 5,
+        'ejection_time': 10,
+        'max_ejection_time': 300,
+        'health_check_interval': 0,
+        'health_check_path': '/',
+        'health_check_timeout': 2
     },
     'pipeline': {
         'use_singletons': False
     },
     'templates': {
         'pyrox_error_sc': 502,
-        'rejection_sc': 400
+        'pyrox_error_body': None,
+        'upstream_unavailable_sc': 503,
+        'upstream_unavailable_body': None,
+        'rejection_sc': 400,
+        'rejection_body': None
     },
     'logging': {
         'console': True,
@@ -30,6 +51,9 @@ _DEFAULTS = {
 }
 
 
+_REENTRANT_SUFFIX = '.reentrant'
+
+
 def _split_and_strip(values_str, split_on):
     if split_on in values_str:
         return (value.strip() for value in values_str.split(split_on))
@@ -115,6 +139,74 @@ class CoreConfiguration(ConfigurationPart):
         """
         return self.get('bind_host')
 
+    @property
+    def reuse_port(self):
+        """
+        Returns a boolean value representing whether or not each Pyrox
+        process should bind its own listening socket with SO_REUSEPORT set
+        instead of every process accepting on one socket bound before
+        forking. This lets the kernel balance new connections across the
+        processes. This option requires SO_REUSEPORT support from the
+        platform. If unset, this defaults to False.
+        ::
+            reuse_port = True
+        """
+        return self.getboolean('reuse_port')
+
+    @property
+    def max_header_size(self):
+        """
+        Returns the largest number of bytes Pyrox buffers while reading the
+        request line and headers of a message. Parser buffers start out
+        small and only grow up to this size for messages that need it. It
+        may not be set below 256. If unset, this defaults to 81920.
+        ::
+            max_header_size = 16384
+        """
+        max_header_size = self.getint('max_header_size')
+
+        if max_header_size < MIN_HEADER_SIZE:
+            raise ConfigurationError(
+                'max_header_size must be at least {0} bytes'.format(
+                    MIN_HEADER_SIZE))
+
+        return max_header_size
+
+    @property
+    def edge_triggered(self):
+        """
+        Returns a boolean representing whether or not plain client and
+        upstream sockets are polled in edge triggered mode. Sockets are then
+        registered with epoll once instead of on every change of interest.
+        This only takes effect where the IOLoop uses epoll and never for SSL
+        sockets. If unset, this defaults to False.
+        ::
+            edge_triggered = True
+        """
+        return self.getboolean('edge_triggered')
+
+    @property
+    def min_recv_buffer_size(self):
+        """
+        Returns the number of bytes a connection starts out reading at a
+        time. Connections read with larger buffers while reads keep filling
+        them and fall back to this size once they do not. If unset, this
+        defaults to 4096.
+        ::
+            min_recv_buffer_size = 4096
+        """
+        return self.getint('min_recv_buffer_size')
+
+    @property
+    def max_recv_buffer_size(self):
+        """
+        Returns the largest number of bytes a connection reads at a time.
+        If unset, this defaults to 65536.
+        ::
+            max_recv_buffer_size = 262144
+        """
+        return self.getint('max_recv_buffer_size')
+
 
 class SSLConfiguration(ConfigurationPart):
     """
@@ -215,6 +307,14 @@ class PipelineConfiguration(ConfigurationPart):
             upstream = filter_1, filter_2
             downstream = filter_3
 
+    Filters that keep no per-request state may be marked as reentrant by
+    adding a boolean option named after the alias with a ".reentrant"
+    suffix. Reentrant filters are created once per Pyrox process and shared
+    by every pipeline instead of being created for every connection.
+    ::
+        [pipeline]
+            filter_1 = myfilters.upstream.Filter1
+            filter_1.reentrant = True
     """
     @property
     def use_singletons(self):
@@ -251,6 +351,23 @@ class PipelineConfiguration(ConfigurationPart):
         """
         return self._pipeline_for('downstream')
 
+    @property
+    def reentrant_filters(self):
+        """
+        Returns the set of filters that have been marked as reentrant. A
+        filter is marked as reentrant by setting the ".reentrant" option of
+        its alias to True. Filters are not reentrant unless marked.
+        ::
+            filter_1.reentrant = True
+        """
+        reentrant = set()
+        filters = self._filter_dict()
+
+        for pfalias, pfilter in filters.items():
+            if self.getboolean(pfalias + _REENTRANT_SUFFIX):
+                reentrant.add(pfilter)
+        return reentrant
+
     def _pipeline_for(self, stream):
         pipeline = list()
         filters = self._filter_dict()
@@ -266,13 +383,15 @@ class PipelineConfiguration(ConfigurationPart):
         for pfalias in self.options():
             if pfalias == 'downstream' or pfalias == 'upstream':
                 continue
+            if pfalias.endswith(_REENTRANT_SUFFIX):
+                continue
             filters[pfalias] = self.get(pfalias)
         return filters
 
 
 class TemplatesConfiguration(ConfigurationPart):
     """
-    Class mapping for the Pyrox teplates configuration section.
+    Class mapping for the Pyrox templates configuration section.
     ::
         # Templates section
         [templates]
@@ -288,6 +407,38 @@ class TemplatesConfiguration(ConfigurationPart):
         """
         return self.getint('pyrox_error_sc')
 
+    @property
+    def pyrox_error_body(self):
+        """
+        Returns the plain text body to send along with the status code set
+        for errors that happen within Pyrox. If left unset the response will
+        have no body.
+        ::
+            pyrox_error_body = Bad Gateway
+        """
+        return self.get('pyrox_error_body')
+
+    @property
+    def upstream_unavailable_sc(self):
+        """
+        Returns the status code to be set when there is no upstream host to
+        route a client request to. If left unset this option defaults to 503.
+        ::
+            upstream_unavailable_sc = 503
+        """
+        return self.getint('upstream_unavailable_sc')
+
+    @property
+    def upstream_unavailable_body(self):
+        """
+        Returns the plain text body to send along with the status code set
+        when there is no upstream host to route to. If left unset the response
+        will have no body.
+        ::
+            upstream_unavailable_body = Service Unavailable
+        """
+        return self.get('upstream_unavailable_body')
+
     @property
     def rejection_sc(self):
         """
@@ -299,6 +450,17 @@ class TemplatesConfiguration(ConfigurationPart):
         """
         return self.getint('rejection_sc')
 
+    @property
+    def rejection_body(self):
+        """
+        Returns the plain text body to send along with the default status
+        code for client request rejections. If left unset the response will
+        have no body.
+        ::
+            rejection_body = Bad Request
+        """
+        return self.get('rejection_body')
+
 
 class RoutingConfiguration(ConfigurationPart):
     """
@@ -322,3 +484,141 @@ class RoutingConfiguration(ConfigurationPart):
         if hosts is not None:
             return [host for host in _split_and_strip(hosts, ',')]
         return None
+
+    @property
+    def keepalive_max_idle(self):
+        """
+        Returns the maximum number of idle, kept-alive connections each Pyrox
+        process holds open against a single upstream host. Connections
+        returned to the pool past this limit are closed. If left unset this
+        option defaults to 16.
+        ::
+            keepalive_max_idle = 16
+        """
+        return self.getint('keepalive_max_idle')
+
+    @property
+    def keepalive_max_per_host(self):
+        """
+        Returns the maximum number of connections, idle or in use, each Pyrox
+        process may open against a single upstream host. Requests past this
+        limit wait for a connection to be returned to the pool. Setting this
+        option to 0 disables the limit. If left unset this option defaults
+        to 0.
+        ::
+            keepalive_max_per_host = 128
+        """
+        return self.getint('keepalive_max_per_host')
+
+    @property
+    def keepalive_idle_timeout(self):
+        """
+        Returns the number of seconds an idle upstream connection may be kept
+        alive in the pool before Pyrox closes it. If left unset this option
+        defaults to 60.
+        ::
+            keepalive_idle_timeout = 60
+        """
+        return self.getint('keepalive_idle_timeout')
+
+    @property
+    def max_pipelined_requests(self):
+        """
+        Returns the maximum number of pipelined requests from a single client
+        connection that Pyrox sends upstream at the same time, each over its
+        own upstream connection. Responses are always written back in the
+        order the requests were received in. If left unset this option
+        defaults to 1, which sends pipelined requests upstream one at a time.
+        ::
+            max_pipelined_requests = 8
+        """
+        return self.getint('max_pipelined_requests')
+
+    @property
+    def balancer(self):
+        """
+        Returns the name of the strategy each Pyrox process spreads requests
+        over the upstream hosts with. This may be one of:
+
+        round_robin         Each host in turn.
+        least_outstanding   The host with the fewest requests in flight.
+        peak_ewma           The host with the lowest expected latency, going
+                            by its recent latency and its requests in flight.
+        p2c                 The better of two hosts picked at random, compared
+                            the way peak_ewma compares them.
+
+        If left unset this option defaults to round_robin.
+        ::
+            balancer = peak_ewma
+        """
+        return self.get('balancer')
+
+    @property
+    def max_failures(self):
+        """
+        Returns the number of requests in a row that may fail against an
+        upstream host before it is ejected and no longer routed to. Requests
+        fail when the host can not be connected to, the connection breaks or
+        the host answers with a 5xx status code. Setting this option to 0
+        disables ejecting hosts for failed requests. If left unset this
+        option defaults to 5.
+        ::
+            max_failures = 5
+        """
+        return self.getint('max_failures')
+
+    @property
+    def ejection_time(self):
+        """
+        Returns the number of seconds an upstream host is ejected for the
+        first time. A host that fails again once it returns is ejected for
+        twice as long as the time before. If left unset this option defaults
+        to 10.
+        ::
+            ejection_time = 10
+        """
+        return self.getint('ejection_time')
+
+    @property
+    def max_ejection_time(self):
+        """
+        Returns the most seconds an upstream host may be ejected for. If left
+        unset this option defaults to 300.
+        ::
+            max_ejection_time = 300
+        """
+        return self.getint('max_ejection_time')
+
+    @property
+    def health_check_interval(self):
+        """
+        Returns the number of seconds between the health checks each Pyrox
+        process sends to every upstream host. Hosts that fail a health check
+        are ejected. Setting this option to 0 disables health checks. If
+        left unset this option defaults to 0.
+        ::
+            health_check_interval = 10
+        """
+        return self.getint('health_check_interval')
+
+    @property
+    def health_check_path(self):
+        """
+        Returns the path requested from upstream hosts to check their health.
+        Hosts pass the check by answering with a status code below 500. If
+        left unset this option defaults to /.
+        ::
+            health_check_path = /health
+        """
+        return self.get('health_check_path')
+
+    @property
+    def health_check_timeout(self):
+        """
+        Returns the number of seconds an upstream host has to answer a health
+        check before it fails the check. If left unset this option defaults
+        to 2.
+        ::
+            health_check_timeout = 2
+        """
+        return self.getint('health_check_timeout')
@@ -13,14 +13,25 @@ from tornado.process import cpu_count
 
 from pyrox.log import get_logger, get_log_manager
 from pyrox.filtering import HttpFilterPipeline
+from pyrox.filtering.pipeline import dispatch_plan
+from pyrox.http.templates import load_templates
 from pyrox.util.config import ConfigurationError
 from pyrox.server.config import load_pyrox_config
 from pyrox.server.proxyng import TornadoHttpProxy
+from pyrox.server.pool import UpstreamPool
+from pyrox.server.routing import BALANCERS, EjectionPolicy
+from pyrox.server.health import HealthChecker
+from pyrox.tstream.iostream import ReceiveBufferPool
 
 
 _LOG = get_logger(__name__)
 _active_children_pids = list()
 
+# Older Pythons do not export SO_REUSEPORT even where the kernel supports
+# it. On Linux the option has the value 15.
+_SO_REUSEPORT = getattr(socket, 'SO_REUSEPORT',
+                        15 if sys.platform.startswith('linux') else None)
+
 
 class FunctionWrapper(object):
 
@@ -59,6 +70,10 @@ def _resolve_filter_classes(cls_list):
         try:
             cls = getattr(module, cdef[cdef.rfind('.') + 1:])
             if inspect.isclass(cls):
+                # Compile the dispatch plan now rather than on the first
+                # connection
+                if dispatch_plan(cls).is_empty():
+                    _LOG.warning('Filter {0} handles no events'.format(cdef))
                 filter_cls_list.append(cls)
             elif inspect.isfunction(cls):
                 def create():
@@ -75,12 +90,28 @@ def _resolve_filter_classes(cls_list):
     return filter_cls_list
 
 
-def _build_plfactory_closure(filter_cls_list):
+def _build_plfactory_closure(filter_cls_list, shared_instances):
+    # Reentrant filters are created once and shared by every pipeline
+    def filter_for(cls):
+        shared = shared_instances.get(cls)
+        return shared if shared is not None else cls()
+
+    # A pipeline made only of reentrant filters holds no per-connection
+    # state so the same pipeline may be handed to every connection
+    if all(cls in shared_instances for cls in filter_cls_list):
+        pipeline = HttpFilterPipeline()
+        for cls in filter_cls_list:
+            pipeline.add_filter(shared_instances[cls])
+
+        def shared_filter_pipeline():
+            return pipeline
+        return shared_filter_pipeline
+
     # Closure for creation of new pipelines
     def new_filter_pipeline():
         pipeline = HttpFilterPipeline()
         for cls in filter_cls_list:
-            pipeline.add_filter(cls())
+            pipeline.add_filter(filter_for(cls))
         return pipeline
     return new_filter_pipeline
 
@@ -114,13 +145,55 @@ def _build_singleton_plfactories(config):
 
 
 def _build_plfactories(config):
+    reentrant_filters = config.pipeline.reentrant_filters
+    shared_instances = dict()
+
+    def resolve(cls_list):
+        filter_cls_list = _resolve_filter_classes(cls_list)
+
+        # Reentrant filters are instantiated once for this process
+        for cdef, cls in zip(cls_list, filter_cls_list):
+            if cdef in reentrant_filters and cls not in shared_instances:
+                shared_instances[cls] = cls()
+        return filter_cls_list
+
     upstream = _build_plfactory_closure(
-        _resolve_filter_classes(config.pipeline.upstream))
+        resolve(config.pipeline.upstream), shared_instances)
     downstream = _build_plfactory_closure(
-        _resolve_filter_classes(config.pipeline.downstream))
+        resolve(config.pipeline.downstream), shared_instances)
     return upstream, downstream
 
 
+def _bind_reuse_port_sockets(address, port, backlog=128):
+    """
+    Binds listening sockets with SO_REUSEPORT set so that every worker
+    process may bind its own sockets to the same address. The kernel then
+    balances new connections between the workers.
+    """
+    if _SO_REUSEPORT is None:
+        raise ConfigurationError(
+            'reuse_port is not supported on this platform')
+
+    sockets = list()
+    addrinfo = socket.getaddrinfo(address, port, socket.AF_UNSPEC,
+                                  socket.SOCK_STREAM, 0, socket.AI_PASSIVE)
+
+    for family, socktype, proto, canonname, sockaddr in set(addrinfo):
+        sock = socket.socket(family, socktype, proto)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.setsockopt(socket.SOL_SOCKET, _SO_REUSEPORT, 1)
+
+        if family == socket.AF_INET6 and hasattr(socket, 'IPPROTO_IPV6'):
+            sock.setsockopt(socket.IPPROTO_IPV6, socket.IPV6_V6ONLY, 1)
+
+        sock.setblocking(0)
+        sock.bind(sockaddr)
+        sock.listen(backlog)
+        sockets.append(sock)
+
+    return sockets
+
+
 def start_proxy(sockets, config):
     # Take over SIGTERM and SIGINT
     signal.signal(signal.SIGTERM, stop_child)
@@ -141,6 +214,9 @@ def start_proxy(sockets, config):
         _LOG.exception(ex)
         return -1
 
+    # Serialize the responses Pyrox replies with
+    load_templates(config.templates)
+
     # Load any SSL configurations
     ssl_options = None
 
@@ -154,11 +230,40 @@ def start_proxy(sockets, config):
 
         _LOG.debug('SSL enabled: {0}'.format(ssl_options))
 
+    # Each process keeps its own pool of kept-alive upstream connections
+    upstream_pool = UpstreamPool(
+        max_idle_per_host=config.routing.keepalive_max_idle,
+        max_per_host=config.routing.keepalive_max_per_host,
+        idle_timeout=config.routing.keepalive_idle_timeout)
+
+    # Connections draw the buffers they read into from a per-process pool
+    recv_buffers = ReceiveBufferPool(
+        config.core.min_recv_buffer_size,
+        config.core.max_recv_buffer_size)
+
     # Create proxy server ref
     http_proxy = TornadoHttpProxy(
         filter_pipeline_factories,
         config.routing.upstream_hosts,
-        ssl_options)
+        ssl_options,
+        upstream_pool,
+        config.routing.max_pipelined_requests,
+        config.core.max_header_size,
+        config.core.edge_triggered,
+        recv_buffers,
+        config.routing.balancer,
+        EjectionPolicy(
+            config.routing.max_failures,
+            config.routing.ejection_time,
+            config.routing.max_ejection_time))
+
+    # Each process checks the health of the upstream hosts for itself
+    if config.routing.health_check_interval > 0:
+        HealthChecker(
+            http_proxy.router,
+            config.routing.health_check_interval,
+            config.routing.health_check_path,
+            config.routing.health_check_timeout).start()
 
     # Add our sockets for watching
     http_proxy.add_sockets(sockets)
@@ -182,14 +287,30 @@ def start_pyrox(cfg=None, cfg_location=None):
     if len(bind_host) != 2:
         raise ConfigurationError('bind_host must have a port specified')
 
+    if not (0 < config.core.min_recv_buffer_size <=
+            config.core.max_recv_buffer_size):
+        raise ConfigurationError(
+            'min_recv_buffer_size must be positive and no larger than '
+            'max_recv_buffer_size')
+
+    if config.routing.balancer not in BALANCERS:
+        raise ConfigurationError('Unknown balancer: {0}'.format(
+            config.routing.balancer))
+
+    # With reuse_port set each worker binds its own sockets after it has
+    # been forked. Profiling runs a single process so there is nothing to
+    # balance.
+    reuse_port = config.core.reuse_port and not config.core.enable_profiling
+
     # Bind the sockets in the main process
     sockets = None
 
-    try:
-        sockets = bind_sockets(port=bind_host[1], address=bind_host[0])
-    except Exception as ex:
-        _LOG.exception(ex)
-        return
+    if not reuse_port:
+        try:
+            sockets = bind_sockets(port=bind_host[1], address=bind_host[0])
+        except Exception as ex:
+            _LOG.exception(ex)
+            return
 
     # Bind the server port(s)
     _LOG.info('Pyrox listening on: http://{0}:{1}'.format(
@@ -221,6 +342,15 @@ you run Pyrox in production with this feature enabled.
         pid = os.fork()
         if pid == 0:
             _LOG.info('Starting process {0}'.format(i))
+
+            if reuse_port:
+                try:
+                    sockets = _bind_reuse_port_sockets(
+                        bind_host[0], bind_host[1])
+                except Exception as ex:
+                    _LOG.exception(ex)
+                    sys.exit(1)
+
             start_proxy(sockets, config)
             sys.exit(0)
         else:
@@ -0,0 +1,152 @@
+import socket
+
+from datetime import timedelta
+
+from tornado.ioloop import IOLoop, PeriodicCallback
+
+from pyrox.log import get_logger
+from pyrox.tstream.iostream import SocketIOHandler, SSLSocketIOHandler
+
+from .routing import PROTOCOL_HTTPS
+
+
+_LOG = get_logger(__name__)
+
+
+"""
+Format of the request sent to probe an upstream target.
+"""
+_PROBE_REQUEST = ('GET {0} HTTP/1.1\r\n'
+                  'Host: {1}:{2}\r\n'
+                  'Connection: close\r\n'
+                  '\r\n')
+
+
+"""
+Most bytes read from a target while looking for the end of the status line
+of its answer to a probe.
+"""
+_MAX_STATUS_LINE = 4096
+
+
+def _status_code(status_line):
+    parts = status_line.split(' ', 2)
+
+    if len(parts) < 2 or not parts[0].startswith('HTTP/'):
+        return None
+
+    try:
+        return int(parts[1])
+    except ValueError:
+        return None
+
+
+class HealthChecker(object):
+    """
+    Actively checks the default routes of a router by sending each of them a
+    GET request for path every interval seconds. Targets that answer with a
+    status code below 500 pass the check. Targets that can't be resolved,
+    refuse the connection, answer with a 5xx or take longer than timeout
+    seconds to answer fail it and are ejected from the router. Ejected
+    targets are not probed again until their ejection runs out.
+
+    :param router: The RoutingHandler whose routes are checked.
+    :param interval: The number of seconds between rounds of probes.
+    :param path: The path requested from every target.
+    :param timeout: The number of seconds a target has to answer a probe.
+    """
+    def __init__(self, router, interval=10, path='/', timeout=2,
+                 io_loop=None):
+        self._io_loop = io_loop or IOLoop.current()
+        self._router = router
+        self._interval = interval
+        self._path = path
+        self._timeout = timedelta(seconds=timeout)
+        self._probing = set()
+        self._periodic = None
+
+    def start(self):
+        if self._periodic is None:
+            self._periodic = PeriodicCallback(
+                self.check, self._interval * 1000, self._io_loop)
+            self._periodic.start()
+
+    def stop(self):
+        if self._periodic is not None:
+            self._periodic.stop()
+            self._periodic = None
+
+    def check(self):
+        """
+        Probes every route that is not ejected or being probed already.
+        """
+        for target in self._router.routes:
+            if target not in self._probing and self._router.available(target):
+                self.probe(target)
+
+    def probe(self, target):
+        host, port, protocol = target
+
+        try:
+            family, socktype, proto, _, address = socket.getaddrinfo(
+                host, port, socket.AF_UNSPEC, socket.SOCK_STREAM)[0]
+        except socket.gaierror as ex:
+            _LOG.warning('Upstream {0}:{1} could not be resolved for its '
+                         'health check: {2}; ejecting it'.format(
+                             host, port, ex))
+            self._router.mark_probed(target, False)
+            return
+
+        sock = socket.socket(family, socktype, proto)
+
+        if protocol == PROTOCOL_HTTPS:
+            stream = SSLSocketIOHandler(sock, io_loop=self._io_loop)
+        else:
+            stream = SocketIOHandler(sock, io_loop=self._io_loop)
+
+        self._probing.add(target)
+        received = bytearray()
+        timeout = None
+
+        def finish(status_code):
+            if target not in self._probing:
+                return
+
+            self._probing.discard(target)
+            self._io_loop.remove_timeout(timeout)
+
+            stream.on_close(None)
+            stream.on_error(None)
+            stream.close()
+
+            healthy = status_code is not None and status_code < 500
+
+            if not healthy:
+                _LOG.warning('Upstream {0}:{1} failed its health check; '
+                             'ejecting it'.format(host, port))
+
+            self._router.mark_probed(target, healthy)
+
+        def on_read(data):
+            received.extend(data)
+            end = received.find(b'\r\n')
+
+            if end >= 0:
+                finish(_status_code(bytes(received[:end])))
+            elif len(received) >= _MAX_STATUS_LINE:
+                finish(None)
+
+        def on_connect():
+            stream.read(on_read)
+            stream.write(_PROBE_REQUEST.format(self._path, host, port))
+
+        stream.on_close(lambda: finish(None))
+        stream.on_error(lambda error: finish(None))
+        timeout = self._io_loop.add_timeout(
+            self._timeout, lambda: finish(None))
+
+        try:
+            stream.connect(address, on_connect)
+        except Exception as ex:
+            _LOG.exception(ex)
+            finish(None)
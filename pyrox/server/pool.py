@@ -0,0 +1,202 @@
+import collections
+
+from datetime import timedelta
+
+from tornado.ioloop import IOLoop
+
+from pyrox.log import get_logger
+
+
+_LOG = get_logger(__name__)
+
+
+class UpstreamPool(object):
+    """
+    A per-worker pool of kept-alive upstream streams. Streams are keyed by
+    the (host, port, protocol) target tuple produced by the router and may be
+    handed to any client connection that needs to talk to the same target.
+
+    :param max_idle_per_host: The maximum number of idle streams kept for a
+                              single target. Streams released past this
+                              limit are closed.
+    :param max_per_host: The maximum number of streams, idle or in use, that
+                         may be open against a single target. Connection
+                         requests past this limit wait for a stream to be
+                         released. A value of 0 disables the limit.
+    :param idle_timeout: The number of seconds an idle stream may sit in the
+                         pool before it is closed and evicted.
+    """
+    def __init__(self, max_idle_per_host=16, max_per_host=0,
+                 idle_timeout=60, io_loop=None):
+        self._io_loop = io_loop or IOLoop.current()
+        self._max_idle_per_host = max_idle_per_host
+        self._max_per_host = max_per_host
+        self._idle_timeout = timedelta(seconds=idle_timeout)
+
+        self._idle = dict()
+        self._in_use = dict()
+        self._waiters = dict()
+
+    def idle_count(self, target):
+        idle = self._idle.get(target)
+        return len(idle) if idle else 0
+
+    def in_use_count(self, target):
+        return self._in_use.get(target, 0)
+
+    def acquire(self, target, callback):
+        """
+        Checks out a stream for the given target. The callback is called with
+        a live, idle stream if one is available. If there are no idle streams,
+        the callback is called with None and the caller is expected to open a
+        new connection. Callers that would exceed the per-target limit are
+        queued and called back once a stream is released or discarded.
+
+        Every successful acquire must be matched by either release or discard.
+        """
+        idle = self._idle.get(target)
+
+        while idle:
+            # Most recently used streams are the least likely to have been
+            # timed out by the origin
+            stream, timeout = idle.pop()
+            self._io_loop.remove_timeout(timeout)
+            self._detach(stream)
+
+            if stream.peer_connected():
+                self._check_out(target)
+                callback(stream)
+                return
+
+            stream.close()
+
+        if 0 < self._max_per_host <= self.in_use_count(target):
+            self._waiters.setdefault(
+                target, collections.deque()).append(callback)
+        else:
+            self._check_out(target)
+            callback(None)
+
+    def release(self, target, stream):
+        """
+        Returns a kept-alive stream to the pool. The stream is handed to the
+        next waiter for the target if there is one, otherwise it is parked
+        until it is acquired again, times out or is closed by the origin.
+        """
+        self._check_in(target)
+
+        if stream.closed():
+            self._wake_waiter(target)
+            return
+
+        waiters = self._waiters.get(target)
+        if waiters:
+            self._check_out(target)
+            waiters.popleft()(stream)
+            return
+
+        idle = self._idle.setdefault(target, collections.deque())
+        if len(idle) >= self._max_idle_per_host:
+            self._detach(stream)
+            stream.close()
+            return
+
+        self._park(target, stream, idle)
+
+    def discard(self, target):
+        """
+        Gives up a checked out slot for the target without returning a
+        stream. This must be called when a checked out stream is closed or
+        fails to connect.
+        """
+        self._check_in(target)
+        self._wake_waiter(target)
+
+    def cancel(self, target, callback):
+        """
+        Takes a callback that is still waiting on a stream for the target out
+        of the queue. Returns False if the callback was not waiting, in which
+        case it was already called and holds a slot.
+        """
+        waiters = self._waiters.get(target)
+
+        if waiters:
+            try:
+                waiters.remove(callback)
+                return True
+            except ValueError:
+                pass
+        return False
+
+    def close(self):
+        """
+        Closes all idle streams held by this pool.
+        """
+        for idle in self._idle.values():
+            while idle:
+                stream, timeout = idle.pop()
+                self._io_loop.remove_timeout(timeout)
+                self._detach(stream)
+                stream.close()
+
+    def _check_out(self, target):
+        self._in_use[target] = self.in_use_count(target) + 1
+
+    def _check_in(self, target):
+        in_use = self.in_use_count(target) - 1
+
+        if in_use > 0:
+            self._in_use[target] = in_use
+        elif target in self._in_use:
+            del self._in_use[target]
+
+    def _wake_waiter(self, target):
+        waiters = self._waiters.get(target)
+
+        if waiters:
+            self._check_out(target)
+            waiters.popleft()(None)
+
+    def _park(self, target, stream, idle):
+        def on_timeout():
+            _LOG.debug('Evicting idle upstream stream for {0}'.format(target))
+            self._evict(target, stream, close=True)
+
+        def on_close():
+            self._evict(target, stream)
+
+        def on_error(error):
+            self._evict(target, stream, close=True)
+
+        def on_read(data):
+            # Origins must not send anything on an idle connection
+            self._evict(target, stream, close=True)
+
+        stream.on_close(on_close)
+        stream.on_error(on_error)
+        stream.read(on_read)
+
+        timeout = self._io_loop.add_timeout(self._idle_timeout, on_timeout)
+        idle.append((stream, timeout))
+
+    def _evict(self, target, stream, close=False):
+        idle = self._idle.get(target)
+
+        if idle:
+            for entry in idle:
+                if entry[0] is stream:
+                    idle.remove(entry)
+                    self._io_loop.remove_timeout(entry[1])
+                    break
+
+        self._detach(stream)
+
+        if close and not stream.closed():
+            stream.close()
+
+    def _detach(self, stream):
+        stream.on_close(None)
+        stream.on_error(None)
+
+        if not stream.closed():
+            stream.handle.disable_reading()
@@ -1,19 +1,25 @@
+import collections
 import socket
+import time
 
 import tornado
 import tornado.ioloop
 import tornado.process
 
-from .routing import RoundRobinRouter, PROTOCOL_HTTP, PROTOCOL_HTTPS
+from .routing import (new_router, EjectionPolicy, PROTOCOL_HTTP,
+                      PROTOCOL_HTTPS)
+from .pool import UpstreamPool
 
 from pyrox.tstream.iostream import (SSLSocketIOHandler, SocketIOHandler,
-                                    StreamClosedError)
+                                    StreamClosedError, ReceiveBufferPool)
 from pyrox.tstream.tcpserver import TCPServer
 
 from pyrox.log import get_logger
-from pyrox.about import VERSION
-from pyrox.http import (HttpRequest, HttpResponse, RequestParser,
-                        ResponseParser, ParserDelegate)
+from pyrox.http import (HttpRequest, HttpResponse, ParserDelegate,
+                        ParserPool)
+from pyrox.http.parser import DEFAULT_MAX_HEADER_SIZE
+from pyrox.http.templates import (get_template, PYROX_ERROR,
+                                  UPSTREAM_UNAVAILABLE)
 import traceback
 
 _LOG = get_logger(__name__)
@@ -26,36 +32,82 @@ _CHUNK_CLOSE = b'0\r\n\r\n'
 
 
 """
-Default return object on error. This should be configurable.
+Format of the size line that opens an HTTP chunked encoding chunk and the
+line ending that closes it.
 """
-_BAD_GATEWAY_RESP = HttpResponse()
-_BAD_GATEWAY_RESP.version = b'1.1'
-_BAD_GATEWAY_RESP.status = '502 Bad Gateway'
-_BAD_GATEWAY_RESP.header('Server').values.append('pyrox/{0}'.format(VERSION))
-_BAD_GATEWAY_RESP.header('Content-Length').values.append('0')
+_CHUNK_SIZE_LINE = b'%x\r\n'
+_CRLF = b'\r\n'
+_TRAILER_SEPARATOR = b': '
+
+
+"""
+Smallest number of body bytes left in a message for it to be worth
+forwarding the rest of the body with splice(2).
+"""
+_SPLICE_MIN_BODY = 65536
+
+
+"""
+Largest number of bytes of a response to a pipelined request held in memory
+while the responses to earlier requests are being written. Reading the
+response from upstream stops once this much is held.
+"""
+_MAX_HELD_RESPONSE = 1048576
+
+
+"""
+Largest number of bytes of a request body held in memory while the
+upstream connection for the request is not live yet. Reading the request
+from downstream stops once this much is held.
+"""
+_MAX_HELD_REQUEST = 65536
+
 
 """
-Default return object on no route or upstream not responding. This should
-be configurable.
+Parsers are reused across connections handled by this process.
 """
-_UPSTREAM_UNAVAILABLE = HttpResponse()
-_UPSTREAM_UNAVAILABLE.version = b'1.1'
-_UPSTREAM_UNAVAILABLE.status = '503 Service Unavailable'
-_UPSTREAM_UNAVAILABLE.header('Server').values.append('pyrox/{0}'.format(VERSION))
-_UPSTREAM_UNAVAILABLE.header('Content-Length').values.append('0')
+_PARSER_POOL = ParserPool()
+
+
+def _release_parser(parser):
+    # Parsers may be released from inside one of their own callbacks so
+    # they only go back to the pool once the current callback is done
+    tornado.ioloop.IOLoop.current().add_callback(_PARSER_POOL.release, parser)
+
+
+def _body_bytes(data):
+    # Body fragments from the parsers are views into the read buffer that
+    # only live as long as the parser callback; filters get their own copy.
+    if isinstance(data, memoryview):
+        return data.tobytes()
+    return data
 
 
-def _write_to_stream(stream, data, is_chunked, callback=None):
+def _write_to_stream(stream, data, is_chunked):
     if is_chunked:
-        # Format and write this chunk
-        chunk = bytearray()
-        chunk.extend(hex(len(data))[2:])
-        chunk.extend('\r\n')
-        chunk.extend(data)
-        chunk.extend('\r\n')
-        stream.write(chunk, callback)
+        # Queue the chunk framing around the data rather than copying it
+        # into a new buffer. The stream sends all three in one go.
+        stream.write(_CHUNK_SIZE_LINE % len(data))
+        stream.write(data)
+        stream.write(_CRLF)
     else:
-        stream.write(data, callback)
+        stream.write(data)
+
+
+def _last_chunk(trailers):
+    if not trailers:
+        return _CHUNK_CLOSE
+
+    last_chunk = bytearray(b'0\r\n')
+
+    for field, value in trailers:
+        last_chunk.extend(field)
+        last_chunk.extend(_TRAILER_SEPARATOR)
+        last_chunk.extend(value)
+        last_chunk.extend(_CRLF)
+
+    last_chunk.extend(_CRLF)
+    return bytes(last_chunk)
 
 
 class AccumulationStream(object):
@@ -75,26 +127,64 @@ class ProxyHandler(ParserDelegate):
     Common class for the stream handlers. This parent class manages the
     following:
 
-    - Handling of header field names.
+    - Collecting the message headers reported by the parser.
+    - Collecting the trailers that follow a chunked message body.
     - Tracking rejection of message sessions.
+
+    When raw_chunks is set, the parser feeding the handler hands over
+    chunked bodies with their framing and they are forwarded as is.
     """
-    def __init__(self, filter_pl, http_msg):
+    def __init__(self, filter_pl, http_msg, raw_chunks):
         self._filter_pl = filter_pl
         self._http_msg = http_msg
+        self._raw_chunks = raw_chunks
         self._chunked = False
-        self._last_header_field = None
         self._intercepted = False
+        self._trailers = list()
+        self._header_block = None
 
     def on_http_version(self, major, minor):
         self._http_msg.version = '{0}.{1}'.format(major, minor)
 
-    def on_header_field(self, field):
-        self._last_header_field = field
-
-    def on_header_value(self, value):
-        header = self._http_msg.header(self._last_header_field)
-        header.values.append(value)
-        self._last_header_field = None
+    def raw_chunks(self):
+        """
+        Returns True if chunked bodies should be read with their framing
+        so that they may be forwarded without being framed again.
+        """
+        return self._raw_chunks
+
+    def frames_body(self, is_chunked):
+        """
+        Returns True if the body of the current message has to be written
+        out in chunks framed by the proxy.
+        """
+        return (is_chunked or self._chunked) and not self._raw_chunks
+
+    def passes_body_through(self):
+        """
+        Returns True if the body of the current message may be forwarded
+        as is, without being seen by the filter pipeline or reframed.
+        """
+        return not (self._intercepted or self._chunked)
+
+    def on_header_block(self, block):
+        self._header_block = block
+
+    def on_headers(self, headers):
+        # Untouched headers are written out straight from the block
+        self._http_msg.load_headers(headers, self._header_block)
+        self._header_block = None
+
+    def on_trailer(self, field, value):
+        self._trailers.append((field, value))
+
+    def take_trailers(self):
+        """
+        Returns the trailers of the current message and forgets them.
+        """
+        trailers = self._trailers
+        self._trailers = list()
+        return trailers
 
 
 class DownstreamHandler(ProxyHandler):
@@ -104,19 +194,41 @@ class DownstreamHandler(ProxyHandler):
     proxy.
     """
 
-    def __init__(self, downstream, filter_pl, connect_upstream):
-        super(DownstreamHandler, self).__init__(filter_pl, HttpRequest())
+    def __init__(self, downstream, filter_pl, open_exchange,
+                 on_request_complete):
+        # Chunks are only reframed when body filters may change them
+        super(DownstreamHandler, self).__init__(
+            filter_pl, HttpRequest(), not filter_pl.intercepts_req_body())
         self._downstream = downstream
-        self._upstream = None
-        self._preread_body = None
-        self._connect_upstream = connect_upstream
-
-    def _store_chunk(self, body_fragment):
-        if not self._preread_body:
-            self._preread_body = bytearray()
-        self._preread_body.extend(body_fragment)
+        self._exchange = None
+        self._open_exchange = open_exchange
+        self._on_request_complete = on_request_complete
+        self._reading_message = False
+
+    def reading_message(self):
+        """
+        Returns True if a request is being read from downstream and has not
+        been completely received yet.
+        """
+        return self._reading_message
+
+    def exchange(self):
+        """
+        Returns the exchange of the request most recently read from
+        downstream.
+        """
+        return self._exchange
+
+    def passes_body_through(self):
+        return (self._exchange is not None and
+                self._exchange.upstream is not None and
+                not self._filter_pl.intercepts_req_body() and
+                super(DownstreamHandler, self).passes_body_through())
 
     def on_req_method(self, method):
+        self._reading_message = True
+        self._chunked = False
+        self._intercepted = False
         self._http_msg.method = method
 
     def on_req_path(self, url):
@@ -141,65 +253,57 @@ class DownstreamHandler(ProxyHandler):
         if action.intercepts_request():
             self._intercepted = True
             self._response_tuple = action.payload
+            self._exchange = self._open_exchange(None)
         else:
-            # Hold up on the client side until we're done negotiating
-            # connections.
-            self._downstream.handle.disable_reading()
-
-            # We're routing to upstream; we need to know where to go
+            # The body keeps being read while upstream connects; the
+            # exchange holds on to a bounded amount of it
             if action.is_routing():
-                self._connect_upstream(self._http_msg, action.payload)
+                self._exchange = self._open_exchange(
+                    self._http_msg, action.payload)
             else:
-                self._connect_upstream(self._http_msg)
+                self._exchange = self._open_exchange(self._http_msg)
 
     def on_body(self, bytes, length, is_chunked):
-        self._chunked = is_chunked
-
-        if self._downstream.reading():
-            # Hold up on the client side until we're done with this chunk
-            self._downstream.handle.disable_reading()
+        # Body filters may have already switched the request to chunked
+        self._chunked = self._chunked or is_chunked
 
         # Rejections simply discard the body
-        if not self._intercepted:
-            accumulator = AccumulationStream()
-            data = bytes
+        if self._exchange.discards_body():
+            return
 
-            self._filter_pl.on_request_body(data, accumulator)
+        data = bytes
+
+        if self._filter_pl.intercepts_req_body():
+            accumulator = AccumulationStream()
+            self._filter_pl.on_request_body(_body_bytes(data), accumulator)
 
             if accumulator.size() > 0:
                 data = accumulator.bytes
 
-            if self._upstream:
-                # When we write to the stream set the callback to resume
-                # reading from downstream.
-                _write_to_stream(self._upstream, data, is_chunked,
-                                 self._downstream.handle.resume_reading)
-            else:
-                # If we're not connected upstream, store the fragment
-                # for later
-                self._store_chunk(data)
-
-    def on_upstream_connect(self, upstream):
-        self._upstream = upstream
+        # Body views are queued upstream as they are
+        if isinstance(data, memoryview):
+            self._downstream.keep_read_buffer()
 
-        if self._preread_body and len(self._preread_body) > 0:
-            _write_to_stream(self._upstream, self._preread_body,
-                             self._chunked,
-                             self._downstream.handle.resume_reading)
-            self._preread_body = None
+        # Reading from downstream pauses if upstream falls behind
+        self._exchange.send(data, self.frames_body(is_chunked))
 
     def on_message_complete(self, is_chunked, keep_alive):
+        self._reading_message = False
+
         # Enable reading when we're ready later
         self._downstream.handle.disable_reading()
 
-        if keep_alive:
-            self._http_msg = HttpRequest()
+        # Pipelined requests that follow are held by their own exchanges
+        self._http_msg = HttpRequest()
+        trailers = self.take_trailers()
 
         if self._intercepted:
-            self._downstream.write(self._response_tuple[0].to_bytes())
-        elif is_chunked or self._chunked:
-            # Finish the last chunk.
-            self._upstream.write(_CHUNK_CLOSE)
+            self._exchange.reply(self._response_tuple[0].to_bytes())
+        else:
+            self._exchange.finish_request(
+                self.frames_body(is_chunked), trailers)
+
+        self._on_request_complete(keep_alive)
 
 
 class UpstreamHandler(ProxyHandler):
@@ -209,14 +313,29 @@ class UpstreamHandler(ProxyHandler):
     proxy.
     """
 
-    def __init__(self, downstream, upstream, filter_pl):
-        super(UpstreamHandler, self).__init__(filter_pl, HttpResponse())
+    def __init__(self, downstream, upstream, filter_pl, on_complete):
+        super(UpstreamHandler, self).__init__(
+            filter_pl, HttpResponse(), not filter_pl.intercepts_resp_body())
         self._downstream = downstream
         self._upstream = upstream
+        self._on_complete = on_complete
+        self._paused = False
+        self.status_code = None
+
+    def upstream(self):
+        """
+        Returns the upstream stream the response is being read from.
+        """
+        return self._upstream
 
     def on_status(self, status_code):
+        self.status_code = status_code
         self._http_msg.status = str(status_code)
 
+    def passes_body_through(self):
+        return (not self._filter_pl.intercepts_resp_body() and
+                super(UpstreamHandler, self).passes_body_through())
+
     def on_headers_complete(self):
         action = self._filter_pl.on_response_head(self._http_msg)
 
@@ -231,7 +350,7 @@ class UpstreamHandler(ProxyHandler):
 
                 self._http_msg.header('transfer-encoding').values.append('chunked')
 
-        if action.is_rejecting():
+        if action.is_replying():
             self._intercepted = True
             self._response_tuple = action.payload
         else:
@@ -240,66 +359,153 @@ class UpstreamHandler(ProxyHandler):
     def on_body(self, bytes, length, is_chunked):
         # Rejections simply discard the body
         if not self._intercepted:
-            accumulator = AccumulationStream()
             data = bytes
 
-            self._filter_pl.on_response_body(data, accumulator)
+            if self._filter_pl.intercepts_resp_body():
+                accumulator = AccumulationStream()
+                self._filter_pl.on_response_body(
+                    _body_bytes(data), accumulator)
 
-            if accumulator.size() > 0:
-                data = accumulator.bytes
+                if accumulator.size() > 0:
+                    data = accumulator.bytes
 
-            # Hold up on the upstream side until we're done sending this chunk
-            self._upstream.handle.disable_reading()
+            # Body views are queued downstream as they are
+            if isinstance(data, memoryview):
+                self._upstream.keep_read_buffer()
 
-            # When we write to the stream set the callback to resume
-            # reading from upstream.
             _write_to_stream(
-                self._downstream,
-                data,
-                is_chunked or self._chunked,
-                self._upstream.handle.resume_reading)
+                self._downstream, data, self.frames_body(is_chunked))
+
+            # Stop reading from upstream while downstream falls behind
+            if self._downstream.write_buffer_full() and not self._paused:
+                self._paused = True
+                self._upstream.handle.disable_reading()
+                self._downstream.on_drain(self._on_drain)
+
+    def _on_drain(self):
+        if self._paused:
+            self._paused = False
+            self._upstream.handle.resume_reading()
 
     def on_message_complete(self, is_chunked, keep_alive):
-        callback = self._upstream.close
+        self._paused = False
         self._upstream.handle.disable_reading()
 
         if keep_alive:
             self._http_msg = HttpResponse()
-            callback = self._downstream.handle.resume_reading
+        trailers = self.take_trailers()
+
+        # Let the connection decide what happens to the upstream stream once
+        # the response has been written out
+        def callback():
+            self._on_complete(keep_alive)
 
         if self._intercepted:
-            # Serialize our message to them
-            self._downstream.write(self._http_msg.to_bytes(), callback)
-        elif is_chunked or self._chunked:
-            # Finish the last chunk.
-            self._downstream.write(_CHUNK_CLOSE, callback)
+            # Serialize the reply the filter gave us
+            self._downstream.write(
+                self._response_tuple[0].to_bytes(), callback)
+        elif self.frames_body(is_chunked):
+            # Finish the last chunk, passing on any trailers.
+            self._downstream.write(_last_chunk(trailers), callback)
         else:
             callback()
 
 
 class ConnectionTracker(object):
-
-    def __init__(self, on_stream_live, on_target_closed, on_target_error):
-        self._streams = dict()
+    """
+    Tracks the upstream stream a client connection is currently using.
+    Streams are checked out of the shared upstream pool when a request needs
+    to be proxied and are handed back to the pool once the response is
+    complete and the origin has agreed to keep the connection alive.
+    """
+    def __init__(self, pool, on_stream_live, on_target_closed,
+                 on_target_error, edge_triggered=False, recv_buffers=None):
+        self._pool = pool
+        self._edge_triggered = edge_triggered
+        self._recv_buffers = recv_buffers
+        self._stream = None
         self._target_in_use = None
+        self._slot_held = False
         self._on_stream_live = on_stream_live
         self._on_target_closed = on_target_closed
         self._on_target_error = on_target_error
 
     def destroy(self):
-        for stream in self._streams.values():
-            if not stream.closed():
+        if self._target_in_use is not None:
+            stream = self._stream
+            self._forget()
+
+            if stream is not None and not stream.closed():
                 stream.close()
 
     def connect(self, target):
+        if self._target_in_use is not None:
+            if self._target_in_use == target and self._stream is not None:
+                # Make the cb ourselves since the socket's already connected
+                self._on_stream_live(self._stream)
+                return
+
+            # We're switching targets; the old stream can't be trusted
+            self.destroy()
+
         self._target_in_use = target
-        live_stream = self._streams.get(target)
+        self._pool.acquire(target, self._on_acquired)
+
+    def release(self, keep_alive):
+        """
+        Hands the stream in use back to the pool if it may be kept alive,
+        otherwise closes it. Closing a stream this way does not notify the
+        client connection.
+        """
+        if self._target_in_use is None:
+            return
 
-        if live_stream:
-            # Make the cb ourselves since the socket's already connected
-            self._on_stream_live(live_stream)
+        if not self._slot_held:
+            # Still waiting on the pool; there is nothing to hand back
+            self._forget()
+            return
+
+        target = self._target_in_use
+        stream = self._stream
+        self._target_in_use = None
+        self._stream = None
+        self._slot_held = False
+
+        if stream is None:
+            self._pool.discard(target)
+        elif keep_alive and not stream.closed():
+            self._pool.release(target, stream)
         else:
-            self._new_connection(target)
+            stream.on_close(None)
+            stream.on_error(None)
+            stream.close()
+            self._pool.discard(target)
+
+    def _forget(self):
+        target = self._target_in_use
+        self._target_in_use = None
+
+        if self._stream is not None:
+            self._stream.on_close(None)
+            self._stream.on_error(None)
+            self._stream = None
+
+        # Only a slot that was checked out may be handed back; a tracker
+        # still queued for one leaves the queue instead
+        if self._slot_held:
+            self._slot_held = False
+            self._pool.discard(target)
+        else:
+            self._pool.cancel(target, self._on_acquired)
+
+    def _on_acquired(self, stream):
+        self._slot_held = True
+
+        if stream is None:
+            self._new_connection(self._target_in_use)
+        else:
+            self._attach(stream)
+            self._on_stream_live(stream)
 
     def _new_connection(self, target):
         host, port, protocol = target
@@ -309,118 +515,512 @@ class ConnectionTracker(object):
 
         # Create and bind the IO Handler based on selected protocol
         if protocol == PROTOCOL_HTTP:
-            live_stream = SocketIOHandler(us_sock)
+            live_stream = SocketIOHandler(
+                us_sock, edge_triggered=self._edge_triggered,
+                recv_buffers=self._recv_buffers)
         elif protocol == PROTOCOL_HTTPS:
-            live_stream = SSLSocketIOHandler(us_sock)
+            live_stream = SSLSocketIOHandler(
+                us_sock, recv_buffers=self._recv_buffers)
         else:
+            self._forget()
             raise Exception('Unknown protocol: {0}.'.format(protocol))
 
+        # Don't hold back small writes waiting on the origin's delayed ACK
+        live_stream.set_nodelay(True)
+        self._attach(live_stream)
+
+        # Build and set the on_connect callback and then connect
+        def on_connect():
+            if self._stream is live_stream:
+                self._on_stream_live(live_stream)
+        live_stream.connect((host, port), on_connect)
+
+    def _attach(self, live_stream):
         # Store the stream reference for later use
-        self._streams[target] = live_stream
+        self._stream = live_stream
 
         # Build and set the on_close callback
         def on_close():
-            # Disable error cb on close
-            live_stream.on_error(None)
-
-            del self._streams[target]
-            if self._target_in_use == target:
-                self.destroy()
+            if self._stream is live_stream:
+                self._forget()
                 self._on_target_closed()
         live_stream.on_close(on_close)
 
         # Build and set the on_error callback
         def on_error(error):
-            # Dsiable close cb on error
-            live_stream.on_close(None)
-
-            if self._target_in_use == target:
-                del self._streams[target]
-                if self._target_in_use == target:
-                    self.destroy()
-                    self._on_target_error(error)
+            if self._stream is live_stream:
+                self._forget()
+                self._on_target_error(error)
         live_stream.on_error(on_error)
 
-        # Build and set the on_connect callback and then connect
-        def on_connect():
-            self._on_stream_live(live_stream)
-        live_stream.connect((host, port), on_connect)
+
+class ResponseSink(object):
+    """
+    Keeps the responses to pipelined requests in request order. A sink
+    stands in for the downstream stream while responses to earlier requests
+    are still being written, holding whatever is written to it until it is
+    attached to the stream. Write callbacks are made right away while less
+    than max_held bytes are held so that the response keeps being read from
+    upstream, and once the sink is attached otherwise. The sink counts as
+    full for flow control once max_held bytes are held.
+    """
+    def __init__(self, max_held=_MAX_HELD_RESPONSE):
+        self._stream = None
+        self._held = list()
+        self._held_bytes = 0
+        self._stalled = list()
+        self._max_held = max_held
+        self._written = False
+
+    def stream(self):
+        """
+        Returns the stream the sink writes to or None if it is not attached
+        yet.
+        """
+        return self._stream
+
+    def written(self):
+        """
+        Returns True once any part of the response has been written to the
+        sink.
+        """
+        return self._written
+
+    def attach(self, stream):
+        """
+        Writes everything held to the given stream and passes all further
+        writes straight through to it.
+        """
+        if self._stream is not None:
+            return
+
+        self._stream = stream
+        held, self._held = self._held, None
+        stalled, self._stalled = self._stalled, None
+        self._held_bytes = 0
+
+        def callback():
+            for stalled_cb in stalled:
+                stalled_cb()
+
+        last = len(held) - 1
+        for idx, data in enumerate(held):
+            stream.write(data, callback if idx == last and stalled else None)
+
+    def write_buffer_full(self):
+        if self._stream is not None:
+            return self._stream.write_buffer_full()
+        return self._held_bytes >= self._max_held
+
+    def on_drain(self, callback):
+        """
+        Calls back once the stream drains or, while the sink is not
+        attached, once everything held has been written to the stream.
+        """
+        if self._stream is not None:
+            self._stream.on_drain(callback)
+        elif self._held_bytes < self._max_held:
+            callback()
+        else:
+            self._stalled.append(callback)
+
+    def write(self, data, callback=None):
+        self._written = True
+
+        if self._stream is not None:
+            self._stream.write(data, callback)
+            return
+
+        # Body fragments may be views into a read buffer
+        data = bytes(_body_bytes(data))
+        self._held.append(data)
+        self._held_bytes += len(data)
+
+        if callback is not None:
+            if self._held_bytes < self._max_held:
+                callback()
+            else:
+                self._stalled.append(callback)
+
+
+class Exchange(object):
+    """
+    A single request read from downstream and the upstream stream it is
+    proxied over. Request bytes read before the upstream stream is live are
+    held until it connects and the response is written downstream through
+    the exchange's ResponseSink.
+
+    Exchanges without a target are answered by Pyrox itself and discard the
+    request body.
+
+    Reading the request pauses while more than max_held bytes of its body
+    are held or while the upstream stream has more queued than its high
+    watermark, and resumes once they have been written.
+    """
+    def __init__(self, request, target, sink, pause_request, resume_request,
+                 on_complete, max_held=_MAX_HELD_REQUEST):
+        self.request = request
+        self.target = target
+        self.sink = sink
+        self.tracker = None
+        self.upstream = None
+        self.upstream_handler = None
+        self.upstream_parser = None
+        self.request_complete = False
+        self.response_complete = False
+
+        # Whether the request counts as outstanding with the router and
+        # when it was sent upstream
+        self.routed = False
+        self.sent_at = None
+
+        self._held = None
+        self._max_held = max_held
+        self._paused = False
+        self._discarding = target is None
+        self._pause_request = pause_request
+        self._resume_request = resume_request
+        self._on_complete = on_complete
+
+    def dispatched(self):
+        return self.tracker is not None
+
+    def release_parser(self):
+        if self.upstream_parser is not None:
+            _release_parser(self.upstream_parser)
+            self.upstream_parser = None
+
+    def discards_body(self):
+        return self._discarding
+
+    def send(self, data, is_chunked):
+        """
+        Sends a request body fragment upstream or holds it until upstream
+        connects.
+        """
+        if self.upstream is not None:
+            _write_to_stream(self.upstream, data, is_chunked)
+            self._throttle()
+            return
+
+        if is_chunked:
+            self._hold(_CHUNK_SIZE_LINE % len(data))
+            self._hold(data)
+            self._hold(_CRLF)
+        else:
+            self._hold(data)
+
+        if len(self._held) >= self._max_held:
+            self._pause()
+
+    def _pause(self):
+        if not self._paused:
+            self._paused = True
+            self._pause_request()
+
+    def _throttle(self):
+        if self.upstream.write_buffer_full():
+            self._pause()
+            self.upstream.on_drain(self._on_drain)
+        elif self._paused:
+            self._on_drain()
+
+    def _on_drain(self):
+        if self._paused:
+            self._paused = False
+
+            # Once the request has been read in full reading resumes when
+            # there's room for more pipelined requests
+            if not self.request_complete and not self._discarding:
+                self._resume_request()
+
+    def _hold(self, data):
+        if self._held is None:
+            self._held = bytearray()
+        self._held.extend(data)
+
+    def finish_request(self, is_chunked, trailers=None):
+        self.request_complete = True
+
+        if self._discarding or not is_chunked:
+            return
+
+        # Finish the last chunk. The request may have been read in full
+        # before upstream connected.
+        last_chunk = _last_chunk(trailers)
+
+        if self.upstream is not None:
+            self.upstream.write(last_chunk)
+        else:
+            self._hold(last_chunk)
+
+    def on_live(self, upstream):
+        self.upstream = upstream
+        self.sent_at = time.time()
+
+        # Send the proxied request head and drop our ref to it
+        upstream.write(self.request.to_bytes())
+        self.request = None
+
+        if self._held:
+            upstream.write(self._held)
+            self._held = None
+
+        self._throttle()
+
+    def reply(self, data):
+        """
+        Answers the request with the given response bytes instead of a
+        response from upstream.
+        """
+        self._discarding = True
+        self.upstream = None
+        self._held = None
+
+        def callback():
+            self._on_complete(self, False)
+        self.sink.write(data, callback)
+
+    def discard_body(self):
+        """
+        Drops whatever is left of the request body. This is used when the
+        response is complete before the request has been read in full.
+        """
+        self._discarding = True
+        self._paused = False
+        self.upstream = None
+
+        if not self.request_complete:
+            self._resume_request()
 
 
 class ProxyConnection(object):
     """
     A proxy connection manages the lifecycle of the sockets opened during a
     proxied client request against Pyrox.
+
+    Requests are read from downstream into a line of exchanges. Up to
+    max_pipelined exchanges are sent upstream at once, each over its own
+    pooled upstream stream, and their responses are written back to
+    downstream in the order the requests arrived in. Reading from downstream
+    stops while max_pipelined requests are waiting on their responses.
     """
-    def __init__(self, us_filter_pl, ds_filter_pl, downstream, router):
+    def __init__(self, us_filter_pl, ds_filter_pl, downstream, router,
+                 upstream_pool, max_pipelined=1,
+                 max_header_size=DEFAULT_MAX_HEADER_SIZE,
+                 edge_triggered=False, recv_buffers=None):
         self._ds_filter_pl = ds_filter_pl
         self._us_filter_pl = us_filter_pl
         self._router = router
-        self._upstream_parser = None
-        self._upstream_tracker = ConnectionTracker(
-            self._on_upstream_live,
-            self._on_upstream_close,
-            self._on_upstream_error)
+        self._upstream_pool = upstream_pool
+        self._max_pipelined = max_pipelined
+        self._max_header_size = max_header_size
+        self._edge_triggered = edge_triggered
+        self._recv_buffers = recv_buffers
+        self._line = collections.deque()
+        self._keep_alive = True
 
         # Setup all of the wiring for downstream
         self._downstream = downstream
         self._downstream_handler = DownstreamHandler(
             self._downstream,
             self._ds_filter_pl,
-            self._connect_upstream)
-        self._downstream_parser = RequestParser(self._downstream_handler)
+            self._open_exchange,
+            self._on_request_complete)
+        self._downstream_parser = _PARSER_POOL.request_parser(
+            self._downstream_handler,
+            zero_copy=True,
+            max_header_size=max_header_size,
+            raw_chunks=self._downstream_handler.raw_chunks())
         self._downstream.on_close(self._on_downstream_close)
         self._downstream.read(self._on_downstream_read)
 
-    def _connect_upstream(self, request, route=None):
-        if route is not None:
-            # This does some type checking for routes passed up via filter
-            self._router.set_next(route)
-        upstream_target = self._router.get_next()
+    def _open_exchange(self, request, route=None):
+        target = None
+
+        if request is not None:
+            if route is not None:
+                # This does some type checking for routes passed up via
+                # filter
+                self._router.set_next(route)
+            target = self._router.get_next()
+
+        exchange = Exchange(
+            request,
+            target,
+            ResponseSink(),
+            self._downstream.handle.disable_reading,
+            self._downstream.handle.resume_reading,
+            self._on_exchange_complete)
+        self._line.append(exchange)
+
+        if len(self._line) == 1:
+            exchange.sink.attach(self._downstream)
+
+        if request is None:
+            # Filters reply once the request has been read
+            return exchange
+
+        if target is None:
+            exchange.reply(get_template(UPSTREAM_UNAVAILABLE).to_bytes())
+            return exchange
+
+        # Update the request to proxy upstream
+        request.replace_header('host').values.append(
+            '{0}:{1}'.format(target[0], target[1]))
 
-        if upstream_target is None:
-            self._downstream.write(_UPSTREAM_UNAVAILABLE.to_bytes(),
-                self._downstream.handle.resume_reading)
-            return
+        self._dispatch()
+        return exchange
 
-        # Hold downstream reads
-        self._hold_downstream = True
+    def _dispatch(self):
+        in_flight = 0
 
-        # Update the request to proxy upstream and store it
-        request.replace_header('host').values.append(
-            '{0}:{1}'.format(upstream_target[0], upstream_target[1]))
-        self._request = request
+        for exchange in self._line:
+            if exchange.dispatched():
+                if not exchange.response_complete:
+                    in_flight += 1
+            elif exchange.target is not None:
+                if in_flight >= self._max_pipelined:
+                    break
+
+                self._connect(exchange)
+                in_flight += 1
+
+    def _connect(self, exchange):
+        def on_live(upstream):
+            self._on_upstream_live(exchange, upstream)
+
+        def on_error(error):
+            self._on_upstream_error(exchange, error)
+
+        self._router.request_started(exchange.target)
+        exchange.routed = True
+        exchange.tracker = ConnectionTracker(
+            self._upstream_pool,
+            on_live,
+            self._on_upstream_close,
+            on_error,
+            self._edge_triggered,
+            self._recv_buffers)
 
         try:
-            self._upstream_tracker.connect(upstream_target)
+            exchange.tracker.connect(exchange.target)
         except Exception as ex:
+            self._upstream_failed(exchange)
             _LOG.exception(ex)
 
-    def _on_upstream_live(self, upstream):
-        self._upstream_handler = UpstreamHandler(
-            self._downstream,
-            upstream,
-            self._us_filter_pl)
+    def _on_upstream_live(self, exchange, upstream):
+        def on_complete(keep_alive):
+            self._on_exchange_complete(exchange, keep_alive)
 
-        if self._upstream_parser:
-            self._upstream_parser.destroy()
-        self._upstream_parser = ResponseParser(self._upstream_handler)
+        exchange.upstream_handler = UpstreamHandler(
+            exchange.sink,
+            upstream,
+            self._us_filter_pl,
+            on_complete)
+        exchange.upstream_parser = _PARSER_POOL.response_parser(
+            exchange.upstream_handler,
+            zero_copy=True,
+            max_header_size=self._max_header_size,
+            raw_chunks=exchange.upstream_handler.raw_chunks())
 
         # Set the read callback
-        upstream.read(self._on_upstream_read)
+        def on_read(data):
+            self._on_upstream_read(exchange, data)
+        upstream.read(on_read)
+
+        # Send the proxied request and anything held for it
+        exchange.on_live(upstream)
+
+        # The rest of the request body may have been waiting on the connect
+        if exchange is self._downstream_handler.exchange():
+            self._splice_request_body()
+
+    def _on_exchange_complete(self, exchange, keep_alive):
+        if exchange.response_complete:
+            return
 
-        # Send the proxied request object
-        upstream.write(self._request.to_bytes())
+        exchange.response_complete = True
+        exchange.release_parser()
 
-        # Drop the ref to the proxied request head
-        self._request = None
+        if exchange.routed:
+            self._report_health(exchange)
+        self._request_finished(exchange)
 
-        # Set up our downstream handler
-        self._downstream_handler.on_upstream_connect(upstream)
+        if exchange.tracker is not None:
+            # A stream may only be reused once the request has been
+            # completely sent; otherwise the rest of the body would follow
+            # another request
+            exchange.tracker.release(
+                keep_alive and exchange.request_complete)
+
+        exchange.discard_body()
+
+        self._advance()
+
+    def _advance(self):
+        if self._downstream.closed():
+            return
+
+        # Responses that are complete leave the line and the next one in
+        # line gets to write to downstream
+        line = self._line
+        while line:
+            line[0].sink.attach(self._downstream)
+
+            if not line[0].response_complete:
+                break
+            line.popleft()
+
+        self._dispatch()
+        self._resume_requests()
+
+    def _on_request_complete(self, keep_alive):
+        self._keep_alive = keep_alive
+        self._resume_requests()
+
+    def _resume_requests(self):
+        if (self._keep_alive and
+                len(self._line) < self._max_pipelined and
+                not self._downstream_handler.reading_message() and
+                not self._downstream.closed()):
+            self._downstream.handle.resume_reading()
+
+    def _request_finished(self, exchange, measure=True):
+        if exchange.routed:
+            exchange.routed = False
+            self._router.request_finished(
+                exchange.target, exchange.sent_at if measure else None)
+
+    def _upstream_failed(self, exchange):
+        if exchange.routed:
+            self._request_finished(exchange, False)
+            self._router.mark_failure(exchange.target)
+
+    def _report_health(self, exchange):
+        handler = exchange.upstream_handler
+
+        if handler is None or handler.status_code is None:
+            # Pyrox answered the request itself
+            return
+
+        if handler.status_code >= 500:
+            self._router.mark_failure(exchange.target)
+        else:
+            self._router.mark_success(exchange.target)
 
     def _on_downstream_close(self):
-        self._upstream_tracker.destroy()
-        self._downstream_parser.destroy()
+        for exchange in self._line:
+            exchange.release_parser()
+
+            # Abandoned requests say nothing about the upstream's latency
+            self._request_finished(exchange, False)
+
+            if exchange.tracker is not None:
+                exchange.tracker.destroy()
+
+        self._line.clear()
+        _release_parser(self._downstream_parser)
         self._downstream_parser = None
 
     def _on_downstream_error(self, error):
@@ -428,29 +1028,89 @@ class ProxyConnection(object):
         if not self._downstream.closed():
             self._downstream.close()
 
-    def _on_upstream_error(self, error):
-        if not self._downstream.closed():
-            self._downstream.write(_BAD_GATEWAY_RESP.to_bytes())
+    def _on_upstream_error(self, exchange, error):
+        self._upstream_failed(exchange)
+
+        if self._downstream.closed() or exchange.response_complete:
+            return
+
+        if exchange.sink.written():
+            # An error response can't follow part of another one
+            self._downstream.close()
+        else:
+            exchange.reply(get_template(PYROX_ERROR).to_bytes())
 
     def _on_upstream_close(self):
+        # Responses can't be matched to requests past this point
         if not self._downstream.closed():
             self._downstream.close()
 
-        if self._upstream_parser is not None:
-            self._upstream_parser.destroy()
-            self._upstream_parser = None
+    def _splice_request_body(self):
+        exchange = self._downstream_handler.exchange()
+
+        if exchange is not None:
+            self._splice_body(
+                self._downstream_parser,
+                self._downstream_handler,
+                self._downstream,
+                exchange.upstream)
+
+    def _splice_response_body(self, exchange):
+        self._splice_body(
+            exchange.upstream_parser,
+            exchange.upstream_handler,
+            exchange.upstream_handler.upstream(),
+            exchange.sink.stream())
+
+    def _splice_body(self, parser, handler, source, dest):
+        """
+        Forwards the rest of a large, pass-through body straight from one
+        socket to the other. Only the message head goes through the parser
+        and the filter pipeline. The parser is told about the forwarded
+        bytes once they have all been written so that the message completes
+        as usual.
+        """
+        if parser is None or source is None or dest is None:
+            return
+
+        remaining = parser.body_remaining()
+
+        if remaining < _SPLICE_MIN_BODY or source.splicing():
+            return
+
+        if not (handler.passes_body_through() and source.can_splice() and
+                dest.can_splice()):
+            return
+
+        def on_spliced(length):
+            try:
+                parser.skip_body(length)
+            except StreamClosedError:
+                pass
+            except Exception as ex:
+                _LOG.exception(ex)
+
+        source.splice_to(dest, remaining, on_spliced)
 
     def _on_downstream_read(self, data):
         try:
             self._downstream_parser.execute(data)
+            self._splice_request_body()
         except StreamClosedError:
             pass
         except Exception as ex:
             _LOG.exception(ex)
 
-    def _on_upstream_read(self, data):
+    def _on_upstream_read(self, exchange, data):
+        parser = exchange.upstream_parser
+
+        if parser is None:
+            # The response is complete; nothing more is expected
+            return
+
         try:
-            self._upstream_parser.execute(data)
+            parser.execute(data)
+            self._splice_response_body(exchange)
         except StreamClosedError:
             pass
         except Exception as ex:
@@ -465,17 +1125,42 @@ class TornadoHttpProxy(TCPServer):
     :param pipelines: This is a tuple with the upstream filter pipeline factory
                       as the first element and the downstream filter pipeline
                       factory as the second element.
+    :param balancer: The name of the strategy requests are spread over the
+                     default upstream targets with; one of the keys of
+                     pyrox.server.routing.BALANCERS.
+    :param ejection: The EjectionPolicy deciding when upstream targets that
+                     keep failing are taken out of rotation.
     """
     def __init__(self, pipeline_factories, default_us_targets=None,
-                 ssl_options=None):
-        super(TornadoHttpProxy, self).__init__(ssl_options=ssl_options)
-        self._router = RoundRobinRouter(default_us_targets)
+                 ssl_options=None, upstream_pool=None, max_pipelined=1,
+                 max_header_size=DEFAULT_MAX_HEADER_SIZE,
+                 edge_triggered=False, recv_buffers=None,
+                 balancer='round_robin', ejection=None):
+        super(TornadoHttpProxy, self).__init__(
+            ssl_options=ssl_options,
+            edge_triggered=edge_triggered,
+            recv_buffers=recv_buffers or ReceiveBufferPool())
+        self._router = new_router(
+            balancer, default_us_targets, ejection or EjectionPolicy())
+        self._upstream_pool = upstream_pool or UpstreamPool()
+        self._max_pipelined = max_pipelined
+        self._max_header_size = max_header_size
         self.us_pipeline_factory = pipeline_factories[0]
         self.ds_pipeline_factory = pipeline_factories[1]
 
+    @property
+    def router(self):
+        return self._router
+
     def handle_stream(self, downstream, address):
+        downstream.set_nodelay(True)
         connection_handler = ProxyConnection(
             self.us_pipeline_factory(),
             self.ds_pipeline_factory(),
             downstream,
-            self._router)
+            self._router,
+            self._upstream_pool,
+            self._max_pipelined,
+            self._max_header_size,
+            self.edge_triggered,
+            self.recv_buffers)
@@ -1,3 +1,7 @@
+import math
+import random
+import time
+
 from urlparse import urlparse
 
 PROTOCOL_HTTP = 0
@@ -16,6 +20,19 @@ _PROTOCOL_DEFAULT_PORTS = {
 _DEFAULT_PROTOCOL = PROTOCOL_HTTP
 _DEFAULT_PROTOCOL_PORT = _PROTOCOL_DEFAULT_PORTS[_DEFAULT_PROTOCOL]
 
+"""
+Seconds over which an upstream's latency average forgets older requests.
+"""
+_LATENCY_DECAY = 10.0
+
+
+"""
+Number of seconds a target is first ejected for and the most it may be
+ejected for after failing again and again.
+"""
+_EJECTION_TIME = 10
+_MAX_EJECTION_TIME = 300
+
 
 def parse_route_url(url):
     parsed_url = urlparse(url)
@@ -59,11 +76,102 @@ class NoRoutesAvailableError(Exception):
     pass
 
 
-class RoutingHandler(object):
+class EjectionPolicy(object):
+    """
+    Decides when an upstream target that keeps failing is taken out of
+    rotation and for how long.
+
+    :param max_failures: The number of requests in a row that may fail
+                         against a target before it is ejected. A value of 0
+                         disables ejecting targets for failed requests.
+    :param ejection_time: The number of seconds a target is ejected for the
+                          first time. Every ejection that follows without a
+                          request succeeding in between doubles this time.
+    :param max_ejection_time: The most seconds a target may be ejected for.
+    """
+    def __init__(self, max_failures=5, ejection_time=_EJECTION_TIME,
+                 max_ejection_time=_MAX_EJECTION_TIME):
+        self.max_failures = max_failures
+        self.ejection_time = ejection_time
+        self.max_ejection_time = max_ejection_time
+
+    def ejects(self, failures):
+        return 0 < self.max_failures <= failures
+
+    def backoff(self, ejections):
+        """
+        Returns the number of seconds a target is ejected for the given time
+        in a row.
+        """
+        return min(self.ejection_time * 2 ** (ejections - 1),
+                   self.max_ejection_time)
+
+
+class TargetStats(object):
+    """
+    Counts the requests outstanding against an upstream target and keeps a
+    peak EWMA of how long they took. A latency above the average replaces it
+    right away so that an upstream slowing down is noticed at once, while
+    lower latencies are blended in with a weight that grows with the time
+    since the last request finished.
+
+    Stats also count the requests that failed in a row against the target,
+    the health checks it failed in a row and when the target was last
+    ejected until.
+    """
+    def __init__(self):
+        self.outstanding = 0
+        self.latency = 0.0
+        self.failures = 0
+        self.probe_failures = 0
+        self.ejections = 0
+        self.ejected_until = 0
+        self._measured_at = None
+
+    def measured(self):
+        return self._measured_at is not None
+
+    def observe(self, latency, now):
+        if self._measured_at is None or latency > self.latency:
+            self.latency = latency
+        else:
+            weight = math.exp(-max(now - self._measured_at, 0) /
+                              _LATENCY_DECAY)
+            self.latency = self.latency * weight + latency * (1.0 - weight)
 
-    def __init__(self, routes=None):
+        self._measured_at = now
+
+    def cost(self):
+        """
+        Returns the latency a new request to the target may expect, in
+        seconds. Targets that have not been measured yet count every
+        outstanding request as a second so that they are tried, but only
+        with one request at a time, until their first request finishes.
+        """
+        if self._measured_at is None:
+            return float(self.outstanding)
+        return self.latency * (self.outstanding + 1)
+
+
+class RoutingHandler(object):
+    """
+    Picks the upstream target for each request. Handlers are told when a
+    request to a target starts and finishes and keep TargetStats for their
+    routes, which balancing strategies may pick by. Stats for other targets,
+    like routes set by filters, are only kept while they have requests
+    outstanding.
+
+    Handlers are also told whether requests to a target succeeded. Targets
+    are ejected, and left out when picking a default route, as the given
+    EjectionPolicy decides. When every target is ejected all of them are
+    picked from again, since refusing every request would be no better.
+    """
+    def __init__(self, routes=None, ejection=None):
         self.routes = list()
         self._next_route = None
+        self._stats = dict()
+        self._ejection = ejection or EjectionPolicy(max_failures=0)
+        self._ejected = set()
 
         if routes is not None:
             for route in routes:
@@ -92,19 +200,238 @@ class RoutingHandler(object):
     def _get_next(self):
         raise NoRoutesAvailableError('No routes available.')
 
+    def healthy_routes(self):
+        """
+        Returns the routes that are not ejected.
+        """
+        if not self._ejected:
+            return self.routes
+
+        now = time.time()
+
+        for target in list(self._ejected):
+            if self.stats(target).ejected_until <= now:
+                self._ejected.discard(target)
+
+        healthy = [route for route in self.routes
+                   if route not in self._ejected]
+        return healthy or self.routes
+
+    def available(self, target):
+        """
+        Returns whether the given target is not ejected.
+        """
+        stats = self._stats.get(target)
+        return stats is None or stats.ejected_until <= time.time()
+
+    def stats(self, target):
+        """
+        Returns the TargetStats kept for the given target.
+        """
+        stats = self._stats.get(target)
+
+        if stats is None:
+            stats = TargetStats()
+            self._stats[target] = stats
+
+        return stats
+
+    def _forget_idle(self, target):
+        stats = self._stats.get(target)
+
+        if (stats is not None and stats.outstanding == 0 and
+                target not in self.routes):
+            del self._stats[target]
+            self._ejected.discard(target)
+
+    def request_started(self, target):
+        """
+        Counts a request sent to the given target as outstanding.
+        """
+        self.stats(target).outstanding += 1
+
+    def request_finished(self, target, started=None):
+        """
+        Counts a request to the given target as finished. The request's
+        latency is measured from started, the time it was sent at, when
+        given; requests that failed or were abandoned are only uncounted.
+        """
+        stats = self.stats(target)
+
+        if stats.outstanding > 0:
+            stats.outstanding -= 1
+
+        if started is not None:
+            now = time.time()
+            stats.observe(now - started, now)
+
+        self._forget_idle(target)
+
+    def mark_success(self, target):
+        """
+        Records that the given target answered a request well.
+        """
+        stats = self.stats(target)
+        stats.failures = 0
+        stats.ejections = 0
+        self._forget_idle(target)
+
+    def mark_failure(self, target):
+        """
+        Records that a request to the given target failed, ejecting the
+        target once too many have failed in a row. A target that fails
+        again after returning from an ejection is ejected again right away.
+        """
+        stats = self.stats(target)
+        stats.failures += 1
+
+        if self._ejection.ejects(stats.failures) and self.available(target):
+            self.eject(target)
+
+        self._forget_idle(target)
+
+    def mark_probed(self, target, healthy):
+        """
+        Records the result of an active health check of the given target,
+        ejecting it if the check failed. Passing a check leaves the requests
+        that failed in a row counted, since a target may answer health
+        checks well and still fail actual requests.
+        """
+        stats = self.stats(target)
+
+        if healthy:
+            stats.probe_failures = 0
+        else:
+            stats.probe_failures += 1
+            self.eject(target)
+
+        self._forget_idle(target)
+
+    def eject(self, target):
+        """
+        Takes the given target out of rotation for longer each time it is
+        ejected in a row.
+        """
+        stats = self.stats(target)
+        stats.ejections += 1
+        stats.ejected_until = (
+            time.time() + self._ejection.backoff(stats.ejections))
+        self._ejected.add(target)
+        self._forget_idle(target)
+
 
 class RoundRobinRouter(RoutingHandler):
 
-    def __init__(self, routes):
-        super(RoundRobinRouter, self).__init__(routes)
+    def __init__(self, routes, ejection=None):
+        super(RoundRobinRouter, self).__init__(routes, ejection)
         self._last_default = 0
 
     def _get_next(self):
+        routes = self.healthy_routes()
         next_route = None
 
-        if len(self.routes) > 0:
+        if len(routes) > 0:
             self._last_default += 1
-            idx = self._last_default % len(self.routes)
-            next_route = self.routes[idx]
+            idx = self._last_default % len(routes)
+            next_route = routes[idx]
 
         return next_route
+
+
+class _LowestCostRouter(RoutingHandler):
+    """
+    Picks the target with the lowest cost, by default the number of
+    requests it has in flight. Targets are scanned starting past the last
+    pick so that ties go round robin.
+    """
+    def __init__(self, routes, ejection=None):
+        super(_LowestCostRouter, self).__init__(routes, ejection)
+        self._last_default = 0
+
+    def _cost(self, target):
+        return self.stats(target).outstanding
+
+    def _get_next(self):
+        routes = self.healthy_routes()
+
+        if len(routes) == 0:
+            return None
+
+        self._last_default += 1
+        next_route = None
+        lowest = None
+
+        for offset in range(len(routes)):
+            route = routes[(self._last_default + offset) % len(routes)]
+            cost = self._cost(route)
+
+            if lowest is None or cost < lowest:
+                next_route = route
+                lowest = cost
+
+        return next_route
+
+
+class LeastOutstandingRouter(_LowestCostRouter):
+    """
+    Routes each request to the target with the fewest requests in flight.
+    """
+
+
+class PeakEwmaRouter(_LowestCostRouter):
+    """
+    Routes each request to the target with the lowest expected latency: its
+    peak EWMA latency scaled by the requests it has in flight.
+    """
+    def _cost(self, target):
+        return self.stats(target).cost()
+
+
+class PowerOfTwoChoicesRouter(RoutingHandler):
+    """
+    Routes each request to the better of two targets picked at random,
+    comparing them the way PeakEwmaRouter does. Looking at only two targets
+    keeps the pick cheap for many targets and keeps worker processes, which
+    each only know their own requests, from all piling onto the same
+    target.
+    """
+    def __init__(self, routes, ejection=None):
+        super(PowerOfTwoChoicesRouter, self).__init__(routes, ejection)
+        self._random = random.Random()
+
+    def _get_next(self):
+        routes = self.healthy_routes()
+
+        if len(routes) < 2:
+            return routes[0] if routes else None
+
+        first, second = self._random.sample(routes, 2)
+
+        if self.stats(second).cost() < self.stats(first).cost():
+            return second
+        return first
+
+
+"""
+Routing handlers by the balancer name they are configured with.
+"""
+BALANCERS = {
+    'round_robin': RoundRobinRouter,
+    'least_outstanding': LeastOutstandingRouter,
+    'peak_ewma': PeakEwmaRouter,
+    'p2c': PowerOfTwoChoicesRouter
+}
+
+
+def new_router(balancer, routes, ejection=None):
+    """
+    Returns a routing handler for the given routes that balances requests
+    with the named strategy and ejects failing targets as the given
+    EjectionPolicy decides.
+    """
+    router_cls = BALANCERS.get(balancer)
+
+    if router_cls is None:
+        raise ValueError('Unknown balancer: {0}'.format(balancer))
+
+    return router_cls(routes, ejection)
@@ -14,11 +14,20 @@ from tornado import stack_context
 
 from datetime import timedelta
 
+from pyrox.iohandling import _EPOLLET
+
+from .splice import SpliceForwarder, SPLICE_SUPPORTED
+
 try:
     from tornado.platform.posix import _set_nonblocking
 except ImportError:
     _set_nonblocking = None
 
+try:
+    from tornado.platform.epoll import EPollIOLoop
+except ImportError:
+    EPollIOLoop = None
+
 # These errnos indicate that a non-blocking operation must be retried
 # at a later time. On most platforms they're the same value, but on
 # some they differ.
@@ -28,6 +37,16 @@ _ERRNO_WOULDBLOCK = (errno.EWOULDBLOCK, errno.EAGAIN)
 # They should be caught and handled less noisily than other errors.
 _ERRNO_CONNRESET = (errno.ECONNRESET, errno.ECONNABORTED, errno.EPIPE)
 
+# Upper bounds on how much of the write queue is coalesced into a single
+# send. Coalescing copies data so it is only worth doing for small buffers.
+_COALESCE_MAX_BUFFERS = 64
+_COALESCE_MAX_BYTES = 16384
+
+# Default bounds on queued writes for flow control; see on_drain
+_WRITE_HIGH_WATERMARK = 262144
+_WRITE_LOW_WATERMARK = 65536
+
+
 # Nice constant for enabling debug output
 _SHOULD_LOG_DEBUG_OUTPUT = gen_log.isEnabledFor('DEBUG')
 
@@ -46,11 +65,16 @@ class WriteQueue(object):
 
     def __init__(self):
         self._last_send_idx = 0
+        self._queued_bytes = 0
         self._write_queue = collections.deque()
 
     def has_next(self):
         return len(self._write_queue) > 0
 
+    def size(self):
+        """Returns the number of bytes left to send."""
+        return self._queued_bytes
+
     def next(self):
         if self.has_next():
             return (self._write_queue[0], self._last_send_idx)
@@ -58,18 +82,123 @@ class WriteQueue(object):
 
     def clear(self):
         self._write_queue.clear()
+        self._last_send_idx = 0
+        self._queued_bytes = 0
 
     def append(self, src):
         self._write_queue.append(src)
+        self._queued_bytes += len(src)
+
+    def gather(self, max_buffers, max_bytes):
+        """
+        Returns a list of memoryviews over the queued buffers, starting at the
+        unsent remainder of the first one. Buffers are gathered until either
+        limit would be exceeded but the first buffer is always included,
+        whatever its size. Nothing is copied.
+        """
+        buffers = list()
+        gathered = 0
+        offset = self._last_send_idx
+
+        for src in self._write_queue:
+            view = memoryview(src)
+
+            if offset > 0:
+                view = view[offset:]
+                offset = 0
+
+            if buffers and gathered + len(view) > max_bytes:
+                break
+
+            buffers.append(view)
+            gathered += len(view)
+
+            if len(buffers) >= max_buffers:
+                break
+
+        return buffers
 
     def advance(self, bytes_to_advance):
-        next_src = self._write_queue[0]
+        """
+        Consumes the given number of sent bytes from the front of the queue,
+        popping every buffer that has been sent in full.
+        """
+        self._queued_bytes -= bytes_to_advance
+
+        while self._write_queue:
+            remaining = len(self._write_queue[0]) - self._last_send_idx
+
+            if bytes_to_advance < remaining:
+                self._last_send_idx += bytes_to_advance
+                break
 
-        if bytes_to_advance + self._last_send_idx >= len(next_src):
             self._write_queue.popleft()
             self._last_send_idx = 0
-        else:
-            self._last_send_idx += bytes_to_advance
+            bytes_to_advance -= remaining
+
+
+class ReceiveBufferPool(object):
+    """
+    Hands out the buffers streams read into. A stream starts reading with
+    min_size bytes, doubles its buffer after reads that fill it up to
+    max_size and halves it again after reads that use a quarter of it or
+    less. Streams give their buffer back whenever their socket runs dry so
+    idle connections do not each hold on to one.
+
+    Free buffers are kept per size, up to max_free of each size. A pool is
+    not thread safe; each worker keeps its own.
+    """
+    def __init__(self, min_size=4096, max_size=65536, max_free=64):
+        assert 0 < min_size <= max_size
+
+        self.min_size = min_size
+        self.max_size = max_size
+        self._max_free = max_free
+        self._free = dict()
+
+    def next_size(self, size, read):
+        """
+        Returns the size to read with next after reading the given number
+        of bytes into a buffer of the given size.
+        """
+        if read >= size:
+            return min(size * 2, self.max_size)
+
+        if 0 < read and read * 4 <= size:
+            return max(size // 2, self.min_size)
+
+        return size
+
+    def acquire(self, size):
+        free = self._free.get(size)
+
+        if free:
+            return free.pop()
+        return bytearray(size)
+
+    def release(self, buf):
+        free = self._free.get(len(buf))
+
+        if free is None:
+            free = list()
+            self._free[len(buf)] = free
+
+        if len(free) < self._max_free:
+            free.append(buf)
+
+
+def coalesce(buffers):
+    """
+    Returns a single buffer holding the contents of the given buffers. A
+    lone buffer is returned as is.
+    """
+    if len(buffers) == 1:
+        return buffers[0]
+
+    joined = bytearray()
+    for buf in buffers:
+        joined.extend(buf)
+    return joined
 
 
 class IOHandler(object):
@@ -112,15 +241,39 @@ class IOHandler(object):
         raise NotImplementedError()
 
 
-class FileDescriptorHandle(object):
+def supports_edge_triggering(io_loop):
+    """
+    Returns True if the given IOLoop polls with epoll and may be asked for
+    edge triggered events.
+    """
+    return EPollIOLoop is not None and isinstance(io_loop, EPollIOLoop)
+
 
-    def __init__(self, fd, io_loop):
+class FileDescriptorHandle(object):
+    """
+    Manages which events the IOLoop reports for a file descriptor.
+
+    By default every change of interest is passed on to the poller. When
+    edge_triggered is set and the IOLoop polls with epoll, the descriptor
+    is instead registered once for all events with EPOLLET. Interests are
+    then only tracked here and readiness is remembered until a read or a
+    write on the descriptor would block. Handlers must keep reading or
+    writing while read_ready or write_ready say so, since the poller does
+    not report the same readiness twice.
+    """
+    def __init__(self, fd, io_loop, edge_triggered=False):
         assert fd is not None
         assert io_loop is not None
 
         self.fd = fd
+        self.edge_triggered = (edge_triggered and
+                               supports_edge_triggering(io_loop))
         self._io_loop = io_loop
         self._event_interest = None
+        self._has_handler = False
+        self._event_handler = None
+        self._ready = 0
+        self._dispatch_scheduled = False
 
     def is_reading(self):
         return self._event_interest & self._io_loop.READ
@@ -128,20 +281,82 @@ class FileDescriptorHandle(object):
     def is_writing(self):
         return self._event_interest & self._io_loop.WRITE
 
+    def read_ready(self):
+        """
+        Returns True if reading is wanted and an edge triggered descriptor
+        has not been seen to run dry since it last became readable.
+        """
+        return (self.edge_triggered and
+                self._ready & self._event_interest & self._io_loop.READ)
+
+    def write_ready(self):
+        """
+        Returns True if writing is wanted and an edge triggered descriptor
+        has not been seen to fill up since it last became writable.
+        """
+        return (self.edge_triggered and
+                self._ready & self._event_interest & self._io_loop.WRITE)
+
+    def read_blocked(self):
+        """
+        Records that reading from the descriptor would block.
+        """
+        self._ready &= ~self._io_loop.READ
+
+    def write_blocked(self):
+        """
+        Records that writing to the descriptor would block.
+        """
+        self._ready &= ~self._io_loop.WRITE
+
     def set_handler(self, event_handler):
         """initialize the ioloop event handler"""
         assert event_handler is not None and callable(event_handler)
         self._event_interest = self._io_loop.ERROR
+        self._has_handler = True
+
+        if self.edge_triggered:
+            self._event_handler = event_handler
+            event_handler = self._handle_edges
+            events = (self._io_loop.READ | self._io_loop.WRITE |
+                      self._io_loop.ERROR | _EPOLLET)
+        else:
+            events = self._event_interest
 
         with stack_context.NullContext():
-            self._io_loop.add_handler(
-                self.fd,
-                event_handler,
-                self._event_interest)
+            self._io_loop.add_handler(self.fd, event_handler, events)
 
     def remove_handler(self):
+        self._has_handler = False
+        self._event_handler = None
+        self._ready = 0
         self._io_loop.remove_handler(self.fd)
 
+    def _handle_edges(self, fd, events):
+        self._ready |= events & (self._io_loop.READ | self._io_loop.WRITE)
+        self._dispatch(events & self._io_loop.ERROR)
+
+    def _dispatch(self, events):
+        # Only report readiness for what is currently wanted; the rest is
+        # reported once it is asked for
+        events |= self._ready & self._event_interest
+
+        if events:
+            self._event_handler(self.fd, events)
+
+    def _dispatch_scheduled_events(self):
+        self._dispatch_scheduled = False
+
+        if self._has_handler:
+            self._dispatch(0)
+
+    def _schedule_dispatch(self):
+        if not self._dispatch_scheduled:
+            self._dispatch_scheduled = True
+
+            with stack_context.NullContext():
+                self._io_loop.add_callback(self._dispatch_scheduled_events)
+
     def disable_reading(self):
         """
         Alias for removing the read interest from the event handler.
@@ -180,20 +395,46 @@ class FileDescriptorHandle(object):
 
     def _add_event_interest(self, event_interest):
         """Add io_state to poller."""
-        if not self._event_interest & event_interest:
+        # Callbacks may still try to resume a stream after it was closed
+        if not self._has_handler:
+            return
+
+        if self.edge_triggered:
+            self._event_interest = self._event_interest | event_interest
+
+            # No new edge comes for readiness that was already reported
+            if self._ready & event_interest:
+                self._schedule_dispatch()
+        elif not self._event_interest & event_interest:
             self._event_interest = self._event_interest | event_interest
             self._io_loop.update_handler(self.fd, self._event_interest)
 
     def _drop_event_interest(self, event_interest):
         """Stop poller from watching an io_state."""
+        if not self._has_handler:
+            return
+
         if self._event_interest & event_interest:
             self._event_interest = self._event_interest & (~event_interest)
-            self._io_loop.update_handler(self.fd, self._event_interest)
 
+            if not self.edge_triggered:
+                self._io_loop.update_handler(self.fd, self._event_interest)
 
-class SocketIOHandler(IOHandler):
 
-    def __init__(self, sock, io_loop=None, recv_chunk_size=4096):
+class SocketIOHandler(IOHandler):
+    """
+    Reads from and writes to a non-blocking socket. When edge_triggered is
+    set the socket is polled in edge triggered mode where the IOLoop allows
+    it; see FileDescriptorHandle.
+
+    Reads go into buffers drawn from recv_buffers, a ReceiveBufferPool that
+    adapts their size to the connection. Without one the stream reads in
+    chunks of recv_chunk_size bytes. Read callbacks get a memoryview into
+    the receive buffer which is only valid until the callback returns since
+    the buffer is read into again; see keep_read_buffer.
+    """
+    def __init__(self, sock, io_loop=None, recv_chunk_size=4096,
+                 edge_triggered=False, recv_buffers=None):
         super(SocketIOHandler, self).__init__(io_loop)
 
         # Socket init
@@ -204,7 +445,8 @@ class SocketIOHandler(IOHandler):
         self._socket.setblocking(0)
 
         # Initialize our handling of the FD events
-        self.handle = FileDescriptorHandle(self._socket.fileno(), self._io_loop)
+        self.handle = FileDescriptorHandle(
+            self._socket.fileno(), self._io_loop, edge_triggered)
         self.handle.set_handler(self._handle_events)
 
         # Flow control vars
@@ -213,9 +455,21 @@ class SocketIOHandler(IOHandler):
 
         # Writing and reading management
         self._write_queue = WriteQueue()
-
-        self._recv_chunk_size = recv_chunk_size
-        self._recv_buffer = bytearray(self._recv_chunk_size)
+        self._drain_cb = None
+        self._write_high_watermark = _WRITE_HIGH_WATERMARK
+        self._write_low_watermark = _WRITE_LOW_WATERMARK
+
+        if recv_buffers is None:
+            recv_buffers = ReceiveBufferPool(
+                recv_chunk_size, recv_chunk_size, max_free=1)
+
+        self._recv_buffers = recv_buffers
+        self._recv_size = recv_buffers.min_size
+        self._recv_buffer = None
+        self._recv_view = None
+        self._recv_buffer_kept = False
+        self._splicer = None
+        self._sink_splicer = None
 
     def on_done_writing(self, callback=None):
         """
@@ -226,6 +480,57 @@ class SocketIOHandler(IOHandler):
             assert callback is None or callable(callback)
             self._write_cb = stack_context.wrap(callback)
 
+    def on_drain(self, callback):
+        """
+        Sets a callback to be called once no more than the low watermark of
+        bytes is left queued for writing. Unlike on_done_writing, this does
+        not wait for the queue to empty which lets whoever feeds the stream
+        carry on before it runs dry. If the queue is already that small the
+        callback is called right away.
+        """
+        if self._closing:
+            return
+
+        assert callback is None or callable(callback)
+        self._drain_cb = stack_context.wrap(callback)
+        self._run_drain_callback()
+
+    def write_buffer_size(self):
+        """Returns the number of bytes queued for writing."""
+        return self._write_queue.size()
+
+    def write_buffer_full(self):
+        """
+        Returns True if at least the high watermark of bytes is queued for
+        writing. Writers should then stop feeding the stream until on_drain
+        calls back.
+        """
+        return self._write_queue.size() >= self._write_high_watermark
+
+    def set_write_watermarks(self, high, low):
+        assert 0 <= low <= high
+
+        self._write_high_watermark = high
+        self._write_low_watermark = low
+
+    def set_nodelay(self, value):
+        """
+        Turns Nagle's algorithm off for TCP sockets when value is True so
+        that small writes go out right away instead of waiting on the peer's
+        delayed ACK. Other sockets are left as they are.
+        """
+        if self._socket.family not in (socket.AF_INET, socket.AF_INET6):
+            return
+
+        try:
+            self._socket.setsockopt(
+                socket.IPPROTO_TCP, socket.TCP_NODELAY, 1 if value else 0)
+        except socket.error as err:
+            # The peer may already have hung up on us
+            if err.args[0] != errno.EINVAL and \
+                    err.args[0] not in _ERRNO_CONNRESET:
+                raise
+
     def on_close(self, callback):
         """
         Sets a callback to be called after this stream closes.
@@ -253,6 +558,23 @@ class SocketIOHandler(IOHandler):
     def closed(self):
         return self._closing or self._socket is None
 
+    def peer_connected(self):
+        """
+        Returns True if the remote end of the stream has not hung up and has
+        no unread data pending. This peeks at the socket without consuming
+        anything and is meant for checking idle streams before reuse.
+        """
+        if self.closed():
+            return False
+
+        try:
+            self._socket.recv(1, socket.MSG_PEEK)
+        except (socket.error, IOError, OSError) as ex:
+            return ex.args[0] in _ERRNO_WOULDBLOCK
+
+        # Either the peer hung up or it sent data nobody asked for
+        return False
+
     def read(self, callback):
         """
         Sets a callback for read events and then sets the read interest on
@@ -264,18 +586,68 @@ class SocketIOHandler(IOHandler):
         self._read_cb = stack_context.wrap(callback)
         self.handle.resume_reading()
 
+    def keep_read_buffer(self):
+        """
+        Hands the receive buffer behind the view passed to the current read
+        callback over to the caller. Callbacks that hold on to the view or a
+        slice of it past their return, like writing it to another stream,
+        must call this. The stream reads into a new buffer next time.
+        """
+        self._recv_buffer_kept = True
+
     def write(self, msg, callback=None):
         self._assert_not_closed()
 
-        if not isinstance(msg, basestring) and not isinstance(msg, bytearray):
-            raise TypeError("bytes/bytearray/unicode/str objects only")
+        if not isinstance(msg, (basestring, bytearray, memoryview)):
+            raise TypeError(
+                "bytes/bytearray/memoryview/unicode/str objects only")
+
+        if isinstance(msg, unicode):
+            msg = msg.encode('utf-8')
 
-        # Append the data for writing - this should not copy the data
+        # Append the data for writing - this should not copy the data. Views
+        # must stay valid until the write callback has been called.
         self._write_queue.append(msg)
         # Enable writing on the FD
         self.handle.resume_writing()
-        # Set our callback - writing None to the method below is okay
-        self.on_done_writing(callback)
+
+        # Writes without a callback leave the one set before in place since
+        # it is only due once everything queued has been written
+        if callback is not None:
+            self.on_done_writing(callback)
+
+    def can_splice(self):
+        """
+        Returns True if bytes read from this stream may be forwarded to
+        another stream with splice_to.
+        """
+        return SPLICE_SUPPORTED and not self.closed()
+
+    def splicing(self):
+        """Returns True if this stream is forwarding reads to another."""
+        return self._splicer is not None
+
+    def splice_to(self, dest, length, callback):
+        """
+        Forwards the next length bytes read from this stream to the dest
+        stream without copying them into user space. Read callbacks are not
+        called for these bytes. The callback is called with the number of
+        bytes forwarded once they have all been written to dest.
+        """
+        self._assert_not_closed()
+        assert self._splicer is None and dest._sink_splicer is None
+
+        splicer = SpliceForwarder(self, dest, length, callback)
+        self._splicer = splicer
+        dest._sink_splicer = splicer
+        splicer.start()
+
+    def end_splice(self, splicer):
+        if self._splicer is splicer:
+            self._splicer = None
+
+        if self._sink_splicer is splicer:
+            self._sink_splicer = None
 
     def connect(self, address, callback=None):
         self._connecting = True
@@ -292,13 +664,14 @@ class SocketIOHandler(IOHandler):
         self.handle.resume_writing()
 
     def close(self):
-        if not self._closing:
-            if self._write_queue.has_next():
-                self.on_done_writing(self._close)
-            else:
-                self._close()
+        self._closing = True
 
-            self._closing = True
+        if self._write_queue.has_next():
+            # Close once everything queued has been written. Streams that
+            # fail to write close right away as their queue is cleared.
+            self._write_cb = stack_context.wrap(self._close)
+        else:
+            self._close()
 
     def _close(self):
         """Close this stream."""
@@ -306,9 +679,14 @@ class SocketIOHandler(IOHandler):
             gen_log.debug('Closing stream(fd: {0})'.format(self.handle.fd))
 
             self.handle.remove_handler()
+            sock, self._socket = self._socket, None
+            self._drain_cb = None
+
+            for splicer in (self._splicer, self._sink_splicer):
+                if splicer is not None:
+                    splicer.abort()
 
-            self._socket.close()
-            self._socket = None
+            sock.close()
 
             if self._close_cb:
                 self._run_callback(self._close_cb)
@@ -318,10 +696,10 @@ class SocketIOHandler(IOHandler):
             raise StreamClosedError('Stream closing or closed.')
 
     def _do_read(self, recv_buffer):
-        return self._socket.recv_into(recv_buffer, self._recv_chunk_size)
+        return self._socket.recv_into(recv_buffer, len(recv_buffer))
 
-    def _do_write(self, send_buffer):
-        return self._socket.send(send_buffer)
+    def _do_write(self, buffers):
+        return self._socket.send(coalesce(buffers))
 
     def _handle_events(self, fd, events):
         #gen_log.debug('Handle event for stream(fd: {0})'.format(self.handle.fd))
@@ -331,7 +709,10 @@ class SocketIOHandler(IOHandler):
             return
 
         try:
-            if self._socket is not None and events & self._io_loop.READ:
+            # Events polled together may be stale by the time they are
+            # handled; reading may have been disabled since
+            if (self._socket is not None and events & self._io_loop.READ and
+                    self.handle.is_reading()):
                 self.handle_read()
 
             if self._socket is not None and events & self._io_loop.WRITE:
@@ -363,34 +744,86 @@ class SocketIOHandler(IOHandler):
             self.close()
 
     def handle_read(self):
+        self._read_once()
+
+        # Edge triggered sockets are only reported readable once so reading
+        # carries on until they run dry or reading is disabled
+        while not self.closed() and self.handle.read_ready():
+            self._read_once()
+
+    def _read_once(self):
+        if self._splicer is not None:
+            self._splicer.on_readable()
+            return
+
+        if self._recv_buffer is None:
+            self._recv_buffer = self._recv_buffers.acquire(self._recv_size)
+            self._recv_view = memoryview(self._recv_buffer)
+
+        read = 0
+
         try:
             read = self._do_read(self._recv_buffer)
 
-            if read is not None:
-                if read > 0 and self._read_cb:
-                    self._run_callback(self._read_cb, self._recv_buffer[:read])
-                elif read == 0:
-                    self.close()
+            if read > 0:
+                # A short read means a stream socket has run dry
+                if read < self._recv_size:
+                    self.handle.read_blocked()
+
+                if self._read_cb:
+                    self._run_callback(self._read_cb, self._recv_view[:read])
+            elif read == 0:
+                self.close()
         except (socket.error, IOError, OSError) as ex:
-                if ex.args[0] not in _ERRNO_WOULDBLOCK:
+                if ex.args[0] in _ERRNO_WOULDBLOCK:
+                    self.handle.read_blocked()
+                else:
                     self.handle_error(ex.args[0])
+        finally:
+            self._recycle_recv_buffer(read)
+
+    def _recycle_recv_buffer(self, read):
+        size = self._recv_size
+        self._recv_size = self._recv_buffers.next_size(size, read)
+
+        if self._recv_buffer_kept:
+            # The buffer belongs to whoever kept it now
+            self._recv_buffer_kept = False
+            self._recv_buffer = None
+            self._recv_view = None
+        elif read < size or self._recv_size != size:
+            self._recv_view = None
+            self._recv_buffers.release(self._recv_buffer)
+            self._recv_buffer = None
 
     def handle_write(self):
         if self._write_queue.has_next():
             try:
-                msg = None
-
                 while self._write_queue.has_next():
-                    msg, offset = self._write_queue.next()
-                    sent = self._do_write(msg[offset:])
+                    buffers = self._write_queue.gather(
+                        _COALESCE_MAX_BUFFERS, _COALESCE_MAX_BYTES)
+                    sent = self._do_write(buffers)
                     self._write_queue.advance(sent)
             except (socket.error, IOError, OSError) as ex:
+                # Nothing was sent when the socket would block so the queue
+                # is left as is
                 if ex.args[0] in _ERRNO_WOULDBLOCK:
-                    self._write_queue.appendleft(msg)
+                    self.handle.write_blocked()
+                    self._run_drain_callback()
                 else:
                     self._write_queue.clear()
                     self.handle_error(ex.args[0])
+                return
+
+            # Edge triggered sockets are not reported writable again so the
+            # write is finished as soon as everything went out
+            finished = self.handle.edge_triggered
         else:
+            finished = True
+
+        self._run_drain_callback()
+
+        if finished:
             self.handle.disable_writing()
 
             if self._write_cb:
@@ -398,6 +831,17 @@ class SocketIOHandler(IOHandler):
                 self._write_cb = None
                 self._run_callback(callback)
 
+            # Bytes spliced into this stream go out once the queue is empty
+            if self._sink_splicer is not None:
+                self._sink_splicer.on_writable()
+
+    def _run_drain_callback(self):
+        if (self._drain_cb is not None and
+                self._write_queue.size() <= self._write_low_watermark):
+            callback = self._drain_cb
+            self._drain_cb = None
+            self._run_callback(callback)
+
     def handle_connect(self):
         if self._on_connect_cb is not None:
             callback = self._on_connect_cb
@@ -446,6 +890,10 @@ class SSLSocketIOHandler(SocketIOHandler):
         object.
         """
         self._ssl_options = kwargs.pop('ssl_options', {})
+
+        # The SSL layer buffers records of its own so the socket running dry
+        # says nothing about what is left to read; stay level triggered
+        kwargs.pop('edge_triggered', None)
         super(SSLSocketIOHandler, self).__init__(*args, **kwargs)
         self._ssl_accepting = True
         self._handshake_reading = False
@@ -470,6 +918,14 @@ class SSLSocketIOHandler(SocketIOHandler):
     def writing(self):
         return self._handshake_writing or super(SSLSocketIOHandler, self).writing()
 
+    def peer_connected(self):
+        # SSL sockets can't be peeked at without disturbing the SSL layer
+        return not self.closed() and not self._ssl_accepting
+
+    def can_splice(self):
+        # Encrypted bytes can not be forwarded as is
+        return False
+
     def _do_ssl_handshake(self):
         # Based on code from test_ssl.py in the python stdlib
         try:
@@ -586,11 +1042,7 @@ class SSLSocketIOHandler(SocketIOHandler):
             return -1
 
         try:
-            bytes = self._socket.read(self._recv_chunk_size)
-            read = len(bytes)
-            recv_buffer[:read] = bytes
-
-            return read
+            return self._socket.recv_into(recv_buffer, len(recv_buffer))
         except ssl.SSLError as e:
             # SSLError is a subclass of socket.error, so this except
             # block must come first.
@@ -598,6 +1050,3 @@ class SSLSocketIOHandler(SocketIOHandler):
                 return -1
             else:
                 raise
-
-    def _do_write(self, send_buffer):
-        return self._socket.send(send_buffer)
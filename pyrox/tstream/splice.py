@@ -0,0 +1,197 @@
+"""
+Socket to socket forwarding with the Linux splice(2) system call. Bytes are
+moved from one socket to another through a pipe without ever being copied
+into user space.
+"""
+from __future__ import absolute_import, division, print_function,\
+    with_statement
+
+import ctypes
+import ctypes.util
+import errno
+import os
+import sys
+
+from tornado.log import gen_log
+
+
+SPLICE_F_MOVE = 1
+SPLICE_F_NONBLOCK = 2
+SPLICE_F_MORE = 4
+
+# The default capacity of a Linux pipe
+_PIPE_CAPACITY = 65536
+
+_ERRNO_WOULDBLOCK = (errno.EWOULDBLOCK, errno.EAGAIN)
+
+
+def _load_libc_splice():
+    if not sys.platform.startswith('linux'):
+        return None
+
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6',
+                           use_errno=True)
+        libc_splice = libc.splice
+    except (OSError, AttributeError):
+        return None
+
+    libc_splice.argtypes = (ctypes.c_int, ctypes.c_void_p, ctypes.c_int,
+                            ctypes.c_void_p, ctypes.c_size_t, ctypes.c_uint)
+    libc_splice.restype = ctypes.c_ssize_t
+    return libc_splice
+
+
+if hasattr(os, 'splice'):
+    _libc_splice = None
+    SPLICE_SUPPORTED = True
+else:
+    # Python 2 has no os.splice so call into libc directly
+    _libc_splice = _load_libc_splice()
+    SPLICE_SUPPORTED = _libc_splice is not None
+
+
+def splice(fd_in, fd_out, length, flags=SPLICE_F_MOVE | SPLICE_F_NONBLOCK):
+    """
+    Moves up to length bytes from fd_in to fd_out, one of which must be a
+    pipe. Returns the number of bytes moved and raises OSError on failure.
+    """
+    if _libc_splice is None:
+        return os.splice(fd_in, fd_out, length, flags=flags)
+
+    moved = _libc_splice(fd_in, None, fd_out, None, length, flags)
+
+    if moved < 0:
+        error = ctypes.get_errno()
+        raise OSError(error, os.strerror(error))
+
+    return moved
+
+
+class SpliceForwarder(object):
+    """
+    Forwards a fixed number of bytes read from a source stream to a
+    destination stream through a pipe. While forwarding, the source stream
+    hands its read events to the forwarder instead of reading into its
+    buffer. Anything already queued for writing on the destination is sent
+    before forwarded bytes.
+
+    If either stream closes before all bytes have been forwarded, the other
+    one is closed as well since neither end can make sense of what follows.
+
+    :param source: the SocketIOHandler to read from.
+    :param dest: the SocketIOHandler to write to.
+    :param length: the number of bytes to forward.
+    :param callback: called with the number of bytes forwarded once all of
+                     them have been written to the destination.
+    """
+    def __init__(self, source, dest, length, callback):
+        self._source = source
+        self._dest = dest
+        self._remaining = length
+        self._buffered = 0
+        self._forwarded = 0
+        self._callback = callback
+        self._waiting_on_dest = False
+        self._pipe_r, self._pipe_w = os.pipe()
+
+    def start(self):
+        self._source.handle.disable_reading()
+
+        if self._dest.writing():
+            # Let the destination flush what it already has first
+            self._waiting_on_dest = True
+        else:
+            self._resume()
+
+    def abort(self):
+        """
+        Stops forwarding without calling back and closes both streams.
+        """
+        self._release()
+
+        if not self._dest.closed():
+            self._dest.close()
+
+        if not self._source.closed():
+            self._source.close()
+
+    def on_readable(self):
+        try:
+            moved = splice(self._source.handle.fd, self._pipe_w,
+                           min(self._remaining, _PIPE_CAPACITY),
+                           SPLICE_F_MOVE | SPLICE_F_NONBLOCK | SPLICE_F_MORE)
+        except OSError as ose:
+            if ose.errno in _ERRNO_WOULDBLOCK:
+                self._source.handle.read_blocked()
+            else:
+                gen_log.warning('Splicing from stream failed: %s', ose)
+                self.abort()
+            return
+
+        if moved == 0:
+            # The source hung up before everything was forwarded
+            self.abort()
+            return
+
+        self._remaining -= moved
+        self._buffered += moved
+
+        if self._drain():
+            if self._remaining == 0:
+                self._finish()
+        elif self._pipe_r is not None:
+            self._source.handle.disable_reading()
+
+    def on_writable(self):
+        """
+        Called by the destination stream once its write queue is empty and
+        it may be written to.
+        """
+        if self._waiting_on_dest:
+            self._waiting_on_dest = False
+            self._resume()
+
+    def _resume(self):
+        if self._pipe_r is None or not self._drain():
+            return
+
+        if self._remaining == 0:
+            self._finish()
+        else:
+            self._source.handle.resume_reading()
+
+    def _drain(self):
+        while self._buffered > 0:
+            try:
+                moved = splice(self._pipe_r, self._dest.handle.fd,
+                               self._buffered)
+            except OSError as ose:
+                if ose.errno in _ERRNO_WOULDBLOCK:
+                    # Wait until the destination can take more
+                    self._dest.handle.write_blocked()
+                    self._waiting_on_dest = True
+                    self._dest.handle.resume_writing()
+                else:
+                    gen_log.warning('Splicing to stream failed: %s', ose)
+                    self.abort()
+                return False
+
+            self._buffered -= moved
+            self._forwarded += moved
+
+        return True
+
+    def _finish(self):
+        self._release()
+        self._callback(self._forwarded)
+
+    def _release(self):
+        self._source.end_splice(self)
+        self._dest.end_splice(self)
+
+        if self._pipe_r is not None:
+            os.close(self._pipe_r)
+            os.close(self._pipe_w)
+            self._pipe_r = None
+            self._pipe_w = None
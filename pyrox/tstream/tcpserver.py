@@ -64,10 +64,17 @@ class TCPServer(object):
 
     .. versionadded:: 3.1
     The ``max_buffer_size`` argument.
+
+    Plain connections are polled in edge triggered mode when
+    ``edge_triggered`` is set and the IOLoop supports it. Connections read
+    into buffers from ``recv_buffers``, a `.ReceiveBufferPool`, when given.
     """
-    def __init__(self, io_loop=None, ssl_options=None, max_buffer_size=None):
+    def __init__(self, io_loop=None, ssl_options=None, max_buffer_size=None,
+                 edge_triggered=False, recv_buffers=None):
         self._io_loop = io_loop
         self.ssl_options = ssl_options
+        self.edge_triggered = edge_triggered
+        self.recv_buffers = recv_buffers
         self._sockets = {}  # fd -> socket object
         self._pending_sockets = []
         self._started = False
@@ -222,9 +229,12 @@ class TCPServer(object):
                     raise
         try:
             if self.ssl_options is not None:
-                stream = SSLSocketIOHandler(connection, io_loop=self._io_loop)
+                stream = SSLSocketIOHandler(connection, io_loop=self._io_loop,
+                                            recv_buffers=self.recv_buffers)
             else:
-                stream = SocketIOHandler(connection, io_loop=self._io_loop)
+                stream = SocketIOHandler(connection, io_loop=self._io_loop,
+                                         edge_triggered=self.edge_triggered,
+                                         recv_buffers=self.recv_buffers)
             self.handle_stream(stream, address)
         except Exception:
             app_log.error("Error in connection callback", exc_info=True)
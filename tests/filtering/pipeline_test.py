@@ -3,6 +3,8 @@ import unittest
 
 import pyrox.filtering as filtering
 
+from pyrox.filtering.pipeline import dispatch_plan
+
 
 class TestFilterWithAllDecorators(filtering.HttpFilter):
 
@@ -52,5 +54,46 @@ class WhenBuildingPipelines(unittest.TestCase):
         self.assertTrue(http_filter.were_expected_calls_made())
 
 
+class TestRequestHeadFilter(filtering.HttpFilter):
+
+    @filtering.handles_request_head
+    def on_req_head(self, request_head):
+        pass
+
+    def helper(self):
+        pass
+
+
+class WhenCompilingDispatchPlans(unittest.TestCase):
+
+    def test_plans_are_compiled_once_per_class(self):
+        self.assertIs(dispatch_plan(TestFilterWithAllDecorators),
+                      dispatch_plan(TestFilterWithAllDecorators))
+
+    def test_plans_record_handlers_per_phase(self):
+        plan = dispatch_plan(TestRequestHeadFilter)
+
+        self.assertEqual(('on_req_head', ), plan.request_head)
+        self.assertEqual((), plan.request_body)
+        self.assertEqual((), plan.response_head)
+        self.assertEqual((), plan.response_body)
+        self.assertFalse(plan.is_empty())
+
+    def test_undecorated_filters_have_empty_plans(self):
+        self.assertTrue(dispatch_plan(filtering.HttpFilter).is_empty())
+
+    def test_pipelines_bind_handlers_to_each_filter(self):
+        pipeline = filtering.HttpFilterPipeline()
+        first = TestRequestHeadFilter()
+        second = TestRequestHeadFilter()
+
+        pipeline.add_filter(first)
+        pipeline.add_filter(second)
+
+        self.assertEqual([first, second],
+                         [f for f, method in pipeline._req_head_chain])
+        self.assertFalse(pipeline.intercepts_req_body())
+
+
 if __name__ == '__main__':
     unittest.main()
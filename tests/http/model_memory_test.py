@@ -0,0 +1,94 @@
+"""
+Memory benchmark for the HTTP model. Builds a number of requests the way
+the proxy does, from a parsed header block, keeps them all alive and
+reports how much the process grew per message.
+::
+    python -m tests.http.model_memory_test --messages 10000
+"""
+import argparse
+import gc
+import resource
+
+from pyrox.http import HttpRequest
+
+
+HEADERS = [
+    ('Host', 'example.com'),
+    ('User-Agent', 'Mozilla/5.0 (X11; Linux x86_64) Gecko/20100101'),
+    ('Accept', 'text/html,application/xhtml+xml,application/xml;q=0.9'),
+    ('Accept-Language', 'en-US,en;q=0.5'),
+    ('Accept-Encoding', 'gzip, deflate'),
+    ('Cookie', 'session=0123456789abcdef; theme=dark'),
+    ('Connection', 'keep-alive'),
+    ('Cache-Control', 'max-age=0'),
+    ('X-Request-Id', '0123456789abcdef'),
+    ('Authorization', 'Bearer abc.def.ghi')
+]
+
+HEADER_BLOCK = ''.join(
+    '{0}: {1}\r\n'.format(field, value) for field, value in HEADERS)
+
+
+def _rss_kb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def _fresh(value):
+    # The parser hands every message its own strings
+    return bytes(bytearray(value))
+
+
+def parsed_request():
+    request = HttpRequest()
+    request.method = 'GET'
+    request.url = _fresh('/index.html')
+    request.load_headers(
+        [(_fresh(field), _fresh(value)) for field, value in HEADERS],
+        _fresh(HEADER_BLOCK))
+    return request
+
+
+def touched_request():
+    # A filter that reads every header and keeps something in local_data
+    request = parsed_request()
+    for header in request.headers:
+        header.values
+    request.local_data['seen'] = True
+    return request
+
+
+def measure(factory, count):
+    gc.collect()
+    objects_before = len(gc.get_objects())
+    rss_before = _rss_kb()
+
+    messages = [factory() for i in range(count)]
+
+    gc.collect()
+    objects = len(gc.get_objects()) - objects_before
+    grown = (_rss_kb() - rss_before) * 1024
+
+    return messages, objects, grown
+
+
+def run_benchmark(count=10000):
+    # Keep every run alive so that each one measures fresh growth
+    live = list()
+
+    for name, factory in (('parsed', parsed_request),
+                          ('touched', touched_request)):
+        messages, objects, grown = measure(factory, count)
+        live.append(messages)
+
+        print('{0:10} {1:>8} messages {2:>10.1f} bytes/message '
+              '{3:>6.1f} gc objects/message'.format(
+                  name, count, grown / float(count), objects / float(count)))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Pyrox model memory use')
+    parser.add_argument('--messages', type=int, default=10000,
+                        help='number of live messages to build')
+    args = parser.parse_args()
+
+    run_benchmark(args.messages)
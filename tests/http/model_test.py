@@ -32,6 +32,164 @@ class WhenManipulatingHeaders(unittest.TestCase):
         http_msg = HttpMessage()
         self.assertIsNone(http_msg.get_header('test'))
 
+    def test_header_lookup_is_case_insensitive(self):
+        http_msg = HttpMessage()
+        header = http_msg.header('Content-Type')
+
+        self.assertIs(header, http_msg.get_header('content-type'))
+        self.assertIs(header, http_msg.get_header('CONTENT-TYPE'))
+        self.assertTrue(http_msg.remove_header('content-TYPE'))
+        self.assertIsNone(http_msg.get_header('Content-Type'))
+
+    def test_anagram_header_names_do_not_collide(self):
+        http_msg = HttpMessage()
+        http_msg.header('ab').values.append('1')
+        http_msg.header('ba').values.append('2')
+
+        self.assertEqual(['1'], http_msg.get_header('ab').values)
+        self.assertEqual(['2'], http_msg.get_header('ba').values)
+
+    def test_headers_keep_insertion_order_and_casing(self):
+        http_msg = HttpMessage()
+        names = ['X-Custom-{0}'.format(idx) for idx in range(20)]
+
+        for name in names:
+            http_msg.header(name)
+        for name in names[:15]:
+            http_msg.remove_header(name.lower())
+        http_msg.header('Host')
+
+        self.assertEqual(names[15:] + ['Host'],
+                         [header.name for header in http_msg.headers])
+        self.assertEqual(6, len(http_msg.headers))
+        self.assertIn('x-custom-19', http_msg.headers)
+
+
+class WhenUsingCompactMessages(unittest.TestCase):
+
+    def test_messages_and_headers_have_no_instance_dict(self):
+        for obj in (HttpHeader('test'), HttpRequest(), HttpResponse()):
+            with self.assertRaises(AttributeError):
+                obj.unexpected = True
+
+    def test_local_data_is_created_when_first_used(self):
+        request = HttpRequest()
+        self.assertIsNone(request._local_data)
+
+        request.local_data['key'] = 'value'
+        self.assertEqual({'key': 'value'}, request.local_data)
+
+    def test_single_values_become_a_list_when_asked_for(self):
+        request = HttpRequest()
+        request.method = 'GET'
+        request.url = '/'
+        request.load_headers([('Accept', '*/*')])
+
+        header = request.get_header('accept')
+        self.assertIsNone(header._values)
+
+        header.values.append('text/plain')
+        self.assertEqual(['*/*', 'text/plain'], header.values)
+        self.assertIn('Accept: */*, text/plain\r\n', request.to_bytes())
+
+    def test_values_may_be_replaced(self):
+        header = HttpHeader('Accept')
+        header.values = ['*/*']
+
+        self.assertEqual(['*/*'], header.values)
+
+
+class WhenSerializingMessages(unittest.TestCase):
+
+    def test_existing_content_length_is_not_duplicated(self):
+        response = HttpResponse()
+        response.status = '200 OK'
+        response.header('Content-Length').values.append('5')
+
+        self.assertEqual(
+            'HTTP/1.1 200 OK\r\nContent-Length: 5\r\n\r\n',
+            response.to_bytes())
+
+    def test_missing_content_length_defaults_to_zero(self):
+        request = HttpRequest()
+        request.method = 'GET'
+        request.url = '/'
+        request.header('Host').values.append('localhost')
+
+        self.assertEqual(
+            'GET / HTTP/1.1\r\nHost: localhost\r\n'
+            'content-length: 0\r\n\r\n',
+            request.to_bytes())
+
+
+HEADERS = [
+    ('Host', 'localhost'),
+    ('Accept', '*/*'),
+    ('X-Auth-Token', 'secret'),
+    ('Content-Length', '0')]
+
+HEADER_BLOCK = ''.join(
+    '{0}: {1}\r\n'.format(field, value) for field, value in HEADERS)
+
+
+def parsed_request(headers=HEADERS):
+    request = HttpRequest()
+    request.method = 'GET'
+    request.url = '/'
+    request.load_headers(headers, ''.join(
+        '{0}: {1}\r\n'.format(field, value) for field, value in headers))
+    return request
+
+
+class WhenSerializingParsedMessages(unittest.TestCase):
+
+    def test_untouched_headers_are_written_as_read(self):
+        self.assertEqual(
+            'GET / HTTP/1.1\r\n' + HEADER_BLOCK + '\r\n',
+            parsed_request().to_bytes())
+
+    def test_changed_headers_are_rebuilt_in_place(self):
+        request = parsed_request()
+        request.get_header('accept').values[0] = 'text/plain'
+
+        self.assertEqual(
+            'GET / HTTP/1.1\r\nHost: localhost\r\nAccept: text/plain\r\n'
+            'X-Auth-Token: secret\r\nContent-Length: 0\r\n\r\n',
+            request.to_bytes())
+
+    def test_replaced_and_removed_headers_are_not_spliced(self):
+        request = parsed_request()
+        request.replace_header('host').values.append('origin:8080')
+        request.remove_header('x-auth-token')
+
+        self.assertEqual(
+            'GET / HTTP/1.1\r\nAccept: */*\r\nContent-Length: 0\r\n'
+            'host: origin:8080\r\n\r\n',
+            request.to_bytes())
+
+    def test_added_values_are_joined_with_the_header(self):
+        request = parsed_request()
+        request.header('accept').values.append(bytearray('text/html'))
+
+        self.assertIn(
+            'Accept: */*, text/html\r\nX-Auth-Token: secret\r\n',
+            request.to_bytes())
+
+    def test_headers_read_more_than_once_are_joined(self):
+        request = parsed_request(
+            [('Set-Cookie', 'a=1'), ('Vary', '*'), ('Set-Cookie', 'b=2')])
+
+        self.assertEqual(
+            'GET / HTTP/1.1\r\nSet-Cookie: a=1, b=2\r\nVary: *\r\n'
+            'content-length: 0\r\n\r\n',
+            request.to_bytes())
+
+    def test_mismatched_header_blocks_are_rejected(self):
+        request = HttpRequest()
+
+        with self.assertRaises(ValueError):
+            request.load_headers(HEADERS, HEADER_BLOCK[:-2])
+
 
 if __name__ == '__main__':
     unittest.main()
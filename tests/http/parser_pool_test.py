@@ -0,0 +1,151 @@
+import unittest
+
+from pyrox.http import ParserDelegate, ParserPool
+from pyrox.http.parser import MIN_HEADER_SIZE
+
+REQUEST = (
+    'GET /test HTTP/1.1\r\n'
+    'Content-Length: 4\r\n\r\n'
+    'test'
+)
+
+RESPONSE = (
+    'HTTP/1.1 200 OK\r\n'
+    'Content-Length: 4\r\n\r\n'
+    'test'
+)
+
+LONG_HEADER_REQUEST = (
+    'GET /test HTTP/1.1\r\n'
+    'Cookie: ' + 'a' * 16384 + '\r\n'
+    'Content-Length: 0\r\n\r\n'
+)
+
+
+class RecordingDelegate(ParserDelegate):
+
+    def __init__(self):
+        self.events = list()
+
+    def on_req_path(self, url):
+        self.events.append(('path', url))
+
+    def on_status(self, status_code):
+        self.events.append(('status', status_code))
+
+    def on_header_value(self, value):
+        self.events.append(('header', len(value)))
+
+    def on_message_complete(self, is_chunked, keep_alive):
+        self.events.append(('complete', ))
+
+
+class WhenPoolingParsers(unittest.TestCase):
+
+    def setUp(self):
+        self.pool = ParserPool(max_idle=1)
+
+    def test_released_parsers_are_reused(self):
+        parser = self.pool.request_parser(RecordingDelegate())
+        self.pool.release(parser)
+
+        self.assertEqual(1, self.pool.idle_count())
+        self.assertIs(parser, self.pool.request_parser(RecordingDelegate()))
+        self.assertEqual(0, self.pool.idle_count())
+
+    def test_idle_limit_is_kept(self):
+        parsers = [self.pool.request_parser(RecordingDelegate())
+                   for i in range(2)]
+
+        for parser in parsers:
+            self.pool.release(parser)
+
+        self.assertEqual(1, self.pool.idle_count())
+
+    def test_reset_drops_partial_messages(self):
+        delegate = RecordingDelegate()
+        parser = self.pool.request_parser(RecordingDelegate())
+        parser.execute(REQUEST[:10])
+
+        self.pool.release(parser)
+        parser = self.pool.request_parser(delegate)
+        parser.execute(REQUEST)
+
+        self.assertEqual(
+            [('path', '/test'), ('header', 1), ('complete', )],
+            delegate.events)
+
+    def test_parsers_may_change_kind(self):
+        delegate = RecordingDelegate()
+        self.pool.release(self.pool.request_parser(RecordingDelegate()))
+
+        parser = self.pool.response_parser(delegate)
+        parser.execute(RESPONSE)
+
+        self.assertEqual(
+            [('status', 200), ('header', 1), ('complete', )],
+            delegate.events)
+
+    def test_header_buffer_grows_past_initial_size(self):
+        delegate = RecordingDelegate()
+        parser = self.pool.request_parser(delegate)
+
+        parser.execute(LONG_HEADER_REQUEST)
+        self.pool.release(parser)
+
+        parser = self.pool.request_parser(delegate)
+        parser.execute(LONG_HEADER_REQUEST)
+
+        self.assertEqual(2, delegate.events.count(('header', 16384)))
+        self.assertEqual(2, delegate.events.count(('complete', )))
+
+    def test_max_header_size_may_be_set_per_parser(self):
+        parser = self.pool.request_parser(
+            RecordingDelegate(), max_header_size=4096)
+
+        with self.assertRaises(Exception):
+            parser.execute(LONG_HEADER_REQUEST)
+
+    def test_max_header_size_is_reset_with_the_parser(self):
+        delegate = RecordingDelegate()
+        self.pool.release(self.pool.request_parser(
+            RecordingDelegate(), max_header_size=4096))
+
+        parser = self.pool.request_parser(delegate)
+        parser.execute(LONG_HEADER_REQUEST)
+
+        self.assertIn(('complete', ), delegate.events)
+
+    def test_max_header_size_smaller_than_initial_buffer(self):
+        delegate = RecordingDelegate()
+        parser = self.pool.request_parser(
+            delegate, max_header_size=MIN_HEADER_SIZE)
+        parser.execute(REQUEST)
+
+        self.assertIn(('complete', ), delegate.events)
+
+        with self.assertRaises(Exception):
+            parser.execute(LONG_HEADER_REQUEST)
+
+    def test_max_header_size_has_a_lower_bound(self):
+        for max_header_size in (0, 1, MIN_HEADER_SIZE - 1):
+            with self.assertRaises(ValueError):
+                self.pool.request_parser(
+                    RecordingDelegate(), max_header_size=max_header_size)
+
+    def test_parsers_can_not_be_reset_while_executing(self):
+        pool = self.pool
+
+        class ResettingDelegate(RecordingDelegate):
+
+            def on_message_complete(self, is_chunked, keep_alive):
+                pool.release(parser)
+
+        parser = self.pool.request_parser(ResettingDelegate())
+
+        with self.assertRaises(Exception):
+            parser.execute(REQUEST)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -22,7 +22,24 @@ CHUNKED_REQUEST = (
     'Connection: keep-alive\r\n'
     'Transfer-Encoding: chunked\r\n\r\n'
     '1e\r\nall your base are belong to us\r\n'
+    '0\r\n\r\n'
+)
+
+TRAILERS_REQUEST = (
+    'POST /upload HTTP/1.1\r\n'
+    'Transfer-Encoding: chunked\r\n'
+    'Trailer: X-Checksum, X-Count\r\n\r\n'
+    '1e;name=value\r\nall your base are belong to us\r\n'
     '0\r\n'
+    'X-Checksum: abc123\r\n'
+    'X-Count: 30 \r\n\r\n'
+)
+
+LONG_TOKENS_REQUEST = (
+    'GET /search?' + 'q=pyrox&' * 64 + 'page=1 HTTP/1.1\r\n'
+    'X-Long-Header-Name-' + 'a' * 100 + ': ' + 'v' * 100 + '\r\n'
+    'Cookie: ' + 'session=abcdef; ' * 64 + 'last=1\r\n'
+    'Content-Length: 0\r\n\r\n'
 )
 
 REQUEST_METHOD_SLOT = 'REQUEST_METHOD'
@@ -131,8 +148,224 @@ class NonChunkedValidatingDelegate(ValidatingDelegate):
         self.test.assertEqual(is_chunked, 0)
 
 
+class BodyCollectingDelegate(ParserDelegate):
+
+    def __init__(self):
+        self.body_types = list()
+        self.body = bytearray()
+
+    def on_body(self, data, length, is_chunked):
+        self.body_types.append(type(data))
+        self.body.extend(data)
+
+
+class CompletionCountingDelegate(BodyCollectingDelegate):
+
+    def __init__(self):
+        super(CompletionCountingDelegate, self).__init__()
+        self.completed = 0
+
+    def on_message_complete(self, is_chunked, keep_alive):
+        self.completed += 1
+
+
+class TrailerCollectingDelegate(CompletionCountingDelegate):
+
+    def __init__(self):
+        super(TrailerCollectingDelegate, self).__init__()
+        self.trailers = list()
+        self.trailers_before_complete = False
+
+    def on_trailer(self, field, value):
+        self.trailers.append((field, value))
+
+    def on_message_complete(self, is_chunked, keep_alive):
+        super(TrailerCollectingDelegate, self).on_message_complete(
+            is_chunked, keep_alive)
+        self.trailers_before_complete = len(self.trailers) > 0
+
+
+class BatchingTrackingDelegate(TrackingDelegate):
+
+    def __init__(self, delegate):
+        super(BatchingTrackingDelegate, self).__init__(delegate)
+        self.headers = None
+        self.headers_before_complete = False
+
+    def on_headers(self, headers):
+        self.headers = headers
+
+    def on_headers_complete(self):
+        self.headers_before_complete = self.headers is not None
+
+
 class WhenParsingRequests(unittest.TestCase):
 
+    def test_batching_headers(self):
+        tracker = BatchingTrackingDelegate(ValidatingDelegate(self))
+        parser = RequestParser(tracker)
+
+        chunk_message(UNEXPECTED_HEADER_REQUEST, parser, chunk_size=3)
+
+        self.assertEqual([
+            ('Test', 'test'),
+            ('Connection', 'keep-alive'),
+            ('Content-Length', '12')], tracker.headers)
+        self.assertTrue(tracker.headers_before_complete)
+
+        tracker.validate_hits({
+            REQUEST_METHOD_SLOT: 1,
+            REQUEST_URI_SLOT: 1,
+            HEADER_FIELD_SLOT: 0,
+            HEADER_VALUE_SLOT: 0,
+            BODY_COMPLETE_SLOT: 1}, self)
+
+    def test_reading_header_blocks(self):
+        tracker = BatchingTrackingDelegate(ValidatingDelegate(self))
+        blocks = list()
+        tracker.on_header_block = blocks.append
+        parser = RequestParser(tracker)
+
+        chunk_message(UNEXPECTED_HEADER_REQUEST, parser, chunk_size=3)
+
+        self.assertEqual([
+            'Test: test\r\n'
+            'Connection: keep-alive\r\n'
+            'Content-Length: 12\r\n'], blocks)
+
+    def test_reading_long_tokens(self):
+        for chunk_size in (1, 7, 64, len(LONG_TOKENS_REQUEST)):
+            tracker = BatchingTrackingDelegate(ParserDelegate())
+            path = list()
+            tracker.on_req_path = path.append
+            parser = RequestParser(tracker)
+
+            chunk_message(LONG_TOKENS_REQUEST, parser, chunk_size=chunk_size)
+
+            self.assertEqual(
+                ['/search?' + 'q=pyrox&' * 64 + 'page=1'], path)
+            self.assertEqual([
+                ('X-Long-Header-Name-' + 'a' * 100, 'v' * 100),
+                ('Cookie', 'session=abcdef; ' * 64 + 'last=1'),
+                ('Content-Length', '0')], tracker.headers)
+
+    def test_bad_path_characters_are_caught_mid_run(self):
+        for bad in ('\x01', '\x7f'):
+            parser = RequestParser(ParserDelegate())
+
+            with self.assertRaises(Exception):
+                parser.execute(
+                    'GET /search?q=a' + bad + 'b HTTP/1.1\r\n\r\n')
+
+    def test_batching_headers_across_messages(self):
+        tracker = BatchingTrackingDelegate(ValidatingDelegate(self))
+        parser = RequestParser(tracker)
+
+        parser.execute(CHUNKED_REQUEST)
+        parser.execute(NORMAL_REQUEST)
+
+        self.assertEqual([
+            ('Connection', 'keep-alive'),
+            ('Content-Length', '12')], tracker.headers)
+
+    def test_reading_buffer_protocol_objects(self):
+        delegate = BodyCollectingDelegate()
+        parser = RequestParser(delegate)
+
+        chunk_message(bytearray(NORMAL_REQUEST), parser)
+        self.assertEqual(b'This is test', delegate.body)
+
+    def test_zero_copy_body_views(self):
+        delegate = BodyCollectingDelegate()
+        parser = RequestParser(delegate, zero_copy=True)
+
+        chunk_message(memoryview(bytearray(NORMAL_REQUEST)), parser)
+        self.assertEqual(b'This is test', delegate.body)
+        self.assertEqual([memoryview, memoryview], delegate.body_types)
+
+    def test_zero_copy_chunked_body_views(self):
+        delegate = BodyCollectingDelegate()
+        parser = RequestParser(delegate, zero_copy=True)
+
+        chunk_message(CHUNKED_REQUEST, parser)
+        self.assertEqual(b'all your base are belong to us', delegate.body)
+
+    def test_skipping_forwarded_body_bytes(self):
+        delegate = CompletionCountingDelegate()
+        parser = RequestParser(delegate)
+
+        parser.execute(NORMAL_REQUEST[:-10])
+        self.assertEqual(10, parser.body_remaining())
+
+        parser.skip_body(4)
+        self.assertEqual(6, parser.body_remaining())
+        self.assertEqual(0, delegate.completed)
+
+        parser.skip_body(6)
+        self.assertEqual(0, parser.body_remaining())
+        self.assertEqual(1, delegate.completed)
+        self.assertEqual(b'Th', delegate.body)
+
+        parser.execute(NORMAL_REQUEST)
+        self.assertEqual(2, delegate.completed)
+
+    def test_skipping_past_the_body_fails(self):
+        parser = RequestParser(CompletionCountingDelegate())
+
+        parser.execute(NORMAL_REQUEST[:-10])
+        with self.assertRaises(Exception):
+            parser.skip_body(11)
+
+    def test_chunked_bodies_can_not_be_skipped(self):
+        parser = RequestParser(CompletionCountingDelegate())
+
+        parser.execute(CHUNKED_REQUEST[:-20])
+        self.assertEqual(0, parser.body_remaining())
+
+    def test_reading_trailers(self):
+        for chunk_size in (1, 5, len(TRAILERS_REQUEST)):
+            delegate = TrailerCollectingDelegate()
+            parser = RequestParser(delegate)
+
+            chunk_message(TRAILERS_REQUEST, parser, chunk_size=chunk_size)
+
+            self.assertEqual(b'all your base are belong to us', delegate.body)
+            self.assertEqual([
+                ('X-Checksum', 'abc123'),
+                ('X-Count', '30 ')], delegate.trailers)
+            self.assertTrue(delegate.trailers_before_complete)
+            self.assertEqual(1, delegate.completed)
+
+    def test_reading_raw_chunks(self):
+        raw_body = TRAILERS_REQUEST[TRAILERS_REQUEST.index('1e;'):]
+
+        for chunk_size in (1, 5, len(TRAILERS_REQUEST)):
+            delegate = TrailerCollectingDelegate()
+            parser = RequestParser(delegate, raw_chunks=True)
+
+            chunk_message(TRAILERS_REQUEST * 2, parser, chunk_size=chunk_size)
+
+            self.assertEqual(raw_body * 2, delegate.body)
+            self.assertEqual([], delegate.trailers)
+            self.assertEqual(2, delegate.completed)
+
+    def test_bad_chunk_sizes_are_caught(self):
+        for size_line in ('1g\r\n', 'ffffffffffffffffff\r\n'):
+            parser = RequestParser(ParserDelegate())
+            parser.execute(CHUNKED_REQUEST[:CHUNKED_REQUEST.index('1e')])
+
+            with self.assertRaises(Exception):
+                parser.execute(size_line)
+
+    def test_reading_pipelined_requests_with_content_length(self):
+        delegate = CompletionCountingDelegate()
+        parser = RequestParser(delegate)
+
+        parser.execute(NORMAL_REQUEST * 3)
+
+        self.assertEqual(3, delegate.completed)
+        self.assertEqual(b'This is test' * 3, delegate.body)
+
     def test_reading_request_with_content_length(self):
         tracker = TrackingDelegate(NonChunkedValidatingDelegate(self))
         parser = RequestParser(tracker)
@@ -1,4 +1,3 @@
-import unittest
 import time
 
 from pyrox.http import RequestParser, ParserDelegate
@@ -10,28 +9,68 @@ Content-Length: 12\r\n
 \r
 This is test"""
 
+LONG_URL_REQUEST = (
+    'GET /search?' + '&'.join(
+        'field{0}=value{0}'.format(i) for i in range(128)) + ' HTTP/1.1\r\n'
+    'Host: example.com\r\n'
+    'Content-Length: 0\r\n\r\n'
+)
 
-def performance(duration=10, print_output=True):
-    parser = RequestParser(ParserDelegate())
+COOKIE_REQUEST = (
+    'GET /account HTTP/1.1\r\n'
+    'Host: example.com\r\n'
+    'User-Agent: Mozilla/5.0 (X11; Linux x86_64) Gecko/20100101 Firefox/60.0\r\n'
+    'Accept: text/html,application/xhtml+xml,application/xml;q=0.9\r\n'
+    'Cookie: ' + '; '.join(
+        'session{0}={1}'.format(i, 'a' * 40) for i in range(32)) + '\r\n'
+    'Content-Length: 0\r\n\r\n'
+)
+
+REQUESTS = (
+    ('normal', NORMAL_REQUEST),
+    ('long-url', LONG_URL_REQUEST),
+    ('cookie', COOKIE_REQUEST)
+)
+
+
+class HeaderBatchingDelegate(ParserDelegate):
+
+    def on_headers(self, headers):
+        pass
+
+
+def performance(request=NORMAL_REQUEST, duration=10, print_output=True,
+                name='normal', delegate_cls=ParserDelegate):
+    parser = RequestParser(delegate_cls())
 
     runs = 0
     then = time.time()
     while time.time() - then < duration:
-        parser.execute(NORMAL_REQUEST)
+        parser.execute(request)
         runs += 1
     if print_output:
-        print('Ran {} times in {} seconds for {} runs per second.'.format(
-            runs,
-            duration,
-            runs / float(duration)))
+        print('{:10} {:>10.0f} runs per second {:>8.1f} MB/s'.format(
+            name,
+            runs / float(duration),
+            runs * len(request) / float(duration) / 1048576))
+
+
+def microbenchmarks(duration=5):
+    for delegate_cls in (ParserDelegate, HeaderBatchingDelegate):
+        print(delegate_cls.__name__)
+
+        for name, request in REQUESTS:
+            performance(request, duration, name=name,
+                        delegate_cls=delegate_cls)
+
 
 if __name__ == '__main__':
     print('Executing warmup')
-    performance(5, False)
+    performance(duration=5, print_output=False)
 
     print('Executing performance test')
-    performance(5)
+    microbenchmarks(5)
 
     print('Profiling...')
     import cProfile
-    cProfile.run('performance(5)')
+    cProfile.run('performance(duration=5)')
@@ -6,10 +6,17 @@ NORMAL_RESPONSE = """HTTP/1.1 200 OK\r
 Content-Length: 12\r\n\r
 This is test"""
 
+LONG_REASON_RESPONSE = (
+    'HTTP/1.1 200 ' + 'Very Much OK ' * 32 + '\r\n'
+    'Content-Length: 12\r\n\r\n'
+    'This is test'
+)
+
 CHUNKED_RESPONSE = """HTTP/1.1 200 OK\r
 Transfer-Encoding: chunked\r\n\r
 1e\r\nall your base are belong to us\r
 0\r
+\r
 """
 
 
@@ -121,6 +128,17 @@ class WhenParsingResponses(unittest.TestCase):
             BODY_SLOT: 3,
             BODY_COMPLETE_SLOT: 1}, self)
 
+    def test_reading_long_reason_phrases(self):
+        for chunk_size in (1, 10, len(LONG_REASON_RESPONSE)):
+            tracker = TrackingDelegate(ValidatingDelegate(self))
+            parser = ResponseParser(tracker)
+
+            chunk_message(LONG_REASON_RESPONSE, parser, chunk_size=chunk_size)
+
+            self.assertEqual(1, tracker.hits[RESPONSE_CODE_SLOT])
+            self.assertEqual(1, tracker.hits[HEADER_FIELD_SLOT])
+            self.assertEqual(1, tracker.hits[BODY_COMPLETE_SLOT])
+
     def test_reading_chunked_request(self):
         tracker = TrackingDelegate(ValidatingDelegate(self))
         parser = ResponseParser(tracker)
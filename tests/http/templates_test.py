@@ -0,0 +1,84 @@
+import mock
+import unittest
+
+from pyrox.http.templates import (ResponseTemplate, register_template,
+                                  get_template, load_templates, PYROX_ERROR,
+                                  UPSTREAM_UNAVAILABLE, REJECTION)
+from pyrox.filtering import reject
+
+
+class WhenBuildingTemplates(unittest.TestCase):
+
+    def test_status_line(self):
+        template = ResponseTemplate(502)
+
+        self.assertEqual(502, template.status_code)
+        self.assertTrue(template.to_bytes().startswith(
+            'HTTP/1.1 502 Bad Gateway\r\n'))
+
+    def test_empty_body(self):
+        template = ResponseTemplate(400)
+
+        self.assertIn('Content-Length: 0\r\n', template.to_bytes())
+        self.assertTrue(template.to_bytes().endswith('\r\n\r\n'))
+
+    def test_body_and_headers(self):
+        template = ResponseTemplate(
+            403, 'Go away', [('Content-Type', 'text/plain')])
+        data = template.to_bytes()
+
+        self.assertIn('Content-Type: text/plain\r\n', data)
+        self.assertIn('Content-Length: 7\r\n', data)
+        self.assertTrue(data.endswith('\r\n\r\nGo away'))
+
+    def test_serialized_once(self):
+        template = ResponseTemplate(503)
+
+        self.assertIs(template.to_bytes(), template.to_bytes())
+        self.assertIsInstance(template.to_bytes(), bytes)
+
+
+class WhenRegisteringTemplates(unittest.TestCase):
+
+    def setUp(self):
+        self.defaults = dict((name, get_template(name)) for name in
+                             (PYROX_ERROR, UPSTREAM_UNAVAILABLE, REJECTION))
+
+    def tearDown(self):
+        for name, template in self.defaults.items():
+            register_template(name, template)
+
+    def test_only_templates_may_be_registered(self):
+        with self.assertRaises(TypeError):
+            register_template('custom', object())
+
+    def test_filters_may_register_replies(self):
+        template = ResponseTemplate(429)
+        register_template('throttled', template)
+
+        self.assertIs(template, get_template('throttled'))
+
+    def test_loading_from_config(self):
+        templates_cfg = mock.MagicMock()
+        templates_cfg.pyrox_error_sc = 500
+        templates_cfg.pyrox_error_body = 'Oops'
+        templates_cfg.upstream_unavailable_sc = 503
+        templates_cfg.upstream_unavailable_body = None
+        templates_cfg.rejection_sc = 403
+        templates_cfg.rejection_body = None
+
+        load_templates(templates_cfg)
+
+        self.assertEqual(500, get_template(PYROX_ERROR).status_code)
+        self.assertTrue(get_template(PYROX_ERROR).to_bytes().endswith('Oops'))
+        self.assertEqual(403, get_template(REJECTION).status_code)
+
+    def test_rejecting_uses_the_rejection_template(self):
+        template = ResponseTemplate(403)
+        register_template(REJECTION, template)
+
+        self.assertIs(template, reject().payload[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -15,6 +15,45 @@ class WhenManipulatingHeaders(unittest.TestCase):
         self.assertIsNotNone(self.cfg)
         self.assertEqual(self.cfg.core.processes, 0)
 
+    def test_reentrant_filters(self):
+        self.assertEqual(
+            set(['pyrox.stock_filters.empty.EmptyFilter']),
+            self.cfg.pipeline.reentrant_filters)
+
+    def test_reentrant_flags_are_not_filter_aliases(self):
+        self.assertNotIn('a.reentrant', self.cfg.pipeline._filter_dict())
+
+    def test_max_header_size_default(self):
+        self.assertEqual(81920, self.cfg.core.max_header_size)
+
+    def test_max_header_size_has_a_lower_bound(self):
+        self.cfg.core._cfg.set('core', 'max_header_size', '0')
+
+        with self.assertRaises(ConfigurationError):
+            self.cfg.core.max_header_size
+
+    def test_edge_triggering_is_off_by_default(self):
+        self.assertFalse(self.cfg.core.edge_triggered)
+
+    def test_recv_buffer_size_defaults(self):
+        self.assertEqual(4096, self.cfg.core.min_recv_buffer_size)
+        self.assertEqual(65536, self.cfg.core.max_recv_buffer_size)
+
+    def test_balancer_defaults_to_round_robin(self):
+        self.assertEqual('round_robin', self.cfg.routing.balancer)
+
+    def test_failing_hosts_are_ejected_by_default(self):
+        self.assertEqual(5, self.cfg.routing.max_failures)
+        self.assertEqual(10, self.cfg.routing.ejection_time)
+        self.assertEqual(300, self.cfg.routing.max_ejection_time)
+
+    def test_health_checks_default_to_disabled(self):
+        self.assertEqual(0, self.cfg.routing.health_check_interval)
+        self.assertEqual('/', self.cfg.routing.health_check_path)
+
+    def test_pipelined_requests_default_to_one_at_a_time(self):
+        self.assertEqual(1, self.cfg.routing.max_pipelined_requests)
+
     def test_split_and_strip_multiple_paths(self):
         values_str = '/usr/share/project/python,/usr/share/other/python'
         split_on = ','
@@ -0,0 +1,100 @@
+import mock
+import socket
+import unittest
+
+import pyrox.filtering as filtering
+
+from pyrox.server.daemon import (_build_plfactories,
+                                 _bind_reuse_port_sockets)
+
+
+STATEFUL = 'tests.server.daemon_test.StatefulFilter'
+STATELESS = 'tests.server.daemon_test.StatelessFilter'
+
+
+class StatefulFilter(filtering.HttpFilter):
+
+    @filtering.handles_request_head
+    def on_request_head(self, request_head):
+        pass
+
+
+class StatelessFilter(filtering.HttpFilter):
+
+    @filtering.handles_request_head
+    def on_request_head(self, request_head):
+        pass
+
+
+def pipeline_config(upstream, downstream, reentrant):
+    config = mock.MagicMock()
+    config.pipeline.upstream = upstream
+    config.pipeline.downstream = downstream
+    config.pipeline.reentrant_filters = set(reentrant)
+    return config
+
+
+def filters_of(pipeline):
+    return [http_filter for http_filter, method in pipeline._req_head_chain]
+
+
+class WhenBuildingPipelineFactories(unittest.TestCase):
+
+    def test_reentrant_filters_are_shared(self):
+        upstream, downstream = _build_plfactories(pipeline_config(
+            [STATELESS, STATEFUL], [STATELESS], [STATELESS]))
+
+        first = filters_of(upstream())
+        second = filters_of(upstream())
+
+        self.assertIs(first[0], second[0])
+        self.assertIsNot(first[1], second[1])
+        self.assertIs(first[0], filters_of(downstream())[0])
+
+    def test_reentrant_pipelines_are_cached(self):
+        upstream, downstream = _build_plfactories(pipeline_config(
+            [STATELESS], [STATEFUL], [STATELESS]))
+
+        self.assertIs(upstream(), upstream())
+        self.assertIsNot(downstream(), downstream())
+
+    def test_filters_are_not_reentrant_by_default(self):
+        upstream, downstream = _build_plfactories(pipeline_config(
+            [STATELESS], [], []))
+
+        self.assertIsNot(filters_of(upstream())[0],
+                         filters_of(upstream())[0])
+
+
+class WhenBindingReusePortSockets(unittest.TestCase):
+
+    def setUp(self):
+        self.sockets = list()
+
+    def tearDown(self):
+        for sock in self.sockets:
+            sock.close()
+
+    def bind(self, port):
+        sockets = _bind_reuse_port_sockets('127.0.0.1', port)
+        self.sockets.extend(sockets)
+        return sockets
+
+    def test_workers_may_bind_the_same_port(self):
+        first = self.bind(0)
+        port = first[0].getsockname()[1]
+
+        second = self.bind(port)
+
+        self.assertEqual(1, len(second))
+        self.assertEqual(port, second[0].getsockname()[1])
+
+    def test_sockets_are_non_blocking(self):
+        sock = self.bind(0)[0]
+
+        with self.assertRaises(socket.error):
+            sock.accept()
+
+
+if __name__ == '__main__':
+    unittest.main()
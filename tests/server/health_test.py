@@ -0,0 +1,120 @@
+import socket
+import unittest
+
+import mock
+
+from tornado import gen
+from tornado.netutil import bind_sockets
+from tornado.tcpserver import TCPServer
+from tornado.testing import AsyncTestCase
+
+from pyrox.server.health import HealthChecker
+from pyrox.server.routing import PROTOCOL_HTTP
+
+
+class StatusOrigin(TCPServer):
+    """
+    Answers GET /<status> with that status code. Requests for /hang are
+    never answered.
+    """
+    @gen.coroutine
+    def handle_stream(self, stream, address):
+        head = yield stream.read_until(b'\r\n\r\n')
+        path = head.split(b' ')[1]
+
+        if path == b'/hang':
+            return
+
+        yield stream.write(
+            b'HTTP/1.1 ' + path[1:] + b' Status\r\n'
+            b'Content-Length: 0\r\n\r\n')
+        stream.close()
+
+
+class WhenCheckingUpstreamHealth(AsyncTestCase):
+
+    def setUp(self):
+        super(WhenCheckingUpstreamHealth, self).setUp()
+        origin_sockets = bind_sockets(0, '127.0.0.1')
+        self.target = ('127.0.0.1', origin_sockets[0].getsockname()[1],
+                       PROTOCOL_HTTP)
+        self.origin = StatusOrigin()
+        self.origin.add_sockets(origin_sockets)
+
+        self.router = mock.MagicMock()
+        self.router.mark_probed.side_effect = (
+            lambda target, healthy:
+                self.stop(('healthy' if healthy else 'ejected', target)))
+
+    def tearDown(self):
+        self.origin.stop()
+        super(WhenCheckingUpstreamHealth, self).tearDown()
+
+    def probe(self, target, path, timeout=2):
+        checker = HealthChecker(self.router, path=path, timeout=timeout,
+                                io_loop=self.io_loop)
+        checker.probe(target)
+        return self.wait()
+
+    def test_answering_targets_are_healthy(self):
+        self.assertEqual(('healthy', self.target),
+                         self.probe(self.target, '/200'))
+
+    def test_client_errors_count_as_healthy(self):
+        self.assertEqual(('healthy', self.target),
+                         self.probe(self.target, '/404'))
+
+    def test_server_errors_eject_targets(self):
+        self.assertEqual(('ejected', self.target),
+                         self.probe(self.target, '/503'))
+
+    def test_slow_targets_are_ejected(self):
+        self.assertEqual(('ejected', self.target),
+                         self.probe(self.target, '/hang', timeout=0.1))
+
+    def test_refused_connections_eject_targets(self):
+        closed = socket.socket()
+        closed.bind(('127.0.0.1', 0))
+        target = ('127.0.0.1', closed.getsockname()[1], PROTOCOL_HTTP)
+        closed.close()
+
+        self.assertEqual(('ejected', target), self.probe(target, '/200'))
+
+    def test_unresolvable_targets_are_ejected(self):
+        target = ('unresolvable.invalid', 80, PROTOCOL_HTTP)
+
+        with mock.patch.object(socket, 'getaddrinfo',
+                               side_effect=socket.gaierror(-2, 'unknown')):
+            HealthChecker(self.router, io_loop=self.io_loop).probe(target)
+
+        self.router.mark_probed.assert_called_once_with(target, False)
+
+    @unittest.skipUnless(socket.has_ipv6, 'IPv6 is not available')
+    def test_ipv6_targets_are_probed(self):
+        try:
+            origin_sockets = bind_sockets(0, '::1')
+        except socket.error:
+            self.skipTest('IPv6 loopback is not available')
+
+        origin = StatusOrigin()
+        origin.add_sockets(origin_sockets)
+        target = ('::1', origin_sockets[0].getsockname()[1], PROTOCOL_HTTP)
+
+        try:
+            self.assertEqual(('healthy', target), self.probe(target, '/200'))
+        finally:
+            origin.stop()
+
+    def test_ejected_targets_are_not_probed(self):
+        self.router.routes = [self.target]
+        self.router.available.return_value = False
+        checker = HealthChecker(self.router, io_loop=self.io_loop)
+
+        with mock.patch.object(checker, 'probe') as probe:
+            checker.check()
+
+        self.assertFalse(probe.called)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,148 @@
+import mock
+import unittest
+
+from pyrox.server.pool import UpstreamPool
+from pyrox.server.proxyng import ConnectionTracker
+
+
+TARGET = ('localhost', 8080, 0)
+
+
+def live_stream():
+    stream = mock.MagicMock()
+    stream.closed.return_value = False
+    stream.peer_connected.return_value = True
+    return stream
+
+
+class WhenPoolingUpstreamStreams(unittest.TestCase):
+
+    def setUp(self):
+        self.io_loop = mock.MagicMock()
+        self.pool = UpstreamPool(max_idle_per_host=2, io_loop=self.io_loop)
+        self.acquired = list()
+
+    def acquire(self):
+        self.pool.acquire(TARGET, self.acquired.append)
+        return self.acquired[-1]
+
+    def test_empty_pool_asks_for_new_connection(self):
+        self.assertIsNone(self.acquire())
+        self.assertEqual(1, self.pool.in_use_count(TARGET))
+
+    def test_released_streams_are_reused(self):
+        stream = live_stream()
+
+        self.acquire()
+        self.pool.release(TARGET, stream)
+
+        self.assertEqual(0, self.pool.in_use_count(TARGET))
+        self.assertEqual(1, self.pool.idle_count(TARGET))
+        self.assertIs(stream, self.acquire())
+        self.assertEqual(0, self.pool.idle_count(TARGET))
+        self.io_loop.remove_timeout.assert_called_once_with(mock.ANY)
+
+    def test_dead_streams_are_not_reused(self):
+        stream = live_stream()
+
+        self.acquire()
+        self.pool.release(TARGET, stream)
+        stream.peer_connected.return_value = False
+
+        self.assertIsNone(self.acquire())
+        stream.close.assert_called_once_with()
+
+    def test_idle_limit_closes_extra_streams(self):
+        streams = [live_stream() for i in range(3)]
+
+        for stream in streams:
+            self.acquire()
+        for stream in streams:
+            self.pool.release(TARGET, stream)
+
+        self.assertEqual(2, self.pool.idle_count(TARGET))
+        streams[2].close.assert_called_once_with()
+
+    def test_idle_timeout_evicts_streams(self):
+        stream = live_stream()
+
+        self.acquire()
+        self.pool.release(TARGET, stream)
+
+        on_timeout = self.io_loop.add_timeout.call_args[0][1]
+        on_timeout()
+
+        self.assertEqual(0, self.pool.idle_count(TARGET))
+        stream.close.assert_called_once_with()
+
+    def test_origin_closing_idle_stream_evicts_it(self):
+        stream = live_stream()
+
+        self.acquire()
+        self.pool.release(TARGET, stream)
+
+        on_close = stream.on_close.call_args_list[0][0][0]
+        on_close()
+
+        self.assertEqual(0, self.pool.idle_count(TARGET))
+
+    def test_per_host_limit_queues_waiters(self):
+        self.pool = UpstreamPool(max_per_host=1, io_loop=self.io_loop)
+        stream = live_stream()
+
+        self.acquire()
+        self.pool.acquire(TARGET, self.acquired.append)
+        self.assertEqual(1, len(self.acquired))
+
+        self.pool.release(TARGET, stream)
+        self.assertIs(stream, self.acquired[-1])
+        self.assertEqual(1, self.pool.in_use_count(TARGET))
+
+    def test_discarding_wakes_waiters(self):
+        self.pool = UpstreamPool(max_per_host=1, io_loop=self.io_loop)
+
+        self.acquire()
+        self.pool.acquire(TARGET, self.acquired.append)
+        self.pool.discard(TARGET)
+
+        self.assertEqual(2, len(self.acquired))
+        self.assertIsNone(self.acquired[-1])
+        self.assertEqual(1, self.pool.in_use_count(TARGET))
+
+    def test_cancelled_waiters_are_not_woken(self):
+        self.pool = UpstreamPool(max_per_host=1, io_loop=self.io_loop)
+
+        self.acquire()
+        self.pool.acquire(TARGET, self.acquired.append)
+        self.assertTrue(self.pool.cancel(TARGET, self.acquired.append))
+        self.pool.discard(TARGET)
+
+        self.assertEqual(1, len(self.acquired))
+        self.assertEqual(0, self.pool.in_use_count(TARGET))
+        self.assertFalse(self.pool.cancel(TARGET, self.acquired.append))
+
+    def test_destroying_a_queued_tracker_gives_up_its_place(self):
+        self.pool = UpstreamPool(max_per_host=1, io_loop=self.io_loop)
+        on_live = mock.MagicMock()
+        tracker = ConnectionTracker(
+            self.pool, on_live, mock.MagicMock(), mock.MagicMock())
+
+        self.acquire()
+        self.pool.acquire(TARGET, self.acquired.append)
+        tracker.connect(TARGET)
+        tracker.destroy()
+
+        # The slot taken above is still checked out so nobody else may
+        # connect yet
+        self.assertEqual(1, len(self.acquired))
+        self.assertEqual(1, self.pool.in_use_count(TARGET))
+
+        stream = live_stream()
+        self.pool.release(TARGET, stream)
+
+        self.assertFalse(on_live.called)
+        self.assertIs(stream, self.acquired[-1])
+        self.assertEqual(1, self.pool.in_use_count(TARGET))
+
+if __name__ == '__main__':
+    unittest.main()
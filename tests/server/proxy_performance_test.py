@@ -0,0 +1,484 @@
+"""
+End-to-end proxy benchmark. Each run starts TornadoHttpProxy in one or more
+worker processes together with an in-process stub origin and drives it with
+a local, closed-loop load generator. Results are printed and may be written
+out as JSON so that runs can be diffed between releases. Kept-alive
+scenarios that run much slower than their closed counterparts are reported
+as regressions and fail the run.
+::
+    python -m tests.server.proxy_performance_test --duration 5 \\
+        --output results.json
+"""
+import argparse
+import json
+import multiprocessing
+import platform
+import socket
+import sys
+import time
+
+from tornado import gen
+from tornado.ioloop import IOLoop
+from tornado.iostream import StreamClosedError
+from tornado.netutil import bind_sockets
+from tornado.tcpserver import TCPServer
+
+import pyrox.filtering as filtering
+
+from pyrox.about import VERSION
+from pyrox.server.daemon import _bind_reuse_port_sockets
+from pyrox.server.pool import UpstreamPool
+from pyrox.server.proxyng import TornadoHttpProxy
+
+
+SMALL_BODY = 64
+LARGE_BODY = 256 * 1024
+
+_CHUNK_SIZE = 16384
+
+# Seconds a client waits on the proxy before counting an error
+_CLIENT_TIMEOUT = 10
+
+# Kept-alive requests skip the connect so their p50 should never be much
+# worse than that of the same requests on closed connections
+_KEEP_ALIVE_SLOWDOWN = 1.5
+
+
+class PassThroughBodyFilter(filtering.HttpFilter):
+    """
+    Intercepts both bodies without changing them so that the cost of body
+    filtering can be measured.
+    """
+    @filtering.handles_request_body
+    def on_request_body(self, body_part, output):
+        return filtering.next()
+
+    @filtering.handles_response_body
+    def on_response_body(self, body_part, output):
+        return filtering.next()
+
+
+def _body_filter_pipeline():
+    pipeline = filtering.HttpFilterPipeline()
+    pipeline.add_filter(PassThroughBodyFilter())
+    return pipeline
+
+
+_PIPELINES = {
+    'passthrough': filtering.HttpFilterPipeline,
+    'bodyfilter': _body_filter_pipeline
+}
+
+
+def _parse_head(head):
+    lines = head.split(b'\r\n')
+    headers = dict()
+
+    for line in lines[1:]:
+        if b':' in line:
+            name, value = line.split(b':', 1)
+            headers[name.strip().lower()] = value.strip().lower()
+
+    return lines[0], headers
+
+
+def _chunked(body):
+    framed = bytearray()
+
+    for offset in range(0, len(body), _CHUNK_SIZE):
+        chunk = body[offset:offset + _CHUNK_SIZE]
+        framed.extend(b'%x\r\n' % len(chunk))
+        framed.extend(chunk)
+        framed.extend(b'\r\n')
+
+    framed.extend(b'0\r\n\r\n')
+    return bytes(framed)
+
+
+def _message(start_line, headers, body, framing):
+    head = [start_line]
+    head.extend(headers)
+
+    if framing == 'chunked':
+        head.append(b'Transfer-Encoding: chunked')
+        body = _chunked(body)
+    else:
+        head.append(b'Content-Length: {0}'.format(len(body)))
+
+    return b'\r\n'.join(head) + b'\r\n\r\n' + body
+
+
+class StubOrigin(TCPServer):
+    """
+    Origin that reads and discards request bodies and answers requests for
+    /<size>/<framing> with a body of the given size and framing.
+    """
+    def __init__(self, *args, **kwargs):
+        super(StubOrigin, self).__init__(*args, **kwargs)
+        self._responses = dict()
+
+    def _response(self, path):
+        response = self._responses.get(path)
+
+        if response is None:
+            size, framing = path.strip(b'/').split(b'/')
+            response = _message(
+                b'HTTP/1.1 200 OK', (), b'x' * int(size), framing)
+            self._responses[path] = response
+
+        return response
+
+    @gen.coroutine
+    def handle_stream(self, stream, address):
+        try:
+            while True:
+                head = yield stream.read_until(b'\r\n\r\n')
+                request_line, headers = _parse_head(head)
+
+                if headers.get(b'transfer-encoding') == b'chunked':
+                    while True:
+                        size_line = yield stream.read_until(b'\r\n')
+                        size = int(size_line.split(b';')[0], 16)
+
+                        if size == 0:
+                            yield stream.read_until(b'\r\n')
+                            break
+                        yield stream.read_bytes(size + 2)
+                elif int(headers.get(b'content-length', 0)) > 0:
+                    yield stream.read_bytes(
+                        int(headers[b'content-length']))
+
+                path = request_line.split(b' ')[1]
+                yield stream.write(self._response(path))
+
+                if headers.get(b'connection') == b'close':
+                    stream.close()
+                    break
+        except StreamClosedError:
+            pass
+
+
+def _run_proxy(sockets, address, pipeline, ready, edge_triggered):
+    if sockets is None:
+        sockets = _bind_reuse_port_sockets(*address)
+
+    origin_sockets = bind_sockets(0, '127.0.0.1')
+    origin = StubOrigin()
+    origin.add_sockets(origin_sockets)
+
+    factory = _PIPELINES[pipeline]
+    proxy = TornadoHttpProxy(
+        (factory, factory),
+        ['http://127.0.0.1:{0}'.format(origin_sockets[0].getsockname()[1])],
+        upstream_pool=UpstreamPool(),
+        edge_triggered=edge_triggered)
+    proxy.add_sockets(sockets)
+
+    IOLoop.current().add_callback(ready.set)
+    IOLoop.current().start()
+
+
+class ResponseReader(object):
+
+    def __init__(self, sock):
+        self._sock = sock
+        self._buffer = b''
+        self.received = 0
+
+    def _fill(self):
+        data = self._sock.recv(65536)
+
+        if not data:
+            raise IOError('Connection closed mid-response')
+
+        self.received += len(data)
+        self._buffer += data
+
+    def _read_until(self, delimiter):
+        while delimiter not in self._buffer:
+            self._fill()
+
+        idx = self._buffer.index(delimiter) + len(delimiter)
+        data, self._buffer = self._buffer[:idx], self._buffer[idx:]
+        return data
+
+    def _skip(self, length):
+        while len(self._buffer) < length:
+            self._fill()
+
+        self._buffer = self._buffer[length:]
+
+    def read_response(self):
+        status_line, headers = _parse_head(self._read_until(b'\r\n\r\n'))
+
+        if headers.get(b'transfer-encoding') == b'chunked':
+            while True:
+                size = int(self._read_until(b'\r\n').split(b';')[0], 16)
+
+                if size == 0:
+                    self._read_until(b'\r\n')
+                    break
+                self._skip(size + 2)
+        else:
+            self._skip(int(headers.get(b'content-length', 0)))
+
+        return status_line
+
+
+def _drive(port, request, keep_alive, duration, results):
+    latencies = list()
+    sent = 0
+    received = 0
+    errors = 0
+    sock = None
+    reader = None
+
+    deadline = time.time() + duration
+
+    while time.time() < deadline:
+        started = time.time()
+
+        try:
+            if sock is None:
+                sock = socket.create_connection(
+                    ('127.0.0.1', port), _CLIENT_TIMEOUT)
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                reader = ResponseReader(sock)
+
+            sock.sendall(request)
+            sent += len(request)
+
+            if reader.read_response().split(b' ')[1] != b'200':
+                errors += 1
+        except (IOError, socket.error):
+            errors += 1
+
+            if sock is not None:
+                sock.close()
+                sock = None
+            continue
+
+        latencies.append(time.time() - started)
+
+        if not keep_alive:
+            received += reader.received
+            sock.close()
+            sock = None
+
+    if sock is not None:
+        received += reader.received
+        sock.close()
+
+    results.put((latencies, sent, received, errors))
+
+
+def _percentile(ordered, fraction):
+    if not ordered:
+        return 0.0
+    return ordered[int(fraction * (len(ordered) - 1))] * 1000
+
+
+def scenario_name(scenario, listen):
+    keep_alive, framing, body_size, pipeline = scenario
+
+    return '-'.join((
+        'keepalive' if keep_alive else 'close',
+        framing,
+        'large' if body_size == LARGE_BODY else 'small',
+        pipeline,
+        listen))
+
+
+def run_scenario(scenario, duration, concurrency, workers, listen,
+                 edge_triggered=False):
+    """
+    Runs a single benchmark scenario and returns a dictionary of its
+    results.
+    """
+    keep_alive, framing, body_size, pipeline = scenario
+    address = ('127.0.0.1', 0)
+    sockets = None
+
+    if listen == 'shared':
+        sockets = bind_sockets(0, '127.0.0.1')
+        port = sockets[0].getsockname()[1]
+    else:
+        # Reserve a free port for the workers to bind with SO_REUSEPORT
+        reserved = _bind_reuse_port_sockets(*address)
+        port = reserved[0].getsockname()[1]
+        reserved[0].close()
+        address = ('127.0.0.1', port)
+
+    servers = list()
+    for i in range(workers):
+        ready = multiprocessing.Event()
+        server = multiprocessing.Process(
+            target=_run_proxy,
+            args=(sockets, address, pipeline, ready, edge_triggered))
+        server.start()
+        ready.wait(10)
+        servers.append(server)
+
+    if sockets is not None:
+        for sock in sockets:
+            sock.close()
+
+    headers = [b'Host: 127.0.0.1']
+    if not keep_alive:
+        headers.append(b'Connection: close')
+    request = _message(
+        b'POST /{0}/{1} HTTP/1.1'.format(body_size, framing),
+        headers, b'x' * body_size, framing)
+
+    results = multiprocessing.Queue()
+    clients = [multiprocessing.Process(
+        target=_drive,
+        args=(port, request, keep_alive, duration, results))
+        for i in range(concurrency)]
+
+    for client in clients:
+        client.start()
+
+    latencies = list()
+    sent = received = errors = 0
+
+    for client in clients:
+        client_latencies, client_sent, client_received, client_errors = \
+            results.get()
+        latencies.extend(client_latencies)
+        sent += client_sent
+        received += client_received
+        errors += client_errors
+
+    for client in clients:
+        client.join()
+
+    for server in servers:
+        server.terminate()
+        server.join()
+
+    latencies.sort()
+
+    return {
+        'name': scenario_name(scenario, listen),
+        'keep_alive': keep_alive,
+        'framing': framing,
+        'body_size': body_size,
+        'pipeline': pipeline,
+        'listen': listen,
+        'workers': workers,
+        'requests': len(latencies),
+        'errors': errors,
+        'req_per_sec': len(latencies) / float(duration),
+        'p50_ms': _percentile(latencies, 0.50),
+        'p99_ms': _percentile(latencies, 0.99),
+        'bytes_per_sec': (sent + received) / float(duration)
+    }
+
+
+def scenarios():
+    for keep_alive in (True, False):
+        for framing in ('length', 'chunked'):
+            for body_size in (SMALL_BODY, LARGE_BODY):
+                for pipeline in ('passthrough', 'bodyfilter'):
+                    yield (keep_alive, framing, body_size, pipeline)
+
+
+def keep_alive_regressions(results):
+    """
+    Returns a dictionary for every kept-alive scenario whose p50 is more than
+    _KEEP_ALIVE_SLOWDOWN times that of the same scenario run with closed
+    connections.
+    """
+    closed = dict(
+        (result['name'].split('-', 1)[1], result)
+        for result in results if not result['keep_alive'])
+    regressions = list()
+
+    for result in results:
+        close_result = closed.get(result['name'].split('-', 1)[1])
+
+        if not result['keep_alive'] or close_result is None:
+            continue
+
+        if result['p50_ms'] > close_result['p50_ms'] * _KEEP_ALIVE_SLOWDOWN:
+            regressions.append({
+                'name': result['name'],
+                'p50_ms': result['p50_ms'],
+                'close_p50_ms': close_result['p50_ms']
+            })
+
+    return regressions
+
+
+def run_benchmark(duration=5, concurrency=8, workers=1, listen_modes=None,
+                  name_filter=None, edge_triggered=False):
+    listen_modes = listen_modes or ('shared', )
+    report = {
+        'pyrox_version': VERSION,
+        'python': platform.python_version(),
+        'duration': duration,
+        'concurrency': concurrency,
+        'workers': workers,
+        'edge_triggered': edge_triggered,
+        'scenarios': list()
+    }
+
+    for scenario in scenarios():
+        for listen in listen_modes:
+            if name_filter and name_filter not in scenario_name(
+                    scenario, listen):
+                continue
+
+            result = run_scenario(
+                scenario, duration, concurrency, workers, listen,
+                edge_triggered)
+
+            print('{name:48} {req_per_sec:10.1f} req/s  p50 {p50_ms:7.2f}ms'
+                  '  p99 {p99_ms:7.2f}ms  {bytes_per_sec:14.0f} B/s'
+                  '  errors {errors}'.format(**result))
+            report['scenarios'].append(result)
+
+    report['regressions'] = keep_alive_regressions(report['scenarios'])
+
+    for regression in report['regressions']:
+        print('REGRESSION {name}: p50 {p50_ms:.2f}ms kept alive against'
+              ' {close_p50_ms:.2f}ms with closed connections'.format(
+                  **regression))
+
+    return report
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Pyrox proxy benchmark')
+    parser.add_argument('--duration', type=float, default=5,
+                        help='seconds to run each scenario for')
+    parser.add_argument('--concurrency', type=int, default=8,
+                        help='number of load generating clients')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='number of proxy worker processes')
+    parser.add_argument('--listen', default='shared',
+                        choices=('shared', 'reuse_port', 'both'),
+                        help='how workers accept connections')
+    parser.add_argument('--scenario', default=None,
+                        help='only run scenarios whose name contains this')
+    parser.add_argument('--edge-triggered', action='store_true',
+                        help='poll proxy sockets in edge triggered mode')
+    parser.add_argument('--output', default=None,
+                        help='file to write the JSON report to')
+    args = parser.parse_args()
+
+    if args.listen == 'both':
+        listen_modes = ('shared', 'reuse_port')
+    else:
+        listen_modes = (args.listen, )
+
+    report = run_benchmark(args.duration, args.concurrency, args.workers,
+                           listen_modes, args.scenario, args.edge_triggered)
+
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(report, output, indent=2, sort_keys=True)
+
+    if report['regressions']:
+        sys.exit(1)
@@ -0,0 +1,510 @@
+import socket
+import struct
+import unittest
+
+import mock
+
+from tornado import gen
+from tornado.iostream import IOStream
+from tornado.netutil import bind_sockets
+from tornado.tcpserver import TCPServer
+from tornado.testing import AsyncTestCase, gen_test
+
+import pyrox.filtering as filtering
+
+from pyrox.filtering import HttpFilterPipeline
+from pyrox.server import proxyng
+from pyrox.server.pool import UpstreamPool
+from pyrox.server.proxyng import (Exchange, ResponseSink, TornadoHttpProxy,
+                                  UpstreamHandler)
+from pyrox.server.routing import EjectionPolicy, PROTOCOL_HTTP
+from pyrox.tstream.iostream import SocketIOHandler
+
+
+CHUNKED_BODY = (
+    b'4;part=1\r\n/tra\r\n5\r\niler\r\n0\r\n'
+    b'X-Checksum: abc123\r\n\r\n')
+
+
+class SlowFirstOrigin(TCPServer):
+    """
+    Answers GET /<path> with the path as the body. Requests for /slow are
+    answered after a delay so that later responses are ready first and
+    requests for /trailers are answered with a chunked body and trailers.
+    Requests for /error are answered with a 500 and requests for /reset
+    with part of a response before the connection is reset.
+    """
+    @gen.coroutine
+    def handle_stream(self, stream, address):
+        while True:
+            head = yield stream.read_until(b'\r\n\r\n')
+            path = head.split(b' ')[1]
+
+            if path == b'/slow':
+                yield gen.sleep(0.2)
+            elif path == b'/trailers':
+                yield stream.write(
+                    b'HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\n'
+                    b'Trailer: X-Checksum\r\n\r\n' + CHUNKED_BODY)
+                continue
+            elif path == b'/error':
+                yield stream.write(
+                    b'HTTP/1.1 500 Error\r\nContent-Length: 0\r\n\r\n')
+                continue
+            elif path == b'/reset':
+                yield stream.write(
+                    b'HTTP/1.1 200 OK\r\nContent-Length: 100\r\n\r\npart')
+                yield gen.sleep(0.1)
+                stream.socket.setsockopt(
+                    socket.SOL_SOCKET, socket.SO_LINGER,
+                    struct.pack('ii', 1, 0))
+                stream.close()
+                return
+
+            yield stream.write(
+                b'HTTP/1.1 200 OK\r\nContent-Length: ' +
+                str(len(path)) + b'\r\n\r\n' + path)
+
+
+class EchoOrigin(TCPServer):
+    """
+    Answers every request with the request body exactly as it was received,
+    chunk framing included.
+    """
+    @gen.coroutine
+    def handle_stream(self, stream, address):
+        while True:
+            head = yield stream.read_until(b'\r\n\r\n')
+            head = head.lower()
+
+            if b'transfer-encoding: chunked' in head:
+                body = yield stream.read_until(b'0\r\n\r\n')
+            else:
+                length = int(head.split(b'content-length:')[1]
+                             .split(b'\r\n')[0])
+                body = yield stream.read_bytes(length)
+
+            yield stream.write(
+                b'HTTP/1.1 200 OK\r\nContent-Length: ' +
+                str(len(body)) + b'\r\n\r\n' + body)
+
+
+class BodyFilter(filtering.HttpFilter):
+
+    @filtering.handles_request_body
+    def on_request_body(self, body_part, output):
+        output.write(body_part)
+        return filtering.next()
+
+
+def body_filter_pipeline():
+    pipeline = HttpFilterPipeline()
+    pipeline.add_filter(BodyFilter())
+    return pipeline
+
+
+class WhenHoldingPipelinedResponses(unittest.TestCase):
+
+    def setUp(self):
+        self.stream = mock.MagicMock()
+        self.sink = ResponseSink(max_held=9)
+        self.written = list()
+
+    def test_writes_are_held_until_attached(self):
+        self.sink.write(b'head')
+        self.sink.write(memoryview(b'body'), lambda: self.written.append(1))
+
+        self.assertEqual([1], self.written)
+        self.assertFalse(self.stream.write.called)
+
+        self.sink.attach(self.stream)
+
+        self.assertEqual(
+            [mock.call(b'head', None), mock.call(b'body', None)],
+            self.stream.write.call_args_list)
+
+    def test_callbacks_stall_past_the_limit(self):
+        self.sink.write(b'0123456789', lambda: self.written.append(1))
+        self.assertEqual([], self.written)
+
+        self.sink.attach(self.stream)
+        callback = self.stream.write.call_args[0][1]
+        callback()
+
+        self.assertEqual([1], self.written)
+
+    def test_attached_sinks_write_through(self):
+        callback = mock.MagicMock()
+
+        self.sink.attach(self.stream)
+        self.sink.write(b'data', callback)
+
+        self.stream.write.assert_called_once_with(b'data', callback)
+        self.assertFalse(callback.called)
+
+    def test_sinks_fill_up_at_the_limit(self):
+        self.sink.write(b'0123456789')
+        self.assertTrue(self.sink.write_buffer_full())
+
+        self.sink.on_drain(lambda: self.written.append(1))
+        self.assertEqual([], self.written)
+
+        self.sink.attach(self.stream)
+        self.stream.write.call_args[0][1]()
+
+        self.assertEqual([1], self.written)
+
+    def test_attached_sinks_drain_with_their_stream(self):
+        callback = mock.MagicMock()
+        self.stream.write_buffer_full.return_value = True
+
+        self.sink.attach(self.stream)
+
+        self.assertTrue(self.sink.write_buffer_full())
+        self.sink.on_drain(callback)
+        self.stream.on_drain.assert_called_once_with(callback)
+
+
+class WhenForwardingResponseBodies(unittest.TestCase):
+
+    def setUp(self):
+        self.downstream = mock.MagicMock()
+        self.downstream.write_buffer_full.return_value = False
+        self.upstream = mock.MagicMock()
+        self.handler = UpstreamHandler(
+            self.downstream, self.upstream, HttpFilterPipeline(),
+            mock.MagicMock())
+
+    def test_forwarded_views_keep_the_read_buffer(self):
+        view = memoryview(b'data')
+        self.handler.on_body(view, 4, False)
+
+        self.downstream.write.assert_called_once_with(view)
+        self.upstream.keep_read_buffer.assert_called_once_with()
+
+    def test_copies_leave_the_read_buffer_alone(self):
+        self.handler.on_body(b'data', 4, False)
+
+        self.assertFalse(self.upstream.keep_read_buffer.called)
+
+
+class WhenFlowControllingRequestBodies(unittest.TestCase):
+
+    def setUp(self):
+        self.upstream = mock.MagicMock()
+        self.upstream.write_buffer_full.return_value = False
+        self.request = mock.MagicMock()
+        self.request.to_bytes.return_value = b'head'
+        self.pause = mock.MagicMock()
+        self.resume = mock.MagicMock()
+
+        self.exchange = Exchange(
+            self.request, ('localhost', 80, 'http'), ResponseSink(),
+            self.pause, self.resume, mock.MagicMock(), max_held=8)
+
+    def test_requests_are_timed_from_when_they_are_sent(self):
+        self.assertIsNone(self.exchange.sent_at)
+
+        with mock.patch.object(proxyng.time, 'time', return_value=10):
+            self.exchange.on_live(self.upstream)
+
+        self.assertEqual(10, self.exchange.sent_at)
+
+    def test_reading_continues_while_little_is_held(self):
+        self.exchange.send(b'body', False)
+
+        self.assertFalse(self.pause.called)
+
+    def test_reading_pauses_once_the_limit_is_held(self):
+        self.exchange.send(b'body', False)
+        self.exchange.send(b'body', False)
+        self.assertEqual(1, self.pause.call_count)
+
+        self.exchange.on_live(self.upstream)
+
+        self.assertEqual(
+            [mock.call(b'head'), mock.call(bytearray(b'bodybody'))],
+            self.upstream.write.call_args_list)
+        self.assertEqual(1, self.resume.call_count)
+
+    def test_reading_pauses_while_upstream_is_full(self):
+        self.exchange.on_live(self.upstream)
+        self.upstream.write_buffer_full.return_value = True
+
+        self.exchange.send(b'body', False)
+        self.assertEqual(1, self.pause.call_count)
+        self.assertFalse(self.resume.called)
+
+        self.upstream.on_drain.call_args[0][0]()
+        self.assertEqual(1, self.resume.call_count)
+
+    def test_completed_requests_are_not_resumed_on_drain(self):
+        self.exchange.on_live(self.upstream)
+        self.upstream.write_buffer_full.return_value = True
+
+        self.exchange.send(b'body', False)
+        self.exchange.finish_request(False)
+        self.upstream.on_drain.call_args[0][0]()
+
+        self.assertFalse(self.resume.called)
+
+
+class WhenPipeliningRequests(AsyncTestCase):
+
+    def setUp(self):
+        super(WhenPipeliningRequests, self).setUp()
+        origin_sockets = bind_sockets(0, '127.0.0.1')
+        self.origin = SlowFirstOrigin()
+        self.origin.add_sockets(origin_sockets)
+
+        proxy_sockets = bind_sockets(0, '127.0.0.1')
+        self.port = proxy_sockets[0].getsockname()[1]
+        self.proxy = TornadoHttpProxy(
+            (HttpFilterPipeline, HttpFilterPipeline),
+            ['http://127.0.0.1:{0}'.format(
+                origin_sockets[0].getsockname()[1])],
+            upstream_pool=UpstreamPool(io_loop=self.io_loop),
+            max_pipelined=4)
+        self.proxy.add_sockets(proxy_sockets)
+
+    def tearDown(self):
+        self.proxy.stop()
+        self.origin.stop()
+        super(WhenPipeliningRequests, self).tearDown()
+
+    @gen.coroutine
+    def pipeline(self, *paths):
+        client = IOStream(socket.socket())
+        yield client.connect(('127.0.0.1', self.port))
+
+        yield client.write(b''.join(
+            b'GET /{0} HTTP/1.1\r\nHost: pyrox\r\n\r\n'.format(path)
+            for path in paths))
+
+        bodies = list()
+        for path in paths:
+            head = yield client.read_until(b'\r\n\r\n')
+            length = int(head.lower().split(b'content-length:')[1]
+                         .split(b'\r\n')[0])
+            body = yield client.read_bytes(length)
+            bodies.append(body)
+
+        client.close()
+        raise gen.Return(bodies)
+
+    @gen_test
+    def test_responses_are_written_in_request_order(self):
+        bodies = yield self.pipeline('slow', 'a', 'b')
+
+        self.assertEqual([b'/slow', b'/a', b'/b'], bodies)
+
+    @gen_test
+    def test_requests_past_the_limit_wait_their_turn(self):
+        paths = ['slow', 'a', 'b', 'c', 'd', 'e', 'f']
+        bodies = yield self.pipeline(*paths)
+
+        self.assertEqual([b'/' + path for path in paths], bodies)
+
+    @gen_test
+    def test_chunked_responses_are_forwarded_verbatim(self):
+        client = IOStream(socket.socket())
+        yield client.connect(('127.0.0.1', self.port))
+        yield client.write(b'GET /trailers HTTP/1.1\r\nHost: pyrox\r\n\r\n')
+
+        yield client.read_until(b'\r\n\r\n')
+        body = yield client.read_until(b'\r\n\r\n')
+        client.close()
+
+        self.assertEqual(CHUNKED_BODY, body)
+
+    @gen_test
+    def test_small_writes_are_not_delayed_on_either_side(self):
+        nodelay = list()
+        set_nodelay = SocketIOHandler.set_nodelay
+
+        def record(stream, value):
+            set_nodelay(stream, value)
+            nodelay.append(stream._socket.getsockopt(
+                socket.IPPROTO_TCP, socket.TCP_NODELAY))
+
+        with mock.patch.object(SocketIOHandler, 'set_nodelay', record):
+            yield self.pipeline('a')
+
+        self.assertEqual(2, len(nodelay))
+        self.assertTrue(all(nodelay))
+
+
+class WhenUpstreamsFail(AsyncTestCase):
+
+    def setUp(self):
+        super(WhenUpstreamsFail, self).setUp()
+        origin_sockets = bind_sockets(0, '127.0.0.1')
+        self.origin = SlowFirstOrigin()
+        self.origin.add_sockets(origin_sockets)
+        self.live = ('127.0.0.1', origin_sockets[0].getsockname()[1],
+                     PROTOCOL_HTTP)
+
+        closed = socket.socket()
+        closed.bind(('127.0.0.1', 0))
+        self.dead = ('127.0.0.1', closed.getsockname()[1], PROTOCOL_HTTP)
+        closed.close()
+
+        proxy_sockets = bind_sockets(0, '127.0.0.1')
+        self.port = proxy_sockets[0].getsockname()[1]
+        self.proxy = TornadoHttpProxy(
+            (HttpFilterPipeline, HttpFilterPipeline),
+            ['http://{0}:{1}'.format(*target)
+             for target in (self.live, self.dead)],
+            upstream_pool=UpstreamPool(io_loop=self.io_loop),
+            ejection=EjectionPolicy(max_failures=2))
+        self.proxy.add_sockets(proxy_sockets)
+
+    def tearDown(self):
+        self.proxy.stop()
+        self.origin.stop()
+        super(WhenUpstreamsFail, self).tearDown()
+
+    @gen.coroutine
+    def status_of(self, path):
+        client = IOStream(socket.socket())
+        yield client.connect(('127.0.0.1', self.port))
+        yield client.write(
+            b'GET /{0} HTTP/1.1\r\nHost: pyrox\r\n'
+            b'Connection: close\r\n\r\n'.format(path))
+
+        head = yield client.read_until(b'\r\n')
+        client.close()
+        raise gen.Return(int(head.split(b' ')[1]))
+
+    @gen_test
+    def test_refusing_targets_are_ejected(self):
+        statuses = list()
+        for i in range(8):
+            status = yield self.status_of('a')
+            statuses.append(status)
+
+        self.assertEqual(2, statuses.count(502))
+        self.assertEqual([200] * 4, statuses[-4:])
+        self.assertFalse(self.proxy.router.available(self.dead))
+        self.assertTrue(self.proxy.router.available(self.live))
+
+    @gen_test
+    def test_server_errors_count_as_failures(self):
+        router = self.proxy.router
+        router.eject(self.dead)
+
+        for i in range(2):
+            status = yield self.status_of('error')
+            self.assertEqual(500, status)
+
+        # Responses are accounted for once they have been written out
+        while router.available(self.live):
+            yield gen.sleep(0.01)
+
+        self.assertEqual(2, router.stats(self.live).failures)
+
+    @gen_test
+    def test_partial_responses_are_cut_short(self):
+        self.proxy.router.eject(self.dead)
+
+        client = IOStream(socket.socket())
+        yield client.connect(('127.0.0.1', self.port))
+        yield client.write(
+            b'GET /reset HTTP/1.1\r\nHost: pyrox\r\n'
+            b'Connection: close\r\n\r\n')
+
+        response = yield client.read_until_close()
+
+        self.assertTrue(response.startswith(b'HTTP/1.1 200'))
+        self.assertTrue(response.endswith(b'part'))
+
+
+class WhenProxyingRequestBodies(AsyncTestCase):
+
+    def setUp(self):
+        super(WhenProxyingRequestBodies, self).setUp()
+        origin_sockets = bind_sockets(0, '127.0.0.1')
+        self.origin = EchoOrigin()
+        self.origin.add_sockets(origin_sockets)
+        self.origin_url = 'http://127.0.0.1:{0}'.format(
+            origin_sockets[0].getsockname()[1])
+        self.proxy = None
+
+    def tearDown(self):
+        if self.proxy is not None:
+            self.proxy.stop()
+        self.origin.stop()
+        super(WhenProxyingRequestBodies, self).tearDown()
+
+    @gen.coroutine
+    def connect(self, ds_pipeline_factory=HttpFilterPipeline):
+        proxy_sockets = bind_sockets(0, '127.0.0.1')
+        self.proxy = TornadoHttpProxy(
+            (HttpFilterPipeline, ds_pipeline_factory),
+            [self.origin_url],
+            upstream_pool=UpstreamPool(io_loop=self.io_loop))
+        self.proxy.add_sockets(proxy_sockets)
+
+        client = IOStream(socket.socket())
+        yield client.connect(
+            ('127.0.0.1', proxy_sockets[0].getsockname()[1]))
+        raise gen.Return(client)
+
+    @gen.coroutine
+    def read_body(self, client):
+        head = yield client.read_until(b'\r\n\r\n')
+        length = int(head.lower().split(b'content-length:')[1]
+                     .split(b'\r\n')[0])
+        body = yield client.read_bytes(length)
+        raise gen.Return(body)
+
+    @gen_test
+    def test_chunked_requests_read_before_upstream_connects(self):
+        client = yield self.connect()
+
+        # The whole request arrives before the upstream connection is live
+        yield client.write(
+            b'POST / HTTP/1.1\r\nHost: pyrox\r\n'
+            b'Transfer-Encoding: chunked\r\n\r\n'
+            b'3\r\nabc\r\n0\r\n\r\n')
+        body = yield self.read_body(client)
+        client.close()
+
+        self.assertEqual(b'3\r\nabc\r\n0\r\n\r\n', body)
+
+    @gen_test
+    def test_filtered_bodies_stay_chunked(self):
+        client = yield self.connect(body_filter_pipeline)
+
+        yield client.write(
+            b'POST / HTTP/1.1\r\nHost: pyrox\r\n'
+            b'Content-Length: 6\r\n\r\nabc')
+        yield gen.sleep(0.05)
+        yield client.write(b'def')
+        body = yield self.read_body(client)
+        client.close()
+
+        self.assertEqual(b'3\r\nabc\r\n3\r\ndef\r\n0\r\n\r\n', body)
+
+    @gen_test
+    def test_kept_alive_requests_start_unchunked(self):
+        client = yield self.connect()
+
+        yield client.write(
+            b'POST / HTTP/1.1\r\nHost: pyrox\r\n'
+            b'Transfer-Encoding: chunked\r\n\r\n3\r\nabc\r\n')
+        yield gen.sleep(0.05)
+        yield client.write(b'0\r\n\r\n')
+        yield self.read_body(client)
+
+        yield client.write(
+            b'POST / HTTP/1.1\r\nHost: pyrox\r\n'
+            b'Content-Length: 3\r\n\r\nabc')
+        body = yield self.read_body(client)
+        client.close()
+
+        self.assertEqual(b'abc', body)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,232 @@
+import mock
+import unittest
+
+from pyrox.server import routing
+from pyrox.server.routing import (TargetStats, EjectionPolicy,
+                                  RoundRobinRouter, LeastOutstandingRouter,
+                                  PeakEwmaRouter, PowerOfTwoChoicesRouter,
+                                  new_router)
+
+
+ROUTES = ['http://a:80', 'http://b:80', 'http://c:80']
+
+A = ('a', 80, routing.PROTOCOL_HTTP)
+B = ('b', 80, routing.PROTOCOL_HTTP)
+C = ('c', 80, routing.PROTOCOL_HTTP)
+
+
+class WhenMeasuringTargets(unittest.TestCase):
+
+    def setUp(self):
+        self.stats = TargetStats()
+
+    def test_unmeasured_targets_cost_their_outstanding_requests(self):
+        self.assertEqual(0, self.stats.cost())
+
+        self.stats.outstanding = 2
+        self.assertEqual(2, self.stats.cost())
+
+    def test_slower_requests_raise_the_latency_at_once(self):
+        self.stats.observe(0.1, 0)
+        self.stats.observe(0.5, 0.1)
+
+        self.assertEqual(0.5, self.stats.latency)
+
+    def test_faster_requests_are_blended_in_over_time(self):
+        self.stats.observe(0.5, 0)
+
+        self.stats.observe(0.1, 0)
+        self.assertEqual(0.5, self.stats.latency)
+
+        self.stats.observe(0.1, 1000)
+        self.assertAlmostEqual(0.1, self.stats.latency)
+
+    def test_outstanding_requests_scale_the_cost(self):
+        self.stats.observe(0.1, 0)
+        self.stats.outstanding = 3
+
+        self.assertAlmostEqual(0.4, self.stats.cost())
+
+
+class WhenCountingRequests(unittest.TestCase):
+
+    def setUp(self):
+        self.router = RoundRobinRouter(ROUTES)
+
+    def test_started_requests_are_outstanding(self):
+        self.router.request_started(A)
+
+        self.assertEqual(1, self.router.stats(A).outstanding)
+
+    def test_finished_requests_are_measured(self):
+        self.router.request_started(A)
+
+        with mock.patch.object(routing.time, 'time', return_value=12):
+            self.router.request_finished(A, 10)
+
+        self.assertEqual(0, self.router.stats(A).outstanding)
+        self.assertEqual(2, self.router.stats(A).latency)
+
+    def test_other_targets_are_forgotten_once_idle(self):
+        D = ('d', 8080, routing.PROTOCOL_HTTP)
+
+        self.router.request_started(D)
+        self.router.request_started(A)
+        self.assertEqual(1, self.router.stats(D).outstanding)
+
+        self.router.request_started(D)
+        self.router.request_finished(D, routing.time.time())
+        self.router.request_finished(D)
+        self.router.mark_failure(D)
+        self.router.request_finished(A)
+
+        self.assertNotIn(D, self.router._stats)
+        self.assertIn(A, self.router._stats)
+        self.assertTrue(self.router.available(D))
+
+    def test_abandoned_requests_are_not_measured(self):
+        self.router.request_started(A)
+        self.router.request_finished(A)
+
+        self.assertEqual(0, self.router.stats(A).outstanding)
+        self.assertFalse(self.router.stats(A).measured())
+
+
+class WhenBalancingRequests(unittest.TestCase):
+
+    def test_least_outstanding_avoids_busy_targets(self):
+        router = LeastOutstandingRouter(ROUTES)
+        router.request_started(A)
+        router.request_started(A)
+        router.request_started(B)
+
+        self.assertEqual(C, router.get_next())
+
+    def test_least_outstanding_ties_go_round_robin(self):
+        router = LeastOutstandingRouter(ROUTES)
+
+        self.assertEqual(set([A, B, C]),
+                         set(router.get_next() for i in range(3)))
+
+    def test_peak_ewma_avoids_slow_targets(self):
+        router = PeakEwmaRouter(ROUTES)
+        router.stats(A).observe(0.5, 0)
+        router.stats(B).observe(0.1, 0)
+        router.stats(C).observe(0.3, 0)
+
+        self.assertEqual(B, router.get_next())
+
+        # Enough requests in flight make a fast target the slower choice
+        router.request_started(B)
+        router.request_started(B)
+        router.request_started(B)
+        self.assertEqual(C, router.get_next())
+
+    def test_p2c_picks_the_better_of_two(self):
+        router = PowerOfTwoChoicesRouter(ROUTES)
+        router.stats(A).observe(0.5, 0)
+        router.stats(B).observe(0.1, 0)
+
+        with mock.patch.object(router._random, 'sample',
+                               return_value=[A, B]):
+            self.assertEqual(B, router.get_next())
+
+    def test_p2c_with_a_single_target(self):
+        router = PowerOfTwoChoicesRouter(ROUTES[:1])
+
+        self.assertEqual(A, router.get_next())
+
+    def test_routes_set_by_filters_come_first(self):
+        router = PeakEwmaRouter(ROUTES)
+        router.set_next('http://d:8080')
+
+        self.assertEqual(('d', 8080, routing.PROTOCOL_HTTP),
+                         router.get_next())
+
+    def test_balancers_by_name(self):
+        self.assertIsInstance(new_router('peak_ewma', ROUTES), PeakEwmaRouter)
+        self.assertRaises(ValueError, new_router, 'random', ROUTES)
+
+
+class WhenEjectingTargets(unittest.TestCase):
+
+    def setUp(self):
+        self.now = 100
+        self.router = RoundRobinRouter(
+            ROUTES, EjectionPolicy(2, ejection_time=10, max_ejection_time=30))
+
+        patcher = mock.patch.object(
+            routing.time, 'time', side_effect=lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def routed(self):
+        return set(self.router.get_next() for i in range(6))
+
+    def test_targets_are_ejected_after_failing_in_a_row(self):
+        self.router.mark_failure(A)
+        self.assertEqual(set([A, B, C]), self.routed())
+
+        self.router.mark_failure(A)
+        self.assertEqual(set([B, C]), self.routed())
+        self.assertFalse(self.router.available(A))
+
+    def test_successes_reset_the_failures(self):
+        self.router.mark_failure(A)
+        self.router.mark_success(A)
+        self.router.mark_failure(A)
+
+        self.assertTrue(self.router.available(A))
+
+    def test_passing_health_checks_keep_the_failures(self):
+        self.router.mark_failure(A)
+        self.router.mark_probed(A, True)
+        self.router.mark_failure(A)
+
+        self.assertFalse(self.router.available(A))
+
+    def test_failing_health_checks_eject_targets(self):
+        self.router.mark_probed(A, False)
+
+        self.assertFalse(self.router.available(A))
+        self.assertEqual(1, self.router.stats(A).probe_failures)
+        self.assertEqual(0, self.router.stats(A).failures)
+
+    def test_ejected_targets_return_with_backoff(self):
+        self.router.eject(A)
+        self.now += 10
+        self.assertEqual(set([A, B, C]), self.routed())
+
+        # Failing again once it returns ejects it for longer
+        self.router.mark_failure(A)
+        self.router.mark_failure(A)
+        self.assertEqual(20, self.router.stats(A).ejected_until - self.now)
+
+        self.router.eject(A)
+        self.router.eject(A)
+        self.assertEqual(30, self.router.stats(A).ejected_until - self.now)
+
+    def test_all_targets_are_routed_to_when_all_are_ejected(self):
+        for target in (A, B, C):
+            self.router.eject(target)
+
+        self.assertEqual(set([A, B, C]), self.routed())
+
+    def test_balancers_skip_ejected_targets(self):
+        router = new_router('least_outstanding', ROUTES, EjectionPolicy(1))
+        router.mark_failure(C)
+
+        self.assertEqual(set([A, B]),
+                         set(router.get_next() for i in range(6)))
+
+    def test_ejecting_is_disabled_without_a_policy(self):
+        router = RoundRobinRouter(ROUTES)
+
+        for i in range(10):
+            router.mark_failure(A)
+
+        self.assertTrue(router.available(A))
+
+
+if __name__ == '__main__':
+    unittest.main()
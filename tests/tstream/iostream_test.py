@@ -0,0 +1,378 @@
+import errno
+import socket
+import unittest
+
+import mock
+
+from tornado.ioloop import IOLoop
+
+from pyrox.tstream.iostream import (WriteQueue, SocketIOHandler,
+                                    ReceiveBufferPool,
+                                    supports_edge_triggering)
+
+
+def gathered(buffers):
+    return [buf.tobytes() for buf in buffers]
+
+
+class WhenGatheringQueuedWrites(unittest.TestCase):
+
+    def setUp(self):
+        self.queue = WriteQueue()
+
+        for src in (b'head', bytearray(b'body'), memoryview(b'tail')):
+            self.queue.append(src)
+
+    def test_gathering_all_buffers(self):
+        self.assertEqual([b'head', b'body', b'tail'],
+                         gathered(self.queue.gather(64, 1024)))
+
+    def test_gathering_respects_buffer_limit(self):
+        self.assertEqual([b'head', b'body'],
+                         gathered(self.queue.gather(2, 1024)))
+
+    def test_gathering_respects_byte_limit(self):
+        self.assertEqual([b'head', b'body'],
+                         gathered(self.queue.gather(64, 10)))
+
+    def test_gathering_always_includes_first_buffer(self):
+        self.assertEqual([b'head'], gathered(self.queue.gather(64, 1)))
+
+    def test_partial_sends_offset_the_first_buffer(self):
+        self.queue.advance(6)
+
+        self.assertEqual([b'dy', b'tail'],
+                         gathered(self.queue.gather(64, 1024)))
+
+    def test_advancing_across_buffers(self):
+        self.queue.advance(8)
+        self.assertEqual((b'tail', 0), self.queue.next())
+
+        self.queue.advance(4)
+        self.assertFalse(self.queue.has_next())
+
+    def test_size_counts_unsent_bytes(self):
+        self.assertEqual(12, self.queue.size())
+
+        self.queue.advance(6)
+        self.assertEqual(6, self.queue.size())
+
+        self.queue.clear()
+        self.assertEqual(0, self.queue.size())
+
+    def test_advancing_pops_empty_buffers(self):
+        queue = WriteQueue()
+        queue.append(b'')
+        queue.append(b'data')
+
+        queue.advance(0)
+        self.assertEqual(b'data', queue.next()[0])
+
+
+class WhenWritingToSockets(unittest.TestCase):
+
+    def setUp(self):
+        self.io_loop = mock.MagicMock()
+        self.socket = mock.MagicMock()
+        self.socket.fileno.return_value = 0
+        self.sent = list()
+
+        self.handler = SocketIOHandler(self.socket, io_loop=self.io_loop)
+
+    def send(self, buf):
+        self.sent.append(bytes(buf))
+        return len(buf)
+
+    def test_queued_writes_coalesce_into_one_send(self):
+        self.socket.send.side_effect = self.send
+
+        self.handler.write(b'4\r\n')
+        self.handler.write(memoryview(b'data'))
+        self.handler.write(b'\r\n')
+        self.handler.handle_write()
+
+        self.assertEqual([b'4\r\ndata\r\n'], self.sent)
+        self.assertFalse(self.handler.writing())
+
+    def test_blocked_sends_keep_the_queue(self):
+        self.socket.send.side_effect = [
+            3, socket.error(errno.EWOULDBLOCK, 'blocked')]
+
+        self.handler.write(b'data')
+        self.handler.handle_write()
+
+        self.assertEqual((b'data', 3), self.handler._write_queue.next())
+
+    def test_writes_without_callbacks_keep_the_pending_one(self):
+        callback = mock.MagicMock()
+        self.socket.send.side_effect = self.send
+
+        self.handler.write(b'head', callback)
+        self.handler.write(b'body')
+        self.handler.handle_write()
+        self.handler.handle_write()
+
+        callback.assert_called_once_with()
+
+    def test_draining_below_the_low_watermark(self):
+        drained = mock.MagicMock()
+        self.handler.set_write_watermarks(8, 4)
+        self.socket.send.side_effect = [
+            2, socket.error(errno.EWOULDBLOCK, 'blocked'),
+            4, socket.error(errno.EWOULDBLOCK, 'blocked')]
+
+        self.handler.write(b'01234567')
+        self.assertTrue(self.handler.write_buffer_full())
+
+        self.handler.on_drain(drained)
+        self.handler.handle_write()
+        self.assertEqual(6, self.handler.write_buffer_size())
+        self.assertFalse(drained.called)
+
+        self.handler.handle_write()
+        self.assertFalse(self.handler.write_buffer_full())
+        drained.assert_called_once_with()
+
+    def test_drain_callbacks_run_right_away_when_drained(self):
+        drained = mock.MagicMock()
+
+        self.handler.on_drain(drained)
+
+        drained.assert_called_once_with()
+
+    def test_closing_waits_on_queued_writes(self):
+        self.socket.send.side_effect = self.send
+
+        self.handler.write(b'data')
+        self.handler.close()
+        self.assertFalse(self.socket.close.called)
+
+        self.handler.handle_write()
+        self.handler.handle_write()
+
+        self.assertEqual(1, self.socket.send.call_count)
+        self.socket.close.assert_called_once_with()
+
+    def test_closing_with_writes_that_fail(self):
+        self.socket.send.side_effect = socket.error(errno.EPIPE, 'broken')
+
+        self.handler.write(b'data')
+        self.handler.close()
+        self.handler.handle_write()
+
+        self.socket.close.assert_called_once_with()
+
+
+class WhenClosingSockets(unittest.TestCase):
+
+    def setUp(self):
+        self.io_loop = mock.MagicMock()
+        self.io_loop.READ = IOLoop.READ
+        self.io_loop.WRITE = IOLoop.WRITE
+        self.io_loop.ERROR = IOLoop.ERROR
+        self.socket = mock.MagicMock()
+        self.socket.fileno.return_value = 0
+
+        self.handler = SocketIOHandler(self.socket, io_loop=self.io_loop)
+
+    def test_closed_streams_leave_the_fd_alone(self):
+        self.handler.close()
+        self.io_loop.reset_mock()
+
+        # Write callbacks may still try to resume reading once closed
+        self.handler.handle.resume_reading()
+        self.handler.handle.resume_writing()
+
+        self.assertFalse(self.io_loop.update_handler.called)
+
+
+class WhenPoolingReceiveBuffers(unittest.TestCase):
+
+    def setUp(self):
+        self.pool = ReceiveBufferPool(16, 64, max_free=1)
+
+    def test_full_reads_grow_up_to_the_max(self):
+        self.assertEqual(32, self.pool.next_size(16, 16))
+        self.assertEqual(64, self.pool.next_size(64, 64))
+
+    def test_small_reads_shrink_down_to_the_min(self):
+        self.assertEqual(32, self.pool.next_size(64, 16))
+        self.assertEqual(16, self.pool.next_size(16, 1))
+
+    def test_other_reads_keep_the_size(self):
+        self.assertEqual(64, self.pool.next_size(64, 17))
+        self.assertEqual(64, self.pool.next_size(64, 0))
+
+    def test_released_buffers_are_handed_out_by_size(self):
+        small = self.pool.acquire(16)
+        large = self.pool.acquire(32)
+        self.pool.release(small)
+        self.pool.release(large)
+
+        self.assertIs(large, self.pool.acquire(32))
+        self.assertIs(small, self.pool.acquire(16))
+
+    def test_free_buffers_are_bounded(self):
+        first = self.pool.acquire(16)
+        self.pool.release(first)
+        self.pool.release(bytearray(16))
+
+        self.assertIs(first, self.pool.acquire(16))
+        self.assertIsNot(first, self.pool.acquire(16))
+
+
+class WhenReadingFromSockets(unittest.TestCase):
+
+    def setUp(self):
+        self.io_loop = mock.MagicMock()
+        self.socket = mock.MagicMock()
+        self.socket.fileno.return_value = 0
+        self.socket.recv_into = self.recv_into
+        self.received = list()
+        self.found = list()
+
+        self.handler = SocketIOHandler(
+            self.socket, io_loop=self.io_loop, recv_chunk_size=16)
+
+    def recv_into(self, buf, size):
+        # Remember what the buffer held before reading into it
+        self.found.append(bytes(buf[:4]))
+        buf[:4] = b'data'
+        return 4
+
+    def test_reads_are_views_into_the_receive_buffer(self):
+        self.handler.read(lambda data: self.received.append(type(data)))
+        self.handler.handle_read()
+
+        self.assertEqual([memoryview], self.received)
+
+    def test_released_buffers_are_reused(self):
+        self.handler.read(lambda data: data.tobytes())
+        self.handler.handle_read()
+        self.handler.handle_read()
+
+        self.assertEqual([b'\0' * 4, b'data'], self.found)
+
+    def test_kept_buffers_are_not_reused(self):
+        def on_read(data):
+            self.handler.keep_read_buffer()
+            self.received.append(data)
+
+        self.handler.read(on_read)
+        self.handler.handle_read()
+        self.handler.handle_read()
+
+        self.assertEqual([b'\0' * 4, b'\0' * 4], self.found)
+        self.assertEqual([b'data', b'data'],
+                         [view.tobytes() for view in self.received])
+
+    def test_stale_read_events_are_ignored(self):
+        io_loop = IOLoop(make_current=False)
+        peer, sock = socket.socketpair()
+        handler = SocketIOHandler(sock, io_loop=io_loop)
+
+        try:
+            peer.sendall(b'data')
+            handler.read(self.received.append)
+            handler.handle.disable_reading()
+
+            handler._handle_events(sock.fileno(), IOLoop.READ)
+            self.assertEqual([], self.received)
+        finally:
+            handler.close()
+            peer.close()
+            io_loop.close(all_fds=True)
+
+    def test_full_reads_grow_the_buffer(self):
+        sizes = list()
+
+        def recv_into(buf, size):
+            sizes.append(size)
+            return size
+
+        self.socket.recv_into = recv_into
+        self.handler = SocketIOHandler(
+            self.socket, io_loop=self.io_loop,
+            recv_buffers=ReceiveBufferPool(16, 64))
+        self.handler.read(lambda data: None)
+
+        for i in range(4):
+            self.handler.handle_read()
+
+        self.assertEqual([16, 32, 64, 64], sizes)
+
+
+class WhenPollingEdgeTriggered(unittest.TestCase):
+
+    def setUp(self):
+        self.io_loop = IOLoop(make_current=False)
+
+        if not supports_edge_triggering(self.io_loop):
+            self.io_loop.close()
+            raise unittest.SkipTest('edge triggering needs epoll')
+
+        self.peer, sock = socket.socketpair()
+        sock.setblocking(False)
+        self.received = list()
+
+        self.handler = SocketIOHandler(
+            sock, io_loop=self.io_loop, recv_chunk_size=16,
+            edge_triggered=True)
+
+    def tearDown(self):
+        self.handler.close()
+        self.peer.close()
+        self.io_loop.close(all_fds=True)
+
+    def on_read(self, data):
+        self.received.append(data.tobytes())
+
+    def run_loop(self):
+        self.io_loop.add_timeout(self.io_loop.time() + 0.1, self.io_loop.stop)
+        self.io_loop.start()
+
+    def test_plain_handlers_stay_level_triggered(self):
+        sock = mock.MagicMock()
+        sock.fileno.return_value = 0
+
+        handler = SocketIOHandler(sock, io_loop=mock.MagicMock(),
+                                  edge_triggered=True)
+        self.assertFalse(handler.handle.edge_triggered)
+
+    def test_reads_until_the_socket_runs_dry(self):
+        self.handler.read(self.on_read)
+        self.peer.sendall(b'x' * 100)
+        self.run_loop()
+
+        self.assertEqual(b'x' * 100, b''.join(self.received))
+        self.assertFalse(self.handler.handle.read_ready())
+
+    def test_resuming_reads_what_arrived_while_paused(self):
+        def on_read(data):
+            self.on_read(data)
+            self.handler.handle.disable_reading()
+
+        self.handler.read(on_read)
+        self.peer.sendall(b'x' * 48)
+        self.run_loop()
+        self.assertEqual([b'x' * 16], self.received)
+
+        # No new edge comes for the bytes that are still waiting
+        self.handler.read(self.on_read)
+        self.run_loop()
+        self.assertEqual(b'x' * 48, b''.join(self.received))
+
+    def test_writes_finish_without_waiting_for_another_edge(self):
+        written = list()
+
+        self.run_loop()
+        self.handler.write(b'data', lambda: written.append(True))
+        self.run_loop()
+
+        self.assertEqual([True], written)
+        self.assertFalse(self.handler.handle.is_writing())
+        self.assertEqual(b'data', self.peer.recv(16))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+import os
+import socket
+import unittest
+
+import mock
+
+from pyrox.tstream.iostream import SocketIOHandler
+from pyrox.tstream.splice import SPLICE_SUPPORTED
+
+
+@unittest.skipUnless(SPLICE_SUPPORTED, 'splice(2) is not available')
+class WhenSplicingStreams(unittest.TestCase):
+
+    def setUp(self):
+        self.io_loop = mock.MagicMock()
+        self.source_sock, self.client = socket.socketpair()
+        self.dest_sock, self.origin = socket.socketpair()
+
+        self.source = SocketIOHandler(self.source_sock, io_loop=self.io_loop)
+        self.dest = SocketIOHandler(self.dest_sock, io_loop=self.io_loop)
+        self.spliced = list()
+
+    def tearDown(self):
+        for stream in (self.source, self.dest):
+            if not stream.closed():
+                stream.close()
+
+        self.client.close()
+        self.origin.close()
+
+    def test_forwarding_bytes(self):
+        self.client.sendall(b'x' * 1000 + b'next')
+
+        self.source.splice_to(self.dest, 1000, self.spliced.append)
+        self.assertTrue(self.source.splicing())
+
+        self.source.handle_read()
+
+        self.assertEqual([1000], self.spliced)
+        self.assertFalse(self.source.splicing())
+        self.assertEqual(b'x' * 1000, self.origin.recv(2000))
+        self.assertEqual(b'next', self.source_sock.recv(100))
+
+    def test_queued_writes_go_first(self):
+        self.client.sendall(b'body')
+        self.dest.write(b'head')
+
+        self.source.splice_to(self.dest, 4, self.spliced.append)
+        self.dest.handle_write()
+        self.dest.handle_write()
+        self.source.handle_read()
+
+        self.assertEqual([4], self.spliced)
+        self.assertEqual(b'headbody', self.origin.recv(100))
+
+    def test_pending_write_callbacks_still_run(self):
+        written = mock.MagicMock()
+        self.client.sendall(b'body')
+        self.dest.write(b'head', written)
+
+        self.source.splice_to(self.dest, 4, self.spliced.append)
+        self.dest.handle_write()
+        self.dest.handle_write()
+        self.source.handle_read()
+
+        written.assert_called_once_with()
+        self.assertEqual([4], self.spliced)
+        self.assertEqual(b'headbody', self.origin.recv(100))
+
+    def test_source_hanging_up_closes_both_streams(self):
+        self.client.sendall(b'short')
+        self.client.close()
+
+        self.source.splice_to(self.dest, 1000, self.spliced.append)
+        self.source.handle_read()
+        self.source.handle_read()
+
+        self.assertEqual([], self.spliced)
+        self.assertTrue(self.source.closed())
+        self.assertTrue(self.dest.closed())
+
+    def test_closing_dest_aborts_splice(self):
+        self.source.splice_to(self.dest, 1000, self.spliced.append)
+        self.dest.close()
+
+        self.assertFalse(self.source.splicing())
+        self.assertTrue(self.source.closed())
+
+
+if __name__ == '__main__':
+    unittest.main()